@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ghostnote_project.settings')
+# Under ASGI the note views run natively async (see notes/async_views.py)
+os.environ.setdefault('NOTES_ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
@@ -0,0 +1,73 @@
+"""
+Database connection strategies.
+
+Serverless deployments run many short-lived workers, each of which would hold
+its own Postgres connection under Django's default persistent connections.
+``DB_CONN_STRATEGY`` picks how connections are managed:
+
+``persistent`` (default)
+    One connection per worker thread, reused for ``DB_CONN_MAX_AGE`` seconds.
+``pooler``
+    For an external transaction pooler (PgBouncer, Supavisor, the pooled
+    Vercel Postgres URL). Connections are closed after each request, and
+    server-side cursors and prepared statements are off, since neither
+    survives transaction pooling.
+``pool``
+    A psycopg 3 connection pool inside each worker, never holding more than
+    ``DB_POOL_MAX_SIZE`` connections.
+
+Every strategy turns on health checks, so a reused connection that the server
+or pooler has dropped is replaced instead of failing the request.
+"""
+import importlib.util
+
+from django.core.exceptions import ImproperlyConfigured
+
+CONN_STRATEGIES = ('persistent', 'pooler', 'pool')
+
+
+def has_psycopg3():
+    # find_spec avoids importing the driver at settings time
+    return importlib.util.find_spec('psycopg') is not None
+
+
+def has_psycopg_pool():
+    # The pool ships separately from psycopg 3 (the 'pool' extra)
+    return has_psycopg3() and importlib.util.find_spec('psycopg_pool') is not None
+
+
+def apply_conn_strategy(config, strategy, conn_max_age=600, pool_min_size=0,
+                        pool_max_size=4, pool_timeout=10):
+    """Adjusts a DATABASES entry in place for ``strategy``; non-Postgres configs are left alone."""
+    if strategy not in CONN_STRATEGIES:
+        raise ImproperlyConfigured(
+            f"DB_CONN_STRATEGY must be one of {', '.join(CONN_STRATEGIES)}, not {strategy!r}."
+        )
+    if config.get('ENGINE') != 'django.db.backends.postgresql':
+        return config
+
+    options = config.setdefault('OPTIONS', {})
+    config['CONN_HEALTH_CHECKS'] = True
+
+    if strategy == 'persistent':
+        config['CONN_MAX_AGE'] = conn_max_age
+    elif strategy == 'pooler':
+        config['CONN_MAX_AGE'] = 0
+        config['DISABLE_SERVER_SIDE_CURSORS'] = True
+        if has_psycopg3():
+            # psycopg 3 prepares repeated queries server-side; psycopg2 never does
+            options['prepare_threshold'] = None
+    else:
+        if not has_psycopg_pool():
+            raise ImproperlyConfigured(
+                "DB_CONN_STRATEGY=pool needs psycopg 3 and psycopg_pool (pip install 'psycopg[binary,pool]'); "
+                "with psycopg2, use DB_CONN_STRATEGY=pooler behind an external pooler instead."
+            )
+        # Django refuses persistent connections together with a pool
+        config['CONN_MAX_AGE'] = 0
+        options['pool'] = {
+            'min_size': pool_min_size,
+            'max_size': pool_max_size,
+            'timeout': pool_timeout,
+        }
+    return config
@@ -11,12 +11,21 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
-import dj_database_url
+import sys
 from pathlib import Path
-from dotenv import load_dotenv # Import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+from ghostnote_project.database import apply_conn_strategy
+
+# Slim production profile: only what serving notes needs (no admin, auth,
+# contenttypes or sessions) and no optional imports at cold start.
+# Read from the real environment only, before any .env file is loaded.
+SLIM = os.environ.get('DJANGO_SLIM', 'False') == 'True'
+
+if not SLIM:
+    from dotenv import load_dotenv # Import load_dotenv
+
+    # Load environment variables from .env file
+    load_dotenv()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -28,6 +37,10 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Read SECRET_KEY from environment variable
 SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY')
 
+# Key for the modification-code hashes; set it separately so rotating
+# SECRET_KEY doesn't lock every note
+MODIFICATION_CODE_SECRET = os.environ.get('MODIFICATION_CODE_SECRET') or SECRET_KEY
+
 # Read DEBUG status from environment variable (defaults to False if not set)
 DEBUG = os.environ.get('DJANGO_DEBUG', 'False') == 'True'
 
@@ -47,7 +60,19 @@ INSTALLED_APPS = [
     'notes', # Add this line
 ]
 
+if SLIM:
+    # notes.admin registers nothing and no view uses auth or sessions
+    SLIM_DROPPED_APPS = {
+        'django.contrib.admin',
+        'django.contrib.auth',
+        'django.contrib.contenttypes',
+        'django.contrib.sessions',
+    }
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in SLIM_DROPPED_APPS]
+
 MIDDLEWARE = [
+    # First, so its total covers the rest of the stack (see notes/perf.py)
+    'notes.perf.PerfMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', # Add whitenoise AFTER SecurityMiddleware
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -58,11 +83,78 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Flash messages live in a signed cookie rather than falling back to the
+# session, so anonymous readers never touch the session table. Session and
+# auth middleware are lazy: nothing is loaded unless a view or template asks.
+MESSAGE_STORAGE = os.environ.get('MESSAGE_STORAGE', 'django.contrib.messages.storage.cookie.CookieStorage')
+
+if SLIM:
+    # Messages keep working without sessions thanks to the cookie storage above
+    MIDDLEWARE = [
+        middleware for middleware in MIDDLEWARE
+        if middleware not in (
+            'django.contrib.sessions.middleware.SessionMiddleware',
+            'django.contrib.auth.middleware.AuthenticationMiddleware',
+        )
+    ]
+
+# Serve the note views from notes/async_views.py (set by asgi.py). WhiteNoise
+# is sync-only middleware: under ASGI it would push every request through a
+# thread hop, so in async mode static files are left to the CDN / front server
+# (collectstatic output is unchanged).
+NOTES_ASYNC_VIEWS = os.environ.get('NOTES_ASYNC_VIEWS', 'False') == 'True'
+
+if NOTES_ASYNC_VIEWS:
+    MIDDLEWARE = [
+        middleware for middleware in MIDDLEWARE
+        if middleware != 'whitenoise.middleware.WhiteNoiseMiddleware'
+    ]
+
+# Request instrumentation (notes/perf.py): the share of requests timed
+# (0 turns it off, 1 times everything) and whether timed responses get a
+# Server-Timing header (never on responses shared caches may store).
+# Timings are logged on the 'notes.perf' logger. Sampling is off under
+# manage.py test, whose output it would clutter at random; the perf tests
+# turn it on themselves.
+TESTING = sys.argv[1:2] == ['test']
+PERF_SAMPLE_RATE = float(os.environ.get('PERF_SAMPLE_RATE', 0 if TESTING else 0.01))
+PERF_SERVER_TIMING = os.environ.get('PERF_SERVER_TIMING', 'True') == 'True'
+
+# Django's own logging stays as is. The perf timings are INFO lines, which
+# nothing would print outside DEBUG; they go to stderr unless PERF_LOG_LEVEL
+# is raised (WARNING silences them).
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'notes.perf': {
+            'handlers': ['console'],
+            'level': os.environ.get('PERF_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# Metrics on /metrics (notes/metrics.py). With several worker processes, point
+# METRICS_MULTIPROC_DIR at a directory they share so a scrape adds up all of
+# them; each process writes its file every METRICS_FLUSH_INTERVAL seconds.
+# Scrapes need METRICS_TOKEN as a bearer token; without one /metrics is only
+# served with DEBUG on.
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR') or None
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+
 ROOT_URLCONF = 'ghostnote_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, plus render timings for notes.perf.PerfMiddleware
+        'BACKEND': 'notes.perf.TimedDjangoTemplates',
         # Add the root templates directory here
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
@@ -76,20 +168,39 @@ TEMPLATES = [
     },
 ]
 
+if SLIM:
+    TEMPLATES[0]['OPTIONS']['context_processors'].remove('django.contrib.auth.context_processors.auth')
+
 WSGI_APPLICATION = 'ghostnote_project.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': dj_database_url.config(
+DATABASES = {'default': {}}
+
+# Only import dj_database_url when there is a URL to parse
+if os.environ.get('DATABASE_URL') or os.environ.get('POSTGRES_URL'):
+    import dj_database_url
+
+    DATABASES['default'] = dj_database_url.config(
         # Get the database URL from the POSTGRES_URL env var Vercel provides
         default=os.environ.get('POSTGRES_URL'),
-        # Optional: Set connection pooling timeout
-        conn_max_age=600
     )
-}
+
+# How Postgres connections are held: 'persistent', 'pooler' (external
+# transaction pooler) or 'pool' (psycopg 3 pool per worker).
+# See ghostnote_project/database.py.
+DB_CONN_STRATEGY = os.environ.get('DB_CONN_STRATEGY', 'persistent')
+apply_conn_strategy(
+    DATABASES['default'],
+    DB_CONN_STRATEGY,
+    conn_max_age=int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+    pool_min_size=int(os.environ.get('DB_POOL_MIN_SIZE', 0)),
+    # Per-worker cap on open connections in 'pool' mode
+    pool_max_size=int(os.environ.get('DB_POOL_MAX_SIZE', 4)),
+    pool_timeout=int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+)
 
 # Optional Fallback for local development:
 # If POSTGRES_URL is not set in the environment, fall back to SQLite
@@ -101,6 +212,105 @@ if not DATABASES['default']:
          }
      }
 
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The 'notes' cache holds note rows and their rendered body fragments for the
+# detail page (see notes/cache.py), along with the public listing version and
+# count. Local memory by default, which evicts least-recently-used entries
+# once MAX_ENTRIES is reached.
+#
+# Local memory is per process: invalidate_note() and the version bumps after a
+# write only reach the worker that handled it, and every other worker keeps its
+# copies until they expire. So with local memory entries live only
+# NOTE_CACHE_TIMEOUT seconds (30 by default, within the NOTE_LIST_MAX_AGE that
+# shared HTTP caches may already serve), and running several workers
+# (WEB_CONCURRENCY > 1, as read by gunicorn and uvicorn) is reported by a
+# system check (notes/checks.py), which is an error under check --deploy.
+# Serverless instances are separate processes as well; for them the short
+# timeout is what bounds how stale another instance's copy can get. Point
+# NOTE_CACHE_BACKEND at a shared backend (django.core.cache.backends.redis.RedisCache,
+# or filebased for one host) to run several workers and keep entries longer.
+
+NOTE_CACHE_BACKEND = os.environ.get('NOTE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+NOTE_CACHE_PER_PROCESS = NOTE_CACHE_BACKEND.rsplit('.', 2)[-2] == 'locmem'
+
+# Worker processes serving requests (the variable gunicorn and uvicorn read)
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+
+NOTE_CACHE = {
+    'BACKEND': NOTE_CACHE_BACKEND,
+    'LOCATION': os.environ.get('NOTE_CACHE_LOCATION', 'ghostnote-notes'),
+    # Seconds a cached note lives; edits and deletes invalidate it right away
+    # (in every worker only with a shared backend)
+    'TIMEOUT': int(os.environ.get('NOTE_CACHE_TIMEOUT', 30 if NOTE_CACHE_PER_PROCESS else 3600)),
+}
+# MAX_ENTRIES (the LRU bound) is only understood by the local-memory, file
+# and database backends
+if NOTE_CACHE_BACKEND.rsplit('.', 2)[-2] in ('locmem', 'filebased', 'db'):
+    NOTE_CACHE['OPTIONS'] = {'MAX_ENTRIES': int(os.environ.get('NOTE_CACHE_MAX_ENTRIES', 5000))}
+
+# The 'ratelimit' cache holds the token buckets of notes/ratelimit.py. Local
+# memory limits each worker on its own; point it at a shared backend
+# (django.core.cache.backends.redis.RedisCache, or filebased for one host)
+# to limit across workers.
+RATELIMIT_CACHE = {
+    'BACKEND': os.environ.get('RATELIMIT_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+    'LOCATION': os.environ.get('RATELIMIT_CACHE_LOCATION', 'ghostnote-ratelimit'),
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'notes': NOTE_CACHE,
+    'ratelimit': RATELIMIT_CACHE,
+}
+
+# Alias of the cache used by notes/cache.py
+NOTE_CACHE_ALIAS = 'notes'
+
+# Rate limiting of writes (see notes/ratelimit.py)
+RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'True') == 'True'
+RATELIMIT_CACHE_ALIAS = 'ratelimit'
+# Token buckets per scope as "requests/seconds": that many requests at once,
+# refilled evenly over the period. Edits and deletes are counted per client
+# and note, creates per client.
+RATELIMITS = {
+    'create': os.environ.get('RATELIMIT_CREATE', '20/60'),
+    'edit': os.environ.get('RATELIMIT_EDIT', '10/60'),
+    'delete': os.environ.get('RATELIMIT_DELETE', '10/60'),
+}
+# request.META key holding the client address. Behind a proxy, use the
+# header the proxy itself sets: 'HTTP_X_REAL_IP' where it overwrites it (e.g.
+# Vercel), or 'HTTP_X_FORWARDED_FOR' with RATELIMIT_TRUSTED_PROXIES set to the
+# number of proxies in front of the app. The right-most entries of
+# X-Forwarded-For are then the ones those proxies appended; the first entry
+# comes from the client, which could dodge the limits by changing it.
+RATELIMIT_IP_META_KEY = os.environ.get('RATELIMIT_IP_META_KEY', 'REMOTE_ADDR')
+RATELIMIT_TRUSTED_PROXIES = int(os.environ.get('RATELIMIT_TRUSTED_PROXIES', 1))
+
+# HTTP caching of note pages (see notes/http.py)
+# Release identifier mixed into ETags so a deploy invalidates cached markup
+RELEASE_VERSION = os.environ.get('RELEASE_VERSION') or os.environ.get('VERCEL_GIT_COMMIT_SHA', '')
+# Seconds shared caches may keep a seeded public list page
+NOTE_LIST_MAX_AGE = int(os.environ.get('NOTE_LIST_MAX_AGE', 60))
+# Serve the note detail page as a cookie-free, publicly cacheable shell and load
+# the edit/delete forms on demand (notes:note_manage)
+NOTE_DETAIL_LAZY_FORMS = os.environ.get('NOTE_DETAIL_LAZY_FORMS', 'True') == 'True'
+# Seconds shared caches may keep that shell
+NOTE_DETAIL_MAX_AGE = int(os.environ.get('NOTE_DETAIL_MAX_AGE', 300))
+# Seconds feed readers and shared caches may keep the RSS/Atom feeds
+FEED_MAX_AGE = int(os.environ.get('FEED_MAX_AGE', 300))
+
+# Longest note body NoteForm (and so the API) accepts, in characters
+NOTE_MAX_CONTENT_LENGTH = int(os.environ.get('NOTE_MAX_CONTENT_LENGTH', 50000))
+
+# JSON API limits (see notes/api.py)
+# Most notes fetched by one ?ids= request
+API_BATCH_MAX = int(os.environ.get('API_BATCH_MAX', 100))
+# Most notes created by one bulk POST
+API_BULK_MAX = int(os.environ.get('API_BULK_MAX', 100))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -153,3 +363,7 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Cold start budget for `manage.py profile_imports`, in milliseconds of import
+# time for loading the WSGI app and serving a first request
+COLD_START_BUDGET_MS = int(os.environ.get('COLD_START_BUDGET_MS', 1000))
@@ -14,17 +14,31 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 # Remove RedirectView and reverse_lazy imports if no longer needed elsewhere
 # from django.views.generic.base import RedirectView
 # from django.urls import reverse_lazy
+from django.conf import settings
 from notes import views as notes_views # Import the views from the notes app
+from notes.metrics import metrics_view
+
+if settings.NOTES_ASYNC_VIEWS:
+    from notes import async_views as notes_views
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     # Any URL starting with 'notes/' will be handled by notes/urls.py
     path('notes/', include('notes.urls')),
+    # JSON API for integrations (notes/api.py)
+    path('api/notes/', include('notes.api_urls')),
+    # Prometheus scrape target (notes/metrics.py)
+    path('metrics', metrics_view, name='metrics'),
     # Map the root URL ('/') to the landing_page_view
     path('', notes_views.landing_page_view, name='home'),
 ]
+
+# The admin is left out of the slim production profile
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
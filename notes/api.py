@@ -0,0 +1,252 @@
+"""
+JSON API for notes.
+
+    GET    /api/notes/?ids=<uuid>,<uuid>&fields=id,username   batch fetch
+    POST   /api/notes/                    create one note (object) or many (array)
+    GET    /api/notes/<uuid>/?fields=...  one note
+    PATCH  /api/notes/<uuid>/             partial update, needs modification_code
+    DELETE /api/notes/<uuid>/             delete, needs modification_code
+
+PATCH and DELETE also take an optional ``version`` (as read from the note):
+the write then only applies to that version, and a note changed in between
+gets a 409 with its current version instead of being silently overwritten.
+
+``fields`` limits both the response and the columns read from the database.
+The modification code is only ever returned by create; edits and deletes take
+it in the JSON body or the ``X-Modification-Code`` header. Validation reuses
+NoteForm, so the API accepts exactly what the HTML forms accept.
+"""
+import functools
+import json
+import logging
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from .cache import (
+    adjust_public_note_count, bump_public_notes_version, forget_public_note_count, get_cached_note, invalidate_note,
+    note_cache, note_cache_key,
+)
+from .forms import NoteForm
+from .models import Note, edit_values, notes_with_code
+from .metrics import observe
+from .perf import count_cache
+from .ratelimit import ratelimit
+
+logger = logging.getLogger(__name__)
+
+# Fields a client may read (and ask for with ?fields=)
+API_FIELDS = ('id', 'username', 'content', 'created_at', 'updated_at', 'is_public', 'version')
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+    def response(self):
+        return JsonResponse({'error': str(self), **self.extra}, status=self.status)
+
+
+def note_data(note, fields=API_FIELDS):
+    return {field: getattr(note, field) for field in fields}
+
+
+def requested_fields(request):
+    """The fields named in ?fields= (all readable fields if absent)."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return API_FIELDS
+    fields = tuple(dict.fromkeys(field.strip() for field in raw.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in API_FIELDS]
+    if unknown or not fields:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}. Choose from {', '.join(API_FIELDS)}.")
+    return fields
+
+
+def json_body(request):
+    try:
+        return json.loads(request.body or b'null')
+    except ValueError:
+        raise ApiError("Request body must be valid JSON.")
+
+
+def submitted_modification_code(request, body):
+    """The modification code from the header or body, as a UUID (ApiError if missing or malformed)."""
+    submitted = request.headers.get('X-Modification-Code') or body.get('modification_code')
+    if not submitted:
+        raise ApiError("Modification code is required.")
+    try:
+        return uuid.UUID(str(submitted))
+    except ValueError:
+        raise ApiError("Invalid modification code format.")
+
+
+def submitted_version(body):
+    """The optional ``version`` the write is conditional on."""
+    version = body.get('version')
+    if version is not None and (isinstance(version, bool) or not isinstance(version, int)):
+        raise ApiError("version must be an integer.")
+    return version
+
+
+def refuse_write(note_id, code, version):
+    """
+    Raises the error for a conditional write that matched no row: 409 for a
+    stale version, 403 for a wrong code, or 404.
+    """
+    # Key lookups reading at most the version column, never the row
+    if version is not None:
+        current = notes_with_code(note_id, code).values_list('version', flat=True).first()
+        if current is not None:
+            raise ApiError("The note was changed since that version.", status=409, version=current)
+    if not Note.objects.filter(pk=note_id).exists():
+        raise Http404
+    logger.warning(f"Invalid modification code attempt via API for Note ID {note_id}.")
+    raise ApiError("Invalid modification code.", status=403)
+
+
+def api_view(view):
+    """Turns errors into JSON responses; the API is CSRF-exempt (it uses no cookies)."""
+    @csrf_exempt
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return ApiError("Note not found.", status=404).response()
+        except ApiError as error:
+            return error.response()
+    return wrapper
+
+
+# --- /api/notes/ ---
+@observe({'GET': 'batch', 'POST': 'create'})
+@api_view
+@ratelimit({'POST': 'create'})
+def notes_collection(request):
+    if request.method == 'GET':
+        return batch_fetch(request)
+    if request.method == 'POST':
+        return create_notes(request)
+    return HttpResponseNotAllowed(['GET', 'POST'])
+
+
+def batch_fetch(request):
+    """Returns up to API_BATCH_MAX notes by ID, cached ones first, the rest in one query."""
+    fields = requested_fields(request)
+    raw_ids = [raw for raw in request.GET.get('ids', '').split(',') if raw.strip()]
+    if not raw_ids:
+        raise ApiError("Pass the note IDs to fetch as ?ids=<uuid>,<uuid>.")
+    if len(raw_ids) > settings.API_BATCH_MAX:
+        raise ApiError(f"At most {settings.API_BATCH_MAX} notes per request.")
+    try:
+        ids = list(dict.fromkeys(uuid.UUID(raw.strip()) for raw in raw_ids))
+    except ValueError:
+        raise ApiError("Note IDs must be UUIDs.")
+
+    found = {}
+    cached = note_cache().get_many([note_cache_key(note_id) for note_id in ids])
+    count_cache(hits=len(cached), misses=len(ids) - len(cached))
+    for note, _ in cached.values():
+        found[note.pk] = note_data(note, fields)
+    misses = [note_id for note_id in ids if note_id not in found]
+    if misses:
+        # values() reads just the requested columns (plus the key to match them up)
+        for row in Note.objects.filter(pk__in=misses).values('id', *fields):
+            found[row['id']] = {field: row[field] for field in fields}
+
+    return JsonResponse({
+        'notes': [found[note_id] for note_id in ids if note_id in found],
+        'missing': [note_id for note_id in ids if note_id not in found],
+    })
+
+
+def create_notes(request):
+    """Creates one note (JSON object) or several (JSON array) in one transaction."""
+    body = json_body(request)
+    bulk = isinstance(body, list)
+    items = body if bulk else [body]
+    if not items or not all(isinstance(item, dict) for item in items):
+        raise ApiError("Send a note object or a non-empty array of note objects.")
+    if len(items) > settings.API_BULK_MAX:
+        raise ApiError(f"At most {settings.API_BULK_MAX} notes per request.")
+
+    notes, errors = [], {}
+    for index, item in enumerate(items):
+        form = NoteForm(item)
+        if form.is_valid():
+            notes.append(form.save(commit=False))
+        else:
+            errors[index] = form.errors.get_json_data()
+    if errors:
+        # All or nothing: nothing is written if any note is invalid
+        raise ApiError("Invalid notes.", errors=errors if bulk else errors[0])
+
+    for note in notes:
+        # bulk_create skips Note.save()
+        note.issue_modification_code()
+        note.render_fragments()
+    with transaction.atomic():
+        Note.objects.bulk_create(notes)
+    if any(note.is_public for note in notes):
+        bump_public_notes_version()
+        adjust_public_note_count(sum(note.is_public for note in notes))
+    logger.info(f"Created {len(notes)} note(s) via API.")
+
+    created = [dict(note_data(note), modification_code=note.modification_code) for note in notes]
+    return JsonResponse(created if bulk else created[0], status=201, safe=False)
+
+
+# --- /api/notes/<uuid>/ ---
+@observe({'GET': 'detail', 'PATCH': 'edit', 'DELETE': 'delete'})
+@api_view
+@ratelimit({'PATCH': 'edit', 'DELETE': 'delete'})
+def note_resource(request, note_id):
+    fields = requested_fields(request)
+    if request.method == 'GET':
+        note, _ = get_cached_note(note_id)
+        return JsonResponse(note_data(note, fields))
+    if request.method not in ('PATCH', 'DELETE'):
+        return HttpResponseNotAllowed(['GET', 'PATCH', 'DELETE'])
+
+    body = json_body(request) or {}
+    if not isinstance(body, dict):
+        raise ApiError("Request body must be a JSON object.")
+    code = submitted_modification_code(request, body)
+    version = submitted_version(body)
+
+    if request.method == 'DELETE':
+        # Checks the code (and version) and deletes in one statement
+        deleted, _ = notes_with_code(note_id, code, version).delete()
+        if not deleted:
+            refuse_write(note_id, code, version)
+        invalidate_note(note_id)
+        bump_public_notes_version() # The old visibility was never read
+        forget_public_note_count()
+        logger.info(f"Note ID {note_id} deleted via API.")
+        return HttpResponse(status=204)
+
+    # Partial update: only the fields sent are validated and written
+    sent = [field for field in NoteForm.Meta.fields if field in body]
+    form = NoteForm({field: body[field] for field in sent})
+    form.is_valid()
+    errors = {field: error for field, error in form.errors.get_json_data().items() if field in sent}
+    if errors:
+        raise ApiError("Invalid note.", errors=errors)
+    changes = {field: form.cleaned_data[field] for field in sent}
+    if not notes_with_code(note_id, code, version).update(**edit_values(changes)):
+        refuse_write(note_id, code, version)
+    invalidate_note(note_id)
+    bump_public_notes_version()
+    if 'is_public' in changes:
+        forget_public_note_count()
+    note = Note.objects.filter(pk=note_id).first()
+    if note is None:
+        raise Http404 # Deleted between the UPDATE and this read
+    logger.info(f"Note ID {note.id} updated via API. Public: {note.is_public}")
+    return JsonResponse(note_data(note, fields))
@@ -0,0 +1,11 @@
+from django.urls import path
+from . import api
+
+app_name = 'notes_api'
+
+urlpatterns = [
+    # Batch fetch (GET ?ids=) and single or bulk create (POST)
+    path('', api.notes_collection, name='notes'),
+    # Read, partial update (PATCH) and delete one note
+    path('<uuid:note_id>/', api.note_resource, name='note'),
+]
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class NotesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "notes"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import checks # noqa: F401 (registers the system checks)
+        from .perf import install_query_timer
+
+        # Every connection reports query times to PerfMiddleware
+        connection_created.connect(install_query_timer)
@@ -0,0 +1,266 @@
+"""
+Async versions of the note views, served when ``NOTES_ASYNC_VIEWS`` is on
+(the ASGI entry point turns it on by default).
+
+Every database and cache call uses the async ORM / cache API, so a request
+waiting on Postgres or the cache frees the event loop for other requests
+instead of pinning a worker thread. Everything between the I/O calls (form
+handling, rendering, cache headers) is shared with views.py.
+"""
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.http import HttpResponseNotAllowed
+from django.shortcuts import redirect, render
+from django.urls import reverse
+
+from . import views
+from .cache import (
+    aadjust_public_note_count, abump_public_notes_version, aforget_public_note_count, aget_cached_note,
+    ainvalidate_note, apublic_note_count, apublic_notes_version, note_cache,
+)
+from .feeds import feed_cache_key, render_feed
+from .forms import NoteForm
+from .http import has_pending_messages, make_etag, not_modified, public_cacheable
+from .models import edit_values, notes_with_code
+from .pagination import akeyset_page
+from .metrics import observe, set_outcome
+from .perf import count_cache
+from .ratelimit import ratelimit
+from .sampling import SHUFFLE_ORDERING, arandom_public_note_id, public_note_cards, shuffle_segments
+from .search import asearch_page, normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+# --- Landing Page View ---
+async def landing_page_view(request):
+    """Renders the site's landing/home page."""
+    # No database or cache access at all
+    return views.landing_page_view(request)
+
+
+# --- create_note_view ---
+@observe({'POST': 'create'})
+@ratelimit('create')
+async def create_note_view(request):
+    if request.method == 'POST':
+        form = NoteForm(request.POST)
+        if form.is_valid():
+            try:
+                new_note = form.save(commit=False)
+                await new_note.asave()
+                if new_note.is_public:
+                    await abump_public_notes_version()
+                    await aadjust_public_note_count(1)
+                return views.note_created_redirect(request, new_note)
+
+            except Exception as e:
+                logger.error(f"Error saving note after validation: {e}")
+                set_outcome(request, 'error')
+                messages.error(request, 'Could not save note due to a server error.')
+        else:
+             set_outcome(request, 'invalid')
+             messages.error(request, 'Please correct the errors below.')
+    else: # GET request
+        form = NoteForm()
+
+    return render(request, 'notes/create_note_form.html', {'form': form})
+
+
+# --- Random Notes List View ---
+@observe('list')
+async def random_notes_list_view(request):
+    """Displays a paginated, randomly ordered list of PUBLIC notes."""
+    seed, pivot, seeded, page_number, cursor = views.list_params(request)
+
+    one_off = has_pending_messages(request)
+    etag = version = None
+    if seeded:
+        version = await apublic_notes_version()
+        etag = make_etag('list', seed, cursor, page_number, version)
+        if not one_off:
+            response = not_modified(request, etag, int(version))
+            if response is not None:
+                return public_cacheable(response, settings.NOTE_LIST_MAX_AGE)
+
+    notes_page = await akeyset_page(
+        shuffle_segments(pivot), SHUFFLE_ORDERING, cursor,
+        views.PUBLIC_NOTES_PER_PAGE, number=page_number,
+    )
+    return views.list_response(request, notes_page, seed, await apublic_note_count(), one_off, etag, version)
+
+
+# --- recent_notes_view ---
+@observe('recent')
+async def recent_notes_view(request):
+    """Public notes, newest first, paged by keyset cursors (no COUNT, no OFFSET)."""
+    cursor, page_number = request.GET.get('cursor'), views.page_number_param(request)
+
+    one_off = has_pending_messages(request)
+    version = await apublic_notes_version()
+    etag = views.recent_etag(cursor, page_number, version)
+    if not one_off:
+        response = not_modified(request, etag, int(version))
+        if response is not None:
+            return public_cacheable(response, settings.NOTE_LIST_MAX_AGE)
+
+    notes_page = await akeyset_page(
+        [public_note_cards()], views.RECENT_ORDERING, cursor, views.PUBLIC_NOTES_PER_PAGE, number=page_number,
+    )
+    return views.recent_response(request, notes_page, one_off, etag, version)
+
+
+# --- feed_view ---
+async def feed_view(request, kind):
+    """RSS or Atom feed of the latest public notes, pre-rendered in the note cache."""
+    version = await apublic_notes_version()
+    etag = views.feed_etag(request, kind, version)
+    response = not_modified(request, etag, int(version))
+    if response is not None:
+        return public_cacheable(response, settings.FEED_MAX_AGE)
+
+    key = feed_cache_key(etag)
+    document = await note_cache().aget(key)
+    count_cache(hits=document is not None, misses=document is None)
+    if document is None:
+        # Django's syndication framework is sync-only
+        document = await sync_to_async(render_feed)(kind, request)
+        await note_cache().aset(key, document)
+    return views.feed_response(document, etag, version)
+
+
+# --- search_notes_view ---
+@observe('search')
+async def search_notes_view(request):
+    """Full-text search over public notes, best matches first (see notes/search.py)."""
+    query = normalize_query(request.GET.get('q'))
+    cursor, page_number = request.GET.get('cursor'), views.page_number_param(request)
+
+    one_off = has_pending_messages(request)
+    version = await apublic_notes_version()
+    etag = views.search_etag(query, cursor, page_number, version)
+    if not one_off:
+        response = not_modified(request, etag, int(version))
+        if response is not None:
+            return public_cacheable(response, settings.NOTE_LIST_MAX_AGE)
+
+    results = await asearch_page(query, cursor, views.SEARCH_RESULTS_PER_PAGE, page_number) if query else None
+    return views.search_response(request, query, results, one_off, etag, version)
+
+
+# --- note_detail_view ---
+@observe('detail')
+async def note_detail_view(request, note_id):
+    """Shows a note; see views.note_detail_response() for how the page is cached."""
+    note, note_body = await aget_cached_note(note_id)
+    return views.note_detail_response(request, note, note_body)
+
+
+# --- note_manage_view ---
+async def note_manage_view(request, note_id):
+    """Returns the edit/delete forms (with CSRF token and messages) for the detail page."""
+    note, _ = await aget_cached_note(note_id)
+    return views.note_manage_response(request, note)
+
+
+# --- edit_note_view ---
+@observe({'POST': 'edit'})
+@ratelimit('edit')
+async def edit_note_view(request, note_id):
+    if request.method != 'POST':
+        return redirect(reverse('notes:note_detail', args=[note_id]))
+
+    note, _ = await aget_cached_note(note_id)
+
+    code = views.submitted_modification_code(request, note_id, "Modification code is required.")
+    if code is None:
+        return views.detail_page(request, note)
+    if not note.code_matches(code):
+        return views.wrong_code_page(request, note)
+
+    version = views.submitted_version(request)
+    if version is None:
+        return views.bad_version_page(request, note)
+    was_public = note.is_public # Binding the form below updates the instance
+    edit_form = NoteForm(request.POST, instance=note)
+    if not edit_form.is_valid():
+        logger.warning(f"Note ID {note.id} update failed validation: {edit_form.errors.as_json()}")
+        set_outcome(request, 'invalid')
+        messages.error(request, 'Please correct the errors below.')
+        return views.detail_page(request, note, edit_form)
+
+    changes = views.edit_changes(edit_form, note, version)
+    if changes:
+        try:
+            updated = await notes_with_code(note_id, code, version).aupdate(**edit_values(changes))
+        except Exception as e:
+            logger.error(f"Error saving updated note {note_id} after validation: {e}")
+            set_outcome(request, 'error')
+            messages.error(request, 'Could not save changes due to a server error.')
+            return views.detail_page(request, note, edit_form)
+        await ainvalidate_note(note_id)
+        if not updated:
+            current, _ = await aget_cached_note(note_id)
+            return views.conflict_page(request, current, views.EDIT_CONFLICT_MESSAGE, edit_form)
+        if was_public or edit_form.cleaned_data['is_public'] or version != note.version:
+            await abump_public_notes_version()
+            change = views.public_count_change(note, version, was_public, edit_form.cleaned_data['is_public'])
+            if change is None:
+                await aforget_public_note_count()
+            else:
+                await aadjust_public_note_count(change)
+
+    logger.info(f"Note ID {note_id} updated successfully. Public: {edit_form.cleaned_data['is_public']}")
+    messages.success(request, 'Note updated successfully!')
+    return views.edited_note_redirect(note_id, version + 1 if changes else version)
+
+
+# --- delete_note_view ---
+@observe({'POST': 'delete'})
+@ratelimit('delete')
+async def delete_note_view(request, note_id):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+
+    note, _ = await aget_cached_note(note_id)
+
+    code = views.submitted_modification_code(
+        request, note_id, "Modification code is required to delete.", attempt='deleting ',
+    )
+    if code is None:
+        return views.detail_page(request, note)
+    if not note.code_matches(code):
+        return views.wrong_code_page(request, note, attempt='deleting ')
+
+    version = views.submitted_version(request)
+    if version is None:
+        return views.bad_version_page(request, note)
+    deleted, _ = await notes_with_code(note_id, code, version).adelete()
+    await ainvalidate_note(note_id)
+    if not deleted:
+        current, _ = await aget_cached_note(note_id)
+        return views.conflict_page(request, current, views.DELETE_CONFLICT_MESSAGE)
+    if note.is_public or version != note.version:
+        await abump_public_notes_version()
+        change = views.public_count_change(note, version, note.is_public, False)
+        if change is None:
+            await aforget_public_note_count()
+        else:
+            await aadjust_public_note_count(change)
+    logger.info(f"Note ID {note_id} deleted successfully.")
+    messages.success(request, 'Note deleted successfully!')
+    return redirect(reverse('home'))
+
+
+# --- random_note_view ---
+@observe('random')
+async def random_note_view(request):
+    """Redirects to a random PUBLIC note."""
+    random_id = await arandom_public_note_id()
+    if random_id is None:
+        messages.info(request, "No public GhostNotes found to display randomly.")
+        return redirect(reverse('notes:notes_list'))
+    return redirect(reverse('notes:note_detail', args=[random_id]))
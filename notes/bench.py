@@ -0,0 +1,112 @@
+"""
+Helpers shared by the benchmark management commands.
+
+Benchmarks never touch the configured database: they build a throwaway test
+database (the same way ``manage.py test`` does), seed it and tear it down.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, connections
+from django.test import Client
+
+from .models import Note
+
+
+@contextmanager
+def isolated_database(verbosity=0, keepdb=False):
+    """Runs the block against a freshly migrated test database."""
+    old_name = connection.creation.create_test_db(
+        verbosity=verbosity, autoclobber=True, serialize=False, keepdb=keepdb
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity, keepdb)
+
+
+def bench_host():
+    """A Host header value that passes ALLOWED_HOSTS outside the test runner."""
+    return next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+
+
+def bench_client(**defaults):
+    """A test client that passes ALLOWED_HOSTS outside the test runner."""
+    return Client(HTTP_HOST=bench_host(), **defaults)
+
+
+def seed_notes(count, public_ratio=0.5, content_length=200, batch_size=5000):
+    """Bulk-inserts ``count`` notes, roughly ``public_ratio`` of them public."""
+    body = ('lorem ipsum dolor sit amet ' * (content_length // 27 + 1))[:content_length]
+    every = max(1, round(1 / public_ratio)) if public_ratio else 0
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        batch = [
+            Note(
+                username=f'bench{created + i}',
+                content=body,
+                is_public=bool(every) and (created + i) % every == 0,
+            )
+            for i in range(size)
+        ]
+        for note in batch:
+            note.render_fragments()
+        Note.objects.bulk_create(batch, batch_size=batch_size)
+        created += size
+    return created
+
+
+def time_calls(func, repeat):
+    """Calls ``func`` ``repeat`` times and returns the per-call latencies in ms."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def run_load(func, concurrency, total):
+    """
+    Calls ``func()`` ``total`` times from ``concurrency`` threads.
+
+    Returns ``(latencies_ms, elapsed_s)``. Each thread closes its own database
+    connection when done, as a server worker thread would on shutdown.
+    """
+    latencies = []
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def worker():
+        local = []
+        try:
+            while True:
+                with lock:
+                    if next(counter, None) is None:
+                        break
+                start = time.perf_counter()
+                func()
+                local.append((time.perf_counter() - start) * 1000)
+        finally:
+            connections.close_all()
+            with lock:
+                latencies.extend(local)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    return latencies, time.perf_counter() - start
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
@@ -0,0 +1,176 @@
+"""
+Read-through cache for the note detail page.
+
+Each entry holds the note row together with its rendered body fragment, keyed
+by note ID, in the cache named by ``settings.NOTE_CACHE_ALIAS``. After the
+first read a note costs no database query until it is edited or deleted, at
+which point the views call ``invalidate_note()``.
+
+The same cache also keeps the public listing version: a timestamp bumped on
+every write that changes what the public list can show. List pages use it
+for their ETag and Last-Modified headers. With a shared cache backend every
+worker sees each bump and the version is kept until the next one. With the
+per-process local-memory backend a bump only reaches the worker that made
+it, so there the version expires with the cache timeout like any other entry,
+and other workers pick up a fresh one within that time. Next to it sits an approximate
+count of public notes ("Page 3 of ~120"): counted once per cache timeout and
+adjusted by the views in between, so list pages never run a COUNT(*).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.http import Http404
+from django.template.loader import render_to_string
+
+from .models import Note
+from .perf import count_cache
+from .sampling import public_notes
+
+
+def note_cache():
+    return caches[settings.NOTE_CACHE_ALIAS]
+
+
+def note_cache_key(note_id):
+    return f'note:{note_id}'
+
+
+def get_cached_note(note_id):
+    """
+    Returns ``(note, body_html)`` for ``note_id``, from the cache when possible.
+
+    Raises Http404 if the note does not exist (misses are not cached).
+    """
+    cache = note_cache()
+    key = note_cache_key(note_id)
+    entry = cache.get(key)
+    count_cache(hits=entry is not None, misses=entry is None)
+    if entry is None:
+        note = Note.objects.filter(pk=note_id).first()
+        if note is None:
+            raise Http404("No Note matches the given query.")
+        entry = (note, render_to_string('notes/note_body.html', {'note': note}))
+        cache.set(key, entry)
+    return entry
+
+
+async def aget_cached_note(note_id):
+    """Async version of get_cached_note()."""
+    cache = note_cache()
+    key = note_cache_key(note_id)
+    entry = await cache.aget(key)
+    count_cache(hits=entry is not None, misses=entry is None)
+    if entry is None:
+        note = await Note.objects.filter(pk=note_id).afirst()
+        if note is None:
+            raise Http404("No Note matches the given query.")
+        entry = (note, render_to_string('notes/note_body.html', {'note': note}))
+        await cache.aset(key, entry)
+    return entry
+
+
+def invalidate_note(note_id):
+    """Drops the cached entry for ``note_id``; call after every write to a note."""
+    note_cache().delete(note_cache_key(note_id))
+
+
+async def ainvalidate_note(note_id):
+    await note_cache().adelete(note_cache_key(note_id))
+
+
+PUBLIC_NOTES_VERSION_KEY = 'public-notes-version'
+
+
+def public_notes_version_timeout():
+    # Kept until the next bump only where every worker sees that bump
+    return DEFAULT_TIMEOUT if settings.NOTE_CACHE_PER_PROCESS else None
+
+
+def public_notes_version():
+    """Timestamp of the last change to the set of public notes."""
+    version = note_cache().get(PUBLIC_NOTES_VERSION_KEY)
+    count_cache(hits=version is not None, misses=version is None)
+    if version is None:
+        # Unknown (first use or evicted): assume it just changed
+        version = bump_public_notes_version()
+    return version
+
+
+def bump_public_notes_version():
+    """Call after creating, editing or deleting a note that is (or was) public."""
+    version = time.time()
+    note_cache().set(PUBLIC_NOTES_VERSION_KEY, version, timeout=public_notes_version_timeout())
+    return version
+
+
+async def apublic_notes_version():
+    version = await note_cache().aget(PUBLIC_NOTES_VERSION_KEY)
+    count_cache(hits=version is not None, misses=version is None)
+    if version is None:
+        version = await abump_public_notes_version()
+    return version
+
+
+async def abump_public_notes_version():
+    version = time.time()
+    await note_cache().aset(PUBLIC_NOTES_VERSION_KEY, version, timeout=public_notes_version_timeout())
+    return version
+
+
+PUBLIC_NOTE_COUNT_KEY = 'public-note-count'
+
+
+def public_note_count():
+    """About how many notes are public (exact unless writes raced an adjustment)."""
+    cache = note_cache()
+    count = cache.get(PUBLIC_NOTE_COUNT_KEY)
+    count_cache(hits=count is not None, misses=count is None)
+    if count is None:
+        # Counted again once per cache timeout, which also undoes any drift
+        count = public_notes().count()
+        cache.add(PUBLIC_NOTE_COUNT_KEY, count)
+    return count
+
+
+def adjust_public_note_count(delta):
+    """
+    Call with the change in public notes after a write (+1 for a note created
+    public or made public, -1 when one is deleted or hidden). When there is no
+    count in the cache the next read counts afresh, so nothing is lost.
+    """
+    if not delta:
+        return
+    try:
+        note_cache().incr(PUBLIC_NOTE_COUNT_KEY, delta)
+    except ValueError:
+        pass
+
+
+def forget_public_note_count():
+    """For writes that don't know how the public set changed; the next read counts."""
+    note_cache().delete(PUBLIC_NOTE_COUNT_KEY)
+
+
+async def apublic_note_count():
+    cache = note_cache()
+    count = await cache.aget(PUBLIC_NOTE_COUNT_KEY)
+    count_cache(hits=count is not None, misses=count is None)
+    if count is None:
+        count = await public_notes().acount()
+        await cache.aadd(PUBLIC_NOTE_COUNT_KEY, count)
+    return count
+
+
+async def aadjust_public_note_count(delta):
+    if not delta:
+        return
+    try:
+        await note_cache().aincr(PUBLIC_NOTE_COUNT_KEY, delta)
+    except ValueError:
+        pass
+
+
+async def aforget_public_note_count():
+    await note_cache().adelete(PUBLIC_NOTE_COUNT_KEY)
@@ -0,0 +1,37 @@
+"""
+System checks for settings that load fine but would misbehave in production.
+
+They run with every management command and ``runserver``; pass ``--deploy``
+to ``manage.py check`` to turn the warnings that matter in production into
+errors.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+PER_PROCESS_CACHE_MESSAGE = (
+    "WEB_CONCURRENCY={workers} with a local-memory note cache serves edited and deleted "
+    "notes from other workers' caches for up to NOTE_CACHE_TIMEOUT seconds."
+)
+PER_PROCESS_CACHE_HINT = "Set NOTE_CACHE_BACKEND to a shared cache backend (Redis, or filebased for one host)."
+
+
+def per_process_cache_problem(level, check_id):
+    if not (settings.NOTE_CACHE_PER_PROCESS and settings.WEB_CONCURRENCY > 1):
+        return []
+    return [level(
+        PER_PROCESS_CACHE_MESSAGE.format(workers=settings.WEB_CONCURRENCY),
+        hint=PER_PROCESS_CACHE_HINT,
+        id=check_id,
+    )]
+
+
+@register(Tags.caches)
+def check_note_cache_workers(app_configs, **kwargs):
+    """Warns when several workers would each keep their own note cache."""
+    return per_process_cache_problem(Warning, 'notes.W001')
+
+
+@register(Tags.caches, deploy=True)
+def check_note_cache_workers_deploy(app_configs, **kwargs):
+    """The same as an error for ``check --deploy``."""
+    return per_process_cache_problem(Error, 'notes.E001')
@@ -0,0 +1,78 @@
+"""
+RSS and Atom feeds of the latest public notes.
+
+Feed readers poll far more often than public notes change, so a rendered feed
+document is kept in the note cache keyed by the public listing version (and
+the host it was rendered for, since feeds carry absolute links). Polls between
+writes are answered from the cache, or with a 304, without touching the
+database; the next poll after a public note is created, edited, deleted or
+made private renders a fresh document. That holds in every worker when the
+note cache is shared. With the per-process default only the worker that took
+the write sees the new version right away; the others render a fresh document
+once their copy of the version expires (see notes/cache.py).
+"""
+from django.contrib.syndication.views import Feed
+from django.urls import reverse, reverse_lazy
+from django.utils.feedgenerator import Atom1Feed
+
+from .sampling import public_notes
+
+# Newest first, as on the recent feed page
+FEED_ORDERING = ('-created_at', '-id')
+# Notes in each feed document
+FEED_ITEMS = 50
+
+
+class LatestNotesFeed(Feed):
+    title = "Latest public GhostNotes"
+    link = reverse_lazy('notes:recent_notes')
+    description = "The newest notes users have chosen to make public."
+
+    def items(self):
+        # Feeds carry the full body as plain text; the HTML fragments aren't needed
+        return public_notes().defer('content_html', 'excerpt').order_by(*FEED_ORDERING)[:FEED_ITEMS]
+
+    def item_title(self, item):
+        return f"Note from {item.username}"
+
+    def item_description(self, item):
+        return item.content
+
+    def item_link(self, item):
+        return reverse('notes:note_detail', args=[item.pk])
+
+    def item_guid(self, item):
+        return str(item.pk)
+
+    item_guid_is_permalink = False
+
+    def item_author_name(self, item):
+        return item.username
+
+    def item_pubdate(self, item):
+        return item.created_at
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
+
+class AtomLatestNotesFeed(LatestNotesFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestNotesFeed.description
+
+
+FEEDS = {
+    'rss': LatestNotesFeed(),
+    'atom': AtomLatestNotesFeed(),
+}
+
+
+def feed_cache_key(etag):
+    # The ETag already covers the feed kind, host and public listing version
+    return 'feed:' + etag.strip('"')
+
+
+def render_feed(kind, request):
+    """Renders the feed document; returns ``(content, content_type)`` for the cache."""
+    response = FEEDS[kind](request)
+    return response.content, response['Content-Type']
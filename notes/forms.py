@@ -1,5 +1,6 @@
 from django import forms
-from .models import Note
+from django.conf import settings
+from .models import Note, generate_random_key
 
 class NoteForm(forms.ModelForm):
     """
@@ -23,3 +24,23 @@ class NoteForm(forms.ModelForm):
             # Add help text to explain what making it public means
             'is_public': 'Public notes may appear in random listings. Private notes are only accessible via their direct URL.',
         }
+
+    def clean_content(self):
+        content = self.cleaned_data['content']
+        # Bodies are stored and re-sent in full, so keep them bounded
+        limit = settings.NOTE_MAX_CONTENT_LENGTH
+        if len(content) > limit:
+            raise forms.ValidationError(
+                f"Notes can be at most {limit} characters long (this one has {len(content)})."
+            )
+        return content
+
+    def save(self, commit=True):
+        note = super().save(commit=False)
+        # A note that becomes public gets a fresh sampling key, so it lands at a
+        # new random position instead of reclaiming its old slot.
+        if note.is_public and 'is_public' in self.changed_data:
+            note.random_key = generate_random_key()
+        if commit:
+            note.save()
+        return note
@@ -0,0 +1,78 @@
+"""
+HTTP caching helpers: validators (ETag / Last-Modified), conditional GET and
+Cache-Control policies for the note pages.
+
+ETags are strong and derived from whatever fully determines the page (the
+note's ``updated_at``, or the public listing version for the list) plus the
+release, so a deploy that changes templates never answers 304 for old markup.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib import messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """Builds a strong ETag from the given parts and the current release."""
+    payload = '|'.join(str(part) for part in (settings.RELEASE_VERSION, *parts))
+    return '"%s"' % hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def note_validators(note, *variant):
+    """
+    Returns ``(etag, last_modified)`` for a page showing ``note``; ``variant``
+    tells apart different renderings of the same note. last_modified is an
+    epoch timestamp.
+    """
+    etag = make_etag('note', note.pk, note.updated_at.isoformat(), *variant)
+    return etag, int(note.updated_at.timestamp())
+
+
+def has_pending_messages(request):
+    """True when the response will carry flash messages (and so is one-off)."""
+    return len(messages.get_messages(request)) > 0
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    Returns a 304 response when the client's cached copy is still current,
+    otherwise None. Callers skip this while flash messages are waiting, since
+    the cached body would not show them.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    response.headers['ETag'] = etag
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def private_revalidate(response):
+    """The browser may keep the page but must check it with the server before reuse."""
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def public_revalidate(response):
+    """Shared caches may keep the page but must check it with the server before reuse."""
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def public_cacheable(response, max_age):
+    """Shared caches may keep the page for ``max_age`` seconds."""
+    patch_cache_control(response, public=True, max_age=max_age)
+    return response
+
+
+def never_store(response):
+    """For one-off responses such as pages carrying flash messages."""
+    patch_cache_control(response, private=True, no_store=True)
+    return response
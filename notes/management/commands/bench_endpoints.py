@@ -0,0 +1,216 @@
+import json
+import logging
+import platform
+import random
+import threading
+import uuid
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from notes.bench import bench_client, isolated_database, percentile, run_load, seed_notes
+from notes.cache import note_cache
+from notes.models import Note
+from notes.sampling import public_notes
+
+# Public notes the detail-style endpoints rotate through
+DETAIL_SAMPLE = 200
+# Latency percentiles recorded per endpoint
+PERCENTILES = (50, 95, 99)
+
+
+def endpoints(target, note_ids):
+    """
+    ``{name: (method, make_request, writes)}`` for every URL in notes/urls.py.
+    ``make_request(rng)`` returns ``(path, data)``; endpoints that write are run
+    by a single client so SQLite doesn't turn lock waits into errors (the
+    wrong-code delete never gets as far as the database).
+    """
+    code = str(target.modification_code)
+
+    def detail(name):
+        return lambda rng: (reverse(name, args=[rng.choice(note_ids)]), None)
+
+    def seeded_list(name):
+        return lambda rng: (reverse(name), {'seed': f'{rng.getrandbits(32):08x}'})
+
+    return {
+        'notes_list': ('GET', seeded_list('notes:notes_list'), False),
+        'random_notes_list': ('GET', seeded_list('notes:random_notes_list'), False),
+        'create_note (form)': ('GET', lambda rng: (reverse('notes:create_note'), None), False),
+        'create_note': ('POST', lambda rng: (reverse('notes:create_note'), {
+            'username': 'bench', 'content': 'Benchmark note.', 'is_public': rng.random() < 0.5,
+        }), True),
+        'recent_notes': ('GET', lambda rng: (reverse('notes:recent_notes'), None), False),
+        'feed_rss': ('GET', lambda rng: (reverse('notes:feed_rss'), None), False),
+        'feed_atom': ('GET', lambda rng: (reverse('notes:feed_atom'), None), False),
+        'search_notes': ('GET', lambda rng: (reverse('notes:search_notes'), {'q': rng.choice(['lorem', 'dolor sit'])}), False),
+        'note_detail': ('GET', detail('notes:note_detail'), False),
+        'note_manage': ('GET', detail('notes:note_manage'), False),
+        'edit_note': ('POST', lambda rng: (reverse('notes:edit_note', args=[target.pk]), {
+            'username': 'target', 'content': f'Edited {rng.random()}.', 'is_public': True, 'modification_code': code,
+        }), True),
+        'delete_note (wrong code)': ('POST', lambda rng: (reverse('notes:delete_note', args=[target.pk]), {
+            'modification_code': str(uuid.UUID(int=rng.getrandbits(128))),
+        }), False),
+        'random_note': ('GET', lambda rng: (reverse('notes:random_note'), None), False),
+    }
+
+
+def find_regressions(baseline, results, threshold, min_delta_ms):
+    """
+    Compares a run to a baseline (both as written by --save). Returns one
+    message per endpoint whose p95 latency grew or throughput fell by more
+    than ``threshold`` (a fraction), or that now runs more queries.
+    Latency changes under ``min_delta_ms`` are ignored as noise.
+    """
+    problems = []
+    for size, measured in results['sizes'].items():
+        base_size = baseline.get('sizes', {}).get(size, {})
+        for name, now in measured.items():
+            before = base_size.get(name)
+            if before is None:
+                continue
+            label = f"{name} @ {size} notes"
+            if now['p95_ms'] > before['p95_ms'] * (1 + threshold) and now['p95_ms'] - before['p95_ms'] >= min_delta_ms:
+                problems.append(f"{label}: p95 {before['p95_ms']:.2f} -> {now['p95_ms']:.2f} ms")
+            if now['rps'] < before['rps'] / (1 + threshold):
+                problems.append(f"{label}: throughput {before['rps']:.1f} -> {now['rps']:.1f} req/s")
+            if round(now['queries'], 1) > round(before['queries'], 1):
+                problems.append(f"{label}: queries per request {before['queries']:.1f} -> {now['queries']:.1f}")
+            if now['errors'] > before['errors']:
+                problems.append(f"{label}: errors {before['errors']} -> {now['errors']}")
+    return problems
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives every URL in notes/urls.py with an in-process load generator "
+        "against a throwaway database seeded with public and private notes. "
+        "Records throughput, p50/p95/p99 latency and queries per request, can "
+        "save the run as a JSON baseline and fails when a run regresses past "
+        "--threshold compared to one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000',
+                            help="Comma-separated total note counts to measure (e.g. 10000,1000000).")
+        parser.add_argument('--public-ratio', type=float, default=0.5, help="Share of seeded notes that are public.")
+        parser.add_argument('--requests', type=int, default=300, help="Timed requests per endpoint and size.")
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help="Concurrent clients for read endpoints (writes always use one).")
+        parser.add_argument('--warmup', type=int, default=20, help="Untimed requests per endpoint first.")
+        parser.add_argument('--query-samples', type=int, default=20,
+                            help="Requests per endpoint whose queries are counted.")
+        parser.add_argument('--endpoints', help="Comma-separated endpoint names to run (default: all).")
+        parser.add_argument('--seed', type=int, default=1, help="Random seed, so runs issue the same requests.")
+        parser.add_argument('--save', metavar='PATH', help="Write the results to PATH as JSON.")
+        parser.add_argument('--baseline', metavar='PATH', help="Compare against a JSON file written by --save.")
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help="Allowed regression against the baseline, as a fraction (0.25 = 25%%).")
+        parser.add_argument('--min-delta-ms', type=float, default=0.5,
+                            help="Ignore p95 changes smaller than this many milliseconds.")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options['sizes'].split(','))
+        except ValueError:
+            raise CommandError("--sizes must be a comma-separated list of integers.")
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Can't read baseline {options['baseline']}: {e}")
+
+        results = {
+            'meta': {
+                'vendor': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                **{key: options[key] for key in (
+                    'public_ratio', 'requests', 'concurrency', 'warmup', 'query_samples', 'seed',
+                )},
+            },
+            'sizes': {},
+        }
+        # Rate limits would turn a benchmark into a 429 benchmark, and the
+        # views' log lines (a warning per wrong code) would bury the table
+        logging.disable(logging.WARNING)
+        try:
+            with override_settings(RATELIMIT_ENABLED=False, PERF_SAMPLE_RATE=0), isolated_database():
+                random.seed(options['seed']) # Seeded sampling keys, so runs see the same data
+                seeded = 0
+                for size in sizes:
+                    seeded += seed_notes(size - seeded, public_ratio=options['public_ratio'])
+                    with connection.cursor() as cursor:
+                        cursor.execute('ANALYZE')
+                    results['sizes'][str(size)] = self.bench_size(size, options)
+        finally:
+            logging.disable(logging.NOTSET)
+
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Saved results to {options['save']}.")
+        if baseline is not None:
+            problems = find_regressions(baseline, results, options['threshold'], options['min_delta_ms'])
+            if problems:
+                raise CommandError("Regressions against the baseline:\n  " + "\n  ".join(problems))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    def bench_size(self, size, options):
+        note_cache().clear()
+        target = Note.objects.create(username='target', content='Edited by the benchmark.', is_public=True)
+        note_ids = list(public_notes().values_list('pk', flat=True)[:DETAIL_SAMPLE])
+        selected = options['endpoints'].split(',') if options['endpoints'] else None
+        measured = {}
+
+        self.stdout.write(f"\n{size} notes")
+        self.stdout.write(
+            f"{'endpoint':<26} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'errors':>7}"
+        )
+        for name, (method, make_request, writes) in endpoints(target, note_ids).items():
+            if selected and name not in selected:
+                continue
+            # Each endpoint gets its own deterministic request sequence
+            rng = random.Random(f"{options['seed']}:{size}:{name}")
+            lock = threading.Lock()
+            local = threading.local()
+            errors = []
+
+            def hit():
+                client = getattr(local, 'client', None)
+                if client is None:
+                    client = local.client = bench_client(raise_request_exception=False)
+                with lock:
+                    path, data = make_request(rng)
+                response = client.post(path, data) if method == 'POST' else client.get(path, data)
+                if response.status_code >= 500:
+                    errors.append(response.status_code)
+
+            for _ in range(options['warmup']):
+                hit()
+            errors.clear()
+            latencies, elapsed = run_load(hit, 1 if writes else options['concurrency'], options['requests'])
+
+            samples = max(1, options['query_samples'])
+            with CaptureQueriesContext(connection) as ctx:
+                for _ in range(samples):
+                    hit()
+
+            row = measured[name] = {
+                'rps': round(len(latencies) / elapsed, 1),
+                **{f'p{pct}_ms': round(percentile(latencies, pct), 3) for pct in PERCENTILES},
+                'queries': round(len(ctx.captured_queries) / samples, 2),
+                'errors': len(errors),
+            }
+            self.stdout.write(
+                f"{name:<26} {row['rps']:>8.1f} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} "
+                f"{row['p99_ms']:>8.2f} {row['queries']:>8.2f} {row['errors']:>7}"
+            )
+        return measured
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from notes.bench import percentile, time_calls
+from notes.models import Note
+from notes.pagination import KeysetPage
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the list and detail templates with and without the stored "
+        "content_html/excerpt fragments. Needs no database: the notes are "
+        "built in memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--content-kb', type=int, default=32, help="Size of each note body in KiB.")
+        parser.add_argument('--per-page', type=int, default=10, help="Notes on the list page.")
+        parser.add_argument('--repeat', type=int, default=300, help="Renders timed per template and mode.")
+
+    def handle(self, *args, **options):
+        # Markup-heavy text, so escaping has real work to do
+        chunk = '<b>"Ghost" & friends</b> say hi. '
+        body = (chunk * (options['content_kb'] * 1024 // len(chunk) + 1))[:options['content_kb'] * 1024]
+        request = RequestFactory().get('/')
+
+        def notes(stored):
+            built = []
+            for i in range(options['per_page']):
+                note = Note(username=f'bench{i}', content=body, is_public=True)
+                if stored:
+                    note.render_fragments()
+                built.append(note)
+            return built
+
+        self.stdout.write(f"{'template':<10} {'fragments':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for stored in (False, True):
+            page = KeysetPage(notes(stored), 1)
+            note = page.object_list[0]
+            timings = {
+                'list': lambda: render_to_string(
+                    'notes/random_notes_list.html', {'notes_page': page, 'seed': '0'}, request),
+                'detail': lambda: render_to_string('notes/note_body.html', {'note': note}),
+            }
+            for name, render in timings.items():
+                samples = time_calls(render, options['repeat'])
+                self.stdout.write(
+                    f"{name:<10} {'stored' if stored else 'rendered':<10} {percentile(samples, 50):>8.3f} "
+                    f"{percentile(samples, 95):>8.3f} {percentile(samples, 99):>8.3f}"
+                )
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.bench import isolated_database, percentile, seed_notes, time_calls
+from notes.sampling import random_public_note_id, shuffled_public_notes
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks random public note selection at growing table sizes in a "
+        "throwaway database. Latency should stay flat as the table grows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='10000,100000,1000000',
+            help="Comma-separated total note counts to measure (e.g. 10000,10000000).",
+        )
+        parser.add_argument('--repeat', type=int, default=500, help="Lookups timed per size.")
+        parser.add_argument('--public-ratio', type=float, default=0.5)
+        parser.add_argument(
+            '--naive', action='store_true',
+            help="Also time the old ORDER BY RANDOM() query for comparison (slow on big tables).",
+        )
+        parser.add_argument('--keepdb', action='store_true', help="Keep the benchmark database afterwards.")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options['sizes'].split(','))
+        except ValueError:
+            raise CommandError("--sizes must be a comma-separated list of integers.")
+        repeat = options['repeat']
+
+        with isolated_database(keepdb=options['keepdb']):
+            seeded = 0
+            self.stdout.write(f"{'notes':>10} {'query':<14} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+            for size in sizes:
+                # Grow the table incrementally so each size reuses the previous rows
+                seeded += seed_notes(size - seeded, public_ratio=options['public_ratio'])
+
+                timings = {
+                    'random_note': time_calls(random_public_note_id, repeat),
+                    'list_page': time_calls(lambda: list(shuffled_public_notes()[:10]), repeat),
+                }
+                if options['naive']:
+                    timings['order_by_?'] = time_calls(
+                        lambda: list(shuffled_public_notes().order_by('?')[:10]), max(1, repeat // 50)
+                    )
+                for name, samples in timings.items():
+                    self.stdout.write(
+                        f"{size:>10} {name:<14} {percentile(samples, 50):>8.3f} "
+                        f"{percentile(samples, 95):>8.3f} {percentile(samples, 99):>8.3f}"
+                    )
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from notes.bench import isolated_database, percentile, seed_notes, time_calls
+from notes.pagination import encode_cursor, keyset_page
+from notes.sampling import public_notes
+from notes.views import PUBLIC_NOTES_PER_PAGE, RECENT_ORDERING
+
+
+class Command(BaseCommand):
+    help = (
+        "Times page 1 and a deep page of the recent public notes feed in a "
+        "throwaway database. With keyset cursors both should cost the same."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notes', type=int, default=200000, help="Notes to seed (about half public).")
+        parser.add_argument('--depth', type=int, default=10000, help="Page number to compare against page 1.")
+        parser.add_argument('--repeat', type=int, default=500, help="Page loads timed per page.")
+        parser.add_argument('--keepdb', action='store_true', help="Keep the benchmark database afterwards.")
+
+    def handle(self, *args, **options):
+        with isolated_database(keepdb=options['keepdb']):
+            seed_notes(options['notes'])
+            # The cursor a visitor would hold after clicking "older" depth - 1 times
+            # (found once with OFFSET here, never by the feed itself)
+            offset = min((options['depth'] - 1) * PUBLIC_NOTES_PER_PAGE, public_notes().count()) - 1
+            last = public_notes().order_by(*RECENT_ORDERING)[max(offset, 0)]
+            deep_cursor = encode_cursor('n', 0, [last.created_at, last.id])
+
+            def load(cursor):
+                return lambda: list(keyset_page([public_notes()], RECENT_ORDERING, cursor, PUBLIC_NOTES_PER_PAGE))
+
+            self.stdout.write(f"{'page':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+            for page, cursor in ((1, None), (offset // PUBLIC_NOTES_PER_PAGE + 2, deep_cursor)):
+                samples = time_calls(load(cursor), options['repeat'])
+                self.stdout.write(
+                    f"{page:>8} {percentile(samples, 50):>8.3f} "
+                    f"{percentile(samples, 95):>8.3f} {percentile(samples, 99):>8.3f}"
+                )
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from notes.bench import isolated_database, percentile, seed_notes, time_calls
+from notes.models import Note
+from notes.search import search_page
+from notes.sampling import public_notes
+
+# Word that only the planted notes contain
+RARE_WORD = 'zephyr'
+# Word in every seeded note body
+COMMON_WORD = 'lorem'
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks full-text search at growing table sizes in a throwaway "
+        "database, against the naive icontains scan with --naive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000,1000000',
+                            help="Comma-separated total note counts to measure.")
+        parser.add_argument('--repeat', type=int, default=200, help="Searches timed per size and query.")
+        parser.add_argument('--planted', type=int, default=50,
+                            help=f"Public notes containing '{RARE_WORD}' at each size.")
+        parser.add_argument('--naive', action='store_true',
+                            help="Also time content__icontains (a full scan; slow on big tables).")
+        parser.add_argument('--keepdb', action='store_true', help="Keep the benchmark database afterwards.")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options['sizes'].split(','))
+        except ValueError:
+            raise CommandError("--sizes must be a comma-separated list of integers.")
+        repeat = options['repeat']
+
+        with isolated_database(keepdb=options['keepdb']):
+            seeded = 0
+            self.stdout.write(f"{'notes':>10} {'query':<22} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+            for size in sizes:
+                planted = options['planted']
+                seeded += seed_notes(size - seeded - planted)
+                Note.objects.bulk_create([
+                    Note(username=f'planted{seeded + i}', content=f'A note about the {RARE_WORD} wind.', is_public=True)
+                    for i in range(planted)
+                ])
+                seeded += planted
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+
+                timings = {}
+                for word in (RARE_WORD, COMMON_WORD):
+                    timings[f'fts {word}'] = time_calls(lambda: list(search_page(word, None, 10)), repeat)
+                    if options['naive']:
+                        naive = public_notes().filter(Q(content__icontains=word) | Q(username__icontains=word))
+                        timings[f'icontains {word}'] = time_calls(
+                            lambda: list(naive.order_by('id')[:11]), max(1, repeat // 20)
+                        )
+                for name, samples in timings.items():
+                    self.stdout.write(
+                        f"{size:>10} {name:<22} {percentile(samples, 50):>8.3f} "
+                        f"{percentile(samples, 95):>8.3f} {percentile(samples, 99):>8.3f}"
+                    )
@@ -0,0 +1,146 @@
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from notes.bench import bench_host, isolated_database, percentile, run_load, seed_notes
+from notes.models import Note
+
+MODES = ('wsgi', 'asgi')
+
+
+def serve_wsgi():
+    """Django's threaded WSGI server (a thread per request, like gunicorn --threads)."""
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadedWSGIServer):
+        request_queue_size = 1024 # Same listen backlog as the ASGI socket
+
+    server = Server(('127.0.0.1', 0), QuietHandler)
+    server.set_app(get_wsgi_application())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    return thread, server.shutdown, server.server_address[1]
+
+
+def serve_asgi():
+    """uvicorn running the ASGI application on one event loop."""
+    try:
+        import uvicorn
+    except ImportError:
+        raise CommandError("The ASGI benchmark needs uvicorn (pip install uvicorn).")
+    from django.core.asgi import get_asgi_application
+
+    sock = socket.create_server(('127.0.0.1', 0), backlog=1024)
+    server = uvicorn.Server(uvicorn.Config(get_asgi_application(), lifespan='off', log_level='warning'))
+
+    def stop():
+        server.should_exit = True
+
+    thread = threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True)
+    return thread, stop, sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares throughput and tail latency of the note pages served over WSGI "
+        "(sync views) and ASGI (async views) at growing concurrency. Each server "
+        "runs in its own process against a throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default='wsgi,asgi', help="Comma-separated servers to compare.")
+        parser.add_argument('--concurrency', default='1,10,50,100',
+                            help="Comma-separated numbers of concurrent clients.")
+        parser.add_argument('--requests', type=int, default=1000, help="Requests per concurrency level.")
+        parser.add_argument('--notes', type=int, default=2000, help="Notes seeded before the run.")
+        # Internal: run one server and wait for the parent to close stdin
+        parser.add_argument('--serve', choices=MODES, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['serve']:
+            return self.serve(options['serve'], options['notes'])
+
+        modes = [mode for mode in options['modes'].split(',') if mode]
+        if not set(modes) <= set(MODES):
+            raise CommandError(f"--modes must only contain {', '.join(MODES)}.")
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError("--concurrency must be a comma-separated list of integers.")
+
+        self.stdout.write(f"{'server':>6} {'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for mode in modes:
+            for level, rate, latencies, errors in self.bench(mode, levels, options['requests'], options['notes']):
+                self.stdout.write(
+                    f"{mode:>6} {level:>8} {rate:>8.1f} {percentile(latencies, 50):>8.2f} "
+                    f"{percentile(latencies, 99):>8.2f} {errors:>7}"
+                )
+
+    def bench(self, mode, levels, total, notes):
+        """Starts a server process for ``mode`` and yields one result row per level."""
+        env = dict(os.environ, NOTES_ASYNC_VIEWS=str(mode == 'asgi'))
+        server = subprocess.Popen(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'bench_servers',
+             '--serve', mode, '--notes', str(notes)],
+            cwd=settings.BASE_DIR, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        )
+        try:
+            ready = server.stdout.readline()
+            if not ready:
+                raise CommandError(f"The {mode} server failed to start.")
+            ready = json.loads(ready)
+            host, port, paths = bench_host(), ready['port'], ready['paths']
+            local = threading.local()
+            errors = []
+
+            def hit():
+                # A new connection per request, since the WSGI server has no keep-alive
+                local.turn = getattr(local, 'turn', 0) + 1
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                try:
+                    conn.request('GET', paths[local.turn % len(paths)], headers={'Host': host})
+                    response = conn.getresponse()
+                    response.read()
+                    if response.status >= 500:
+                        errors.append(response.status)
+                finally:
+                    conn.close()
+
+            for level in levels:
+                errors.clear()
+                latencies, elapsed = run_load(hit, level, total)
+                yield level, len(latencies) / elapsed, latencies, len(errors)
+        finally:
+            server.stdin.close()
+            server.wait(timeout=60)
+
+    def serve(self, mode, notes):
+        with isolated_database():
+            seed_notes(notes)
+            note = Note.objects.filter(is_public=True).first()
+            paths = [
+                reverse('notes:notes_list'),
+                reverse('notes:note_detail', args=[note.pk]),
+                reverse('notes:random_note'),
+            ]
+            thread, stop, port = (serve_asgi if mode == 'asgi' else serve_wsgi)()
+            thread.start()
+            self.stdout.write(json.dumps({'port': port, 'paths': paths}))
+            self.stdout.flush()
+            # Serve until the parent is done with us
+            sys.stdin.read()
+            stop()
+            thread.join(timeout=10)
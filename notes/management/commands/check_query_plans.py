@@ -0,0 +1,86 @@
+import re
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from notes.bench import isolated_database, seed_notes
+from notes.models import Note, notes_with_code
+from notes.pagination import combined_runs
+from notes.sampling import RANDOM_PICK_WINDOW, SHUFFLE_ORDERING, public_notes, shuffle_segments
+from notes.search import SEARCH_ORDERING, search_queryset
+from notes.views import RECENT_ORDERING
+
+# How a full-table scan of notes_note shows up in each backend's EXPLAIN output
+SEQ_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on notes_note\b'),
+    'sqlite': re.compile(r'\bSCAN (TABLE )?notes_note\b(?! USING)'),
+}
+
+
+def view_queries(note_id):
+    """The querysets issued by notes/views.py and notes/api.py, keyed by a readable name."""
+    first_run, wrapped_run = shuffle_segments(0.5)
+    return {
+        'detail': Note.objects.filter(pk=note_id),
+        'list page (from pivot)': first_run.order_by(*SHUFFLE_ORDERING)[:11],
+        'list page (wrapped)': wrapped_run.order_by(*SHUFFLE_ORDERING)[:11],
+        'list page (cursor)': first_run.filter(random_key__gt=0.75).order_by(*SHUFFLE_ORDERING)[:11],
+        # Both runs in one query, as keyset_page() fetches them where it can
+        'list page (both runs)': combined_runs(
+            [(0, first_run.order_by(*SHUFFLE_ORDERING)), (1, wrapped_run.order_by(*SHUFFLE_ORDERING))],
+            SHUFFLE_ORDERING, True, 11,
+        ),
+        # Scans the same rows as the COUNT behind "Page N of ~M" (run once per cache timeout)
+        'public note count': public_notes().values('pk'),
+        'random note': public_notes().filter(random_key__gte=0.5).order_by(*SHUFFLE_ORDERING).values_list('id', flat=True)[:RANDOM_PICK_WINDOW],
+        # Same WHERE clause as the conditional UPDATE/DELETE
+        'edit/delete (code check)': notes_with_code(note_id, uuid.uuid4()),
+        'recent page': public_notes().order_by(*RECENT_ORDERING)[:11],
+        'recent page (cursor)': public_notes().filter(created_at__lt=timezone.now()).order_by(*RECENT_ORDERING)[:11],
+        'search': search_queryset('lorem ipsum').order_by(*SEARCH_ORDERING)[:11],
+        'api batch fetch': Note.objects.filter(pk__in=[note_id]).values('id', 'username'),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a throwaway database, runs EXPLAIN on every query the note views "
+        "issue and fails if any plan scans the whole notes table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help="Notes to seed before explaining.")
+        parser.add_argument('--keepdb', action='store_true', help="Keep the seeded database afterwards.")
+
+    def handle(self, *args, **options):
+        pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f"Don't know how to read query plans from {connection.vendor}.")
+
+        with isolated_database(keepdb=options['keepdb']):
+            seed_notes(options['rows'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            note_id = Note.objects.values_list('pk', flat=True).first()
+
+            failures = []
+            with transaction.atomic():
+                if connection.vendor == 'postgresql':
+                    # On a small seeded table Postgres may rightly prefer a seq scan;
+                    # disabling it makes the plan show whether an index *can* serve the query.
+                    with connection.cursor() as cursor:
+                        cursor.execute('SET LOCAL enable_seqscan = off')
+                for name, queryset in view_queries(note_id).items():
+                    plan = queryset.explain()
+                    verdict = 'SEQ SCAN' if pattern.search(plan) else 'ok'
+                    self.stdout.write(f"{name}: {verdict}")
+                    if options['verbosity'] > 1 or verdict != 'ok':
+                        self.stdout.write(f"  {queryset.query}\n  " + plan.replace('\n', '\n  '))
+                    if verdict != 'ok':
+                        failures.append(name)
+
+        if failures:
+            raise CommandError(f"Sequential scans in: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("Every view query is served by an index."))
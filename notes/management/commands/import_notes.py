@@ -0,0 +1,124 @@
+import json
+import sys
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from notes.cache import bump_public_notes_version, forget_public_note_count
+from notes.models import Note, hash_modification_code
+
+from .export_notes import export_fields, open_ndjson
+
+
+@contextmanager
+def preserved_timestamps():
+    """Stops auto_now/auto_now_add from overwriting the imported timestamps."""
+    fields = [field for field in Note._meta.concrete_fields if getattr(field, 'auto_now', False)
+              or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+# Derived from content, and shown unescaped: never trusted from the file
+RENDERED_FIELDS = ('content_html', 'excerpt')
+
+
+def note_from_row(row, fields):
+    note = Note(**{
+        name: field.to_python(row[name])
+        for name, field in fields.items() if name in row and name not in RENDERED_FIELDS
+    })
+    if 'code_hash' not in row and row.get('modification_code'):
+        # Export from before only the hashes were stored
+        note.code_hash = hash_modification_code(row['modification_code'])
+    note.render_fragments()
+    return note
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads notes from an NDJSON export in batches with bulk_create. Each batch "
+        "commits on its own, so a failed import can be resumed with --skip. "
+        "Running workers see imported public notes at once only with a shared "
+        "note cache (NOTE_CACHE_BACKEND); with the per-process default they "
+        "show up once the workers' cached listing version expires."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', nargs='?', default='-',
+                            help="File to read (.gz is decompressed); '-' or omitted for stdin.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Notes inserted per batch.")
+        parser.add_argument('--skip', type=int, default=0,
+                            help="Lines already imported by an earlier run (printed when an import fails).")
+        parser.add_argument('--ignore-existing', action='store_true',
+                            help="Skip notes whose ID already exists instead of failing.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive.")
+        fields = {name: Note._meta.get_field(name) for name in export_fields()}
+
+        stream = open_ndjson(options['input'], 'r')
+        lines = islice(stream or sys.stdin, options['skip'], None)
+        done = options['skip']
+        imported = skipped = 0
+        any_public = False
+        started = time.perf_counter()
+        try:
+            with preserved_timestamps():
+                while True:
+                    batch = list(islice(lines, batch_size))
+                    if not batch:
+                        break
+                    try:
+                        notes = [note_from_row(json.loads(line), fields) for line in batch if line.strip()]
+                        if options['ignore_existing']:
+                            # Leave out what is already there, so the counts
+                            # below only cover notes this run inserts
+                            existing = set(Note.objects.filter(pk__in=[note.pk for note in notes])
+                                           .values_list('pk', flat=True))
+                            skipped += len(existing)
+                            notes = [note for note in notes if note.pk not in existing]
+                        with transaction.atomic():
+                            Note.objects.bulk_create(notes, ignore_conflicts=options['ignore_existing'])
+                    except Exception as e:
+                        raise CommandError(
+                            f"Batch starting at line {done + 1} failed: {e}\n"
+                            f"{done} lines are imported; resume with --skip {done}."
+                        )
+                    done += len(batch)
+                    imported += len(notes)
+                    any_public = any_public or any(note.is_public for note in notes)
+                    elapsed = time.perf_counter() - started
+                    self.stderr.write(f"{done} lines done, {imported / max(elapsed, 1e-9):.0f} notes/s")
+        finally:
+            if stream is not None:
+                stream.close()
+            # Imports only add notes, so cached ones stay valid; the public list may
+            # grow (by how much isn't known when existing notes were skipped).
+            # Both only reach the web workers through a shared note cache.
+            if any_public:
+                bump_public_notes_version()
+                forget_public_note_count()
+                if settings.NOTE_CACHE_PER_PROCESS:
+                    self.stderr.write(
+                        "The note cache is per process, so running workers list the new public "
+                        f"notes within {settings.CACHES[settings.NOTE_CACHE_ALIAS]['TIMEOUT']} s, not right away."
+                    )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} notes in {elapsed:.1f} s ({imported / max(elapsed, 1e-9):.0f} notes/s)"
+            + (f", skipped {skipped} existing." if options['ignore_existing'] else ".")
+        ))
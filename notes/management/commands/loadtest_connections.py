@@ -0,0 +1,89 @@
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.urls import reverse
+
+from notes.bench import bench_client, isolated_database, percentile, run_load, seed_notes
+
+# Connections to the benchmark database, excluding the monitor's own
+ACTIVE_CONNECTIONS_SQL = (
+    "SELECT count(*) FROM pg_stat_activity "
+    "WHERE datname = current_database() AND pid <> pg_backend_pid()"
+)
+
+
+class ConnectionMonitor(threading.Thread):
+    """Samples pg_stat_activity in the background and remembers the peak."""
+
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            with connection.cursor() as cursor:
+                while not self.stopped.wait(self.interval):
+                    cursor.execute(ACTIVE_CONNECTIONS_SQL)
+                    self.peak = max(self.peak, cursor.fetchone()[0])
+        finally:
+            connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests the note views at growing concurrency against a local Postgres "
+        "and reports the peak number of server connections for the configured "
+        "DB_CONN_STRATEGY."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', default='1,5,10,25,50',
+                            help="Comma-separated thread counts to try.")
+        parser.add_argument('--requests', type=int, default=500, help="Requests per concurrency level.")
+        parser.add_argument('--max-connections', type=int, default=None,
+                            help="Fail if the peak connection count ever exceeds this.")
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Connection load tests need PostgreSQL (set DATABASE_URL).")
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError("--concurrency must be a comma-separated list of integers.")
+
+        self.stdout.write(f"Strategy: {settings.DB_CONN_STRATEGY}")
+        worst = 0
+        with isolated_database(keepdb=options['keepdb']):
+            seed_notes(2000)
+            urls = [reverse('notes:random_note'), reverse('notes:notes_list')]
+            local = threading.local()
+
+            def hit():
+                # One client per thread, like one server worker thread
+                if not hasattr(local, 'client'):
+                    local.client, local.turn = bench_client(), 0
+                local.turn += 1
+                local.client.get(urls[local.turn % len(urls)])
+
+            self.stdout.write(f"{'threads':>8} {'peak conns':>11} {'req/s':>8} {'p99 ms':>8}")
+            for level in levels:
+                monitor = ConnectionMonitor()
+                monitor.start()
+                latencies, elapsed = run_load(hit, level, options['requests'])
+                monitor.stopped.set()
+                monitor.join()
+                worst = max(worst, monitor.peak)
+                self.stdout.write(
+                    f"{level:>8} {monitor.peak:>11} {len(latencies) / elapsed:>8.1f} "
+                    f"{percentile(latencies, 99):>8.2f}"
+                )
+            connections.close_all()
+
+        limit = options['max_connections']
+        if limit is not None and worst > limit:
+            raise CommandError(f"Peak of {worst} connections exceeds the limit of {limit}.")
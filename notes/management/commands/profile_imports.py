@@ -0,0 +1,79 @@
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: load the WSGI app the way the serverless runtime
+# does, then serve one request so the URLconf, views and templates load too.
+COLD_START_SCRIPT = """
+from wsgiref.util import setup_testing_defaults
+from ghostnote_project.wsgi import application
+
+environ = {'PATH_INFO': '/', 'HTTP_HOST': 'localhost'}
+setup_testing_defaults(environ)
+status = []
+body = application(environ, lambda code, headers, exc_info=None: status.append(code))
+b''.join(body)
+print(status[0])
+"""
+
+
+def parse_importtime(stderr):
+    """Yields (module, self_us, cumulative_us) from ``python -X importtime`` output."""
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        yield module.strip(), int(self_us), int(cumulative_us)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures cold-start import time in a fresh interpreter (loading the WSGI "
+        "app and serving one request), prints a per-package breakdown and fails "
+        "when the total exceeds the budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--budget-ms', type=float, default=None,
+            help="Import time budget in ms (default: settings.COLD_START_BUDGET_MS).",
+        )
+        parser.add_argument('--slim', action='store_true', help="Profile with DJANGO_SLIM=True.")
+        parser.add_argument('--top', type=int, default=15, help="How many packages and modules to list.")
+
+    def handle(self, *args, **options):
+        budget = options['budget_ms'] if options['budget_ms'] is not None else settings.COLD_START_BUDGET_MS
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'ghostnote_project.settings'))
+        if options['slim']:
+            env['DJANGO_SLIM'] = 'True'
+
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', COLD_START_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Cold start failed:\n{result.stderr[-2000:]}")
+
+        modules = list(parse_importtime(result.stderr))
+        by_package = defaultdict(int)
+        for module, self_us, _ in modules:
+            by_package[module.split('.')[0]] += self_us
+        total_ms = sum(by_package.values()) / 1000
+
+        top = options['top']
+        self.stdout.write(f"Cold start: {len(modules)} modules, {total_ms:.1f} ms of import time "
+                          f"(budget {budget:.0f} ms), first request -> {result.stdout.strip()}")
+        self.stdout.write("\nBy top-level package (self time):")
+        for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f"  {self_us / 1000:>8.1f} ms  {package}")
+        self.stdout.write("\nSlowest modules (cumulative):")
+        for module, _, cumulative_us in sorted(modules, key=lambda item: -item[2])[:top]:
+            self.stdout.write(f"  {cumulative_us / 1000:>8.1f} ms  {module}")
+
+        if total_ms > budget:
+            raise CommandError(f"Cold start import time {total_ms:.1f} ms exceeds the {budget:.0f} ms budget.")
+        self.stdout.write(self.style.SUCCESS(f"Within budget ({total_ms:.1f} / {budget:.0f} ms)."))
@@ -0,0 +1,382 @@
+"""
+Prometheus-style metrics for note operations, served on ``/metrics``.
+
+A small in-process registry of counters and latency histograms. Views are
+wrapped with ``observe(operation)``, which counts every request by outcome
+(ok, not_found, bad_code, conflict, invalid, rate_limited, error) and times
+it into a histogram.
+
+With several worker processes (pre-forked gunicorn, for instance) each one
+only sees its own requests. Setting ``METRICS_MULTIPROC_DIR`` makes every
+process write its values to ``<dir>/ghostnote-<pid>-<start>.json`` from a
+background thread every ``METRICS_FLUSH_INTERVAL`` seconds (and on exit),
+never on the request path; whichever worker answers a scrape adds up the
+files of all of them. The start time in the name keeps a new process that
+reuses a PID from mixing its values with the old one's. On each scrape the
+files of processes that have exited are folded into ``ghostnote-retired.json``
+and removed, so counters never go backwards and files don't pile up.
+
+``/metrics`` answers only with the ``METRICS_TOKEN`` bearer token, or to
+anyone when ``DEBUG`` is on; without a token it is off in production.
+"""
+import atexit
+import bisect
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+# Seconds; the upper bounds of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+logger = logging.getLogger(__name__)
+
+# ghostnote-<pid>-<start in microseconds>.json
+PROCESS_FILE = re.compile(r'^ghostnote-(\d+)-(\d+)\.json$')
+RETIRED_FILE = 'ghostnote-retired.json'
+LOCK_FILE = 'ghostnote.lock'
+
+# Outcome for the response status when the view didn't set one itself
+STATUS_OUTCOMES = {400: 'invalid', 403: 'bad_code', 404: 'not_found', 409: 'conflict', 429: 'rate_limited'}
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, registry, name, documentation, labelnames):
+        self.registry, self.name, self.documentation, self.labelnames = registry, name, documentation, labelnames
+
+    def inc(self, amount=1, **labels):
+        self.registry.update(self.name, labels, lambda value: (value or 0) + amount)
+
+    def lines(self, values):
+        for key, value in sorted(values.items()):
+            yield f'{self.name}{format_labels(self.labelnames, json.loads(key))} {format_value(value)}'
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        self.registry, self.name, self.documentation, self.labelnames = registry, name, documentation, labelnames
+        self.buckets = tuple(buckets)
+
+    def observe(self, amount, **labels):
+        # Stored per bucket (not cumulative) plus the sum, so values from
+        # several processes add up element by element
+        index = bisect.bisect_left(self.buckets, amount)
+
+        def add(value):
+            value = value or [0] * (len(self.buckets) + 2)
+            value[index] += 1
+            value[-1] += amount
+            return value
+        self.registry.update(self.name, labels, add)
+
+    def lines(self, values):
+        bounds = [format_value(bound) for bound in self.buckets] + ['+Inf']
+        for key, value in sorted(values.items()):
+            label_values = json.loads(key)
+            total = 0
+            for bound, count in zip(bounds, value[:-1]):
+                total += count
+                labels = format_labels(self.labelnames + ('le',), label_values + [bound])
+                yield f'{self.name}_bucket{labels} {format_value(total)}'
+            labels = format_labels(self.labelnames, label_values)
+            yield f'{self.name}_sum{labels} {format_value(value[-1])}'
+            yield f'{self.name}_count{labels} {format_value(total)}'
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    pairs = (
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    )
+    return '{' + ','.join(pairs) + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def merge(into, values):
+    """Adds one process's values to ``into`` (counters and histograms alike sum up)."""
+    for name, series in values.items():
+        merged = into.setdefault(name, {})
+        for key, value in series.items():
+            if key not in merged:
+                merged[key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                merged[key] = [a + b for a, b in zip(merged[key], value)]
+            else:
+                merged[key] += value
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True # Someone else's process, but alive
+    return True
+
+
+def read_values(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_values(path, values):
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(values, f)
+    # Readers never see a half-written file
+    os.replace(temporary, path)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.values = {}
+        # Process these belong to, when it started, and which process runs the flusher
+        self.pid = self.started = self.flusher_pid = None
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(self, name, documentation, tuple(labelnames)))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(self, name, documentation, tuple(labelnames), buckets))
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def update(self, name, labels, change):
+        metric = self.metrics[name]
+        key = json.dumps([str(labels[label]) for label in metric.labelnames])
+        with self.lock:
+            series = self.values.setdefault(name, {})
+            series[key] = change(series.get(key))
+        if settings.METRICS_MULTIPROC_DIR and self.flusher_pid != os.getpid():
+            self.start_flusher()
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.values))
+
+    def reset(self):
+        with self.lock:
+            self.values = {}
+
+    # --- Multiprocess mode ---
+
+    def process_file(self, directory):
+        pid = os.getpid()
+        if self.pid != pid:
+            # First write of this process (forked workers inherit the parent's registry)
+            self.pid, self.started = pid, time.time_ns() // 1000
+        return os.path.join(directory, f'ghostnote-{pid}-{self.started}.json')
+
+    def start_flusher(self):
+        """Starts the thread writing this process's file (threads don't survive a fork, so once per process)."""
+        with self.lock:
+            if self.flusher_pid == os.getpid():
+                return
+            self.flusher_pid = os.getpid()
+
+        def run():
+            while True:
+                time.sleep(settings.METRICS_FLUSH_INTERVAL)
+                try:
+                    self.flush()
+                except OSError as e:
+                    logger.warning(f"Could not write metrics to {settings.METRICS_MULTIPROC_DIR}: {e}")
+        threading.Thread(target=run, name='metrics-flusher', daemon=True).start()
+
+    def flush(self):
+        """Writes this process's values to its file in METRICS_MULTIPROC_DIR."""
+        directory = settings.METRICS_MULTIPROC_DIR
+        if not directory:
+            return
+        write_values(self.process_file(directory), self.snapshot())
+
+    def retire_exited(self, directory):
+        """
+        Folds the files of processes that are gone into the retired file and
+        removes them: files whose PID no longer runs, and older files of a PID
+        that a newer process has taken over.
+        """
+        newest = {}
+        files = []
+        for entry in os.scandir(directory):
+            match = PROCESS_FILE.match(entry.name)
+            if match:
+                pid, started = int(match.group(1)), int(match.group(2))
+                files.append((entry.path, pid, started))
+                newest[pid] = max(newest.get(pid, 0), started)
+        stale = [
+            path for path, pid, started in files
+            if path != self.process_file(directory) and (started < newest[pid] or not process_alive(pid))
+        ]
+        if not stale:
+            return
+        with open(os.path.join(directory, LOCK_FILE), 'a') as lock:
+            # Only one worker at a time, or two could fold the same file in.
+            # fcntl is POSIX only, so the app still imports on Windows, where
+            # multiprocess mode goes unlocked
+            try:
+                import fcntl
+            except ImportError:
+                pass
+            else:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            retired_path = os.path.join(directory, RETIRED_FILE)
+            try:
+                retired = read_values(retired_path)
+            except FileNotFoundError:
+                retired = {}
+            folded = []
+            for path in stale:
+                try:
+                    merge(retired, read_values(path))
+                except (OSError, ValueError):
+                    continue # Folded in by another worker meanwhile
+                folded.append(path)
+            if folded:
+                write_values(retired_path, retired)
+                for path in folded:
+                    os.remove(path)
+
+    def collect(self):
+        """Values of every process (just this one outside multiprocess mode)."""
+        directory = settings.METRICS_MULTIPROC_DIR
+        if not directory:
+            return self.snapshot()
+        self.flush()
+        self.retire_exited(directory)
+        values = {}
+        for entry in os.scandir(directory):
+            if not (entry.name.startswith('ghostnote-') and entry.name.endswith('.json')):
+                continue
+            try:
+                merge(values, read_values(entry.path))
+            except (OSError, ValueError):
+                continue # Removed or replaced while we were listing
+        return values
+
+    def exposition(self):
+        """The Prometheus text format for every registered metric."""
+        values = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            lines.extend(metric.lines(values.get(name, {})))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+note_operations = registry.counter(
+    'ghostnote_note_operations_total',
+    "Note requests handled, by operation and outcome.",
+    ('operation', 'outcome'),
+)
+note_operation_seconds = registry.histogram(
+    'ghostnote_note_operation_duration_seconds',
+    "Time to handle note requests, by operation.",
+    ('operation',),
+)
+
+
+# --- Instrumenting views ---
+
+def set_outcome(request, outcome):
+    """Overrides the outcome observe() would read off the status (e.g. a 200 page after a wrong code)."""
+    request.metrics_outcome = outcome
+
+
+def outcome_for(request, response):
+    outcome = getattr(request, 'metrics_outcome', None)
+    if outcome is not None:
+        return outcome
+    if response.status_code >= 500:
+        return 'error'
+    return STATUS_OUTCOMES.get(response.status_code, 'ok')
+
+
+def observe(operation):
+    """
+    Counts and times the decorated view (sync or async). ``operation`` is the
+    name to record, or maps HTTP methods to names (other methods aren't recorded).
+    """
+    def operation_for(request):
+        return operation.get(request.method) if isinstance(operation, dict) else operation
+
+    def record(name, started, outcome):
+        note_operations.inc(operation=name, outcome=outcome)
+        note_operation_seconds.observe(time.perf_counter() - started, operation=name)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                name = operation_for(request)
+                if name is None:
+                    return await view(request, *args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    response = await view(request, *args, **kwargs)
+                except Http404:
+                    record(name, started, 'not_found')
+                    raise
+                except Exception:
+                    record(name, started, 'error')
+                    raise
+                record(name, started, outcome_for(request, response))
+                return response
+        else:
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                name = operation_for(request)
+                if name is None:
+                    return view(request, *args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    response = view(request, *args, **kwargs)
+                except Http404:
+                    record(name, started, 'not_found')
+                    raise
+                except Exception:
+                    record(name, started, 'error')
+                    raise
+                record(name, started, outcome_for(request, response))
+                return response
+        return wrapper
+    return decorator
+
+
+def metrics_view(request):
+    """Serves the registry in the Prometheus text format."""
+    token = settings.METRICS_TOKEN
+    if not token and not settings.DEBUG:
+        # Traffic and error counts aren't for everyone
+        return HttpResponse("Metrics are off; set METRICS_TOKEN to scrape them.", status=403, content_type='text/plain')
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse("Unauthorized.", status=401, content_type='text/plain')
+    return HttpResponse(registry.exposition(), content_type=CONTENT_TYPE)
@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-17 17:56
+
+import notes.models
+from django.db import migrations, models
+
+
+def backfill_random_keys(apps, schema_editor):
+    """AddField evaluates the callable default once, so give each existing row its own key."""
+    Note = apps.get_model("notes", "Note")
+    batch = []
+    for note in Note.objects.only("id").iterator(chunk_size=2000):
+        note.random_key = notes.models.generate_random_key()
+        batch.append(note)
+        if len(batch) >= 2000:
+            Note.objects.bulk_update(batch, ["random_key"])
+            batch = []
+    if batch:
+        Note.objects.bulk_update(batch, ["random_key"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0003_alter_note_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="note",
+            name="random_key",
+            field=models.FloatField(
+                default=notes.models.generate_random_key, editable=False
+            ),
+        ),
+        migrations.RunPython(backfill_random_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(
+                condition=models.Q(("is_public", True)),
+                fields=["random_key", "id"],
+                name="note_public_random_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-17 17:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0004_note_random_key"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(
+                condition=models.Q(("is_public", True)),
+                fields=["created_at", "id"],
+                name="note_public_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from notes.search import install_search, uninstall_search
+
+
+def forwards(apps, schema_editor):
+    install_search(schema_editor)
+
+
+def backwards(apps, schema_editor):
+    uninstall_search(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0006_note_updated_at"),
+    ]
+
+    operations = [
+        # Search column (Postgres) or FTS5 table (SQLite), outside the ORM's
+        # model state; see notes/search.py
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2 on 2026-10-17 18:19
+
+import notes.models
+from django.db import migrations, models
+
+from notes.search import install_search
+
+
+def backfill_fragments(apps, schema_editor):
+    """Render the stored fragments for existing notes, in batches."""
+    Note = apps.get_model("notes", "Note")
+    batch = []
+    for note in Note.objects.only("id", "content").iterator(chunk_size=2000):
+        note.content_html = notes.models.render_content_html(note.content)
+        note.excerpt = notes.models.render_excerpt(note.content)
+        batch.append(note)
+        if len(batch) >= 2000:
+            Note.objects.bulk_update(batch, ["content_html", "excerpt"])
+            batch = []
+    if batch:
+        Note.objects.bulk_update(batch, ["content_html", "excerpt"])
+
+
+def reinstall_search(apps, schema_editor):
+    """SQLite rebuilt notes_note for the new columns, dropping the FTS triggers."""
+    install_search(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0007_note_search"),
+    ]
+
+    operations = [
+        # When migrating backwards, restore the triggers after the columns go
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search),
+        migrations.AddField(
+            model_name="note",
+            name="content_html",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.AddField(
+            model_name="note",
+            name="excerpt",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.RunPython(reinstall_search, migrations.RunPython.noop),
+        migrations.RunPython(backfill_fragments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# Large values are already compressed by Postgres TOAST once a row passes
+# about 2 kB. lz4 (PostgreSQL 14+, when built with it) compresses and,
+# above all, decompresses much faster than the default pglz. Only values
+# written from now on use it; VACUUM FULL recompresses old rows. Compressing
+# in the application instead would hide the text from the generated search
+# column, so it stays in the database.
+SET_COMPRESSION_SQL = """
+DO $$
+BEGIN
+    EXECUTE 'ALTER TABLE notes_note ALTER COLUMN content SET COMPRESSION {method}';
+    EXECUTE 'ALTER TABLE notes_note ALTER COLUMN content_html SET COMPRESSION {method}';
+EXCEPTION WHEN syntax_error OR feature_not_supported OR invalid_parameter_value THEN
+    RAISE NOTICE 'Column compression {method} not available, keeping the default';
+END
+$$;
+"""
+
+
+def set_lz4(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(SET_COMPRESSION_SQL.format(method="lz4"))
+
+
+def set_default(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(SET_COMPRESSION_SQL.format(method="default"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0008_note_fragments"),
+    ]
+
+    operations = [
+        migrations.RunPython(set_lz4, set_default),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2 on 2026-10-17 21:40
+
+import uuid
+
+import notes.models
+from django.db import migrations, models
+
+from notes.search import install_search
+
+
+def hash_codes(apps, schema_editor):
+    """Replace each plaintext modification code with its keyed hash, in batches."""
+    Note = apps.get_model("notes", "Note")
+    batch = []
+    for note in Note.objects.only("id", "modification_code").iterator(chunk_size=2000):
+        note.code_hash = notes.models.hash_modification_code(note.modification_code)
+        batch.append(note)
+        if len(batch) >= 2000:
+            Note.objects.bulk_update(batch, ["code_hash"])
+            batch = []
+    if batch:
+        Note.objects.bulk_update(batch, ["code_hash"])
+
+
+def issue_new_codes(apps, schema_editor):
+    """Going backwards: the old codes are gone, so give every note a fresh one."""
+    Note = apps.get_model("notes", "Note")
+    batch = []
+    for note in Note.objects.only("id").iterator(chunk_size=2000):
+        note.modification_code = uuid.uuid4()
+        batch.append(note)
+        if len(batch) >= 2000:
+            Note.objects.bulk_update(batch, ["modification_code"])
+            batch = []
+    if batch:
+        Note.objects.bulk_update(batch, ["modification_code"])
+
+
+def reinstall_search(apps, schema_editor):
+    """SQLite rebuilt notes_note for the column changes, dropping the FTS triggers."""
+    install_search(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0009_note_content_compression"),
+    ]
+
+    operations = [
+        # When migrating backwards, restore the triggers after the columns change
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search),
+        migrations.AddField(
+            model_name="note",
+            name="code_hash",
+            field=models.CharField(default="", editable=False, max_length=64),
+            preserve_default=False,
+        ),
+        migrations.RunPython(hash_codes, migrations.RunPython.noop),
+        # Nullable and not unique, so migrating backwards can re-add the column
+        # empty before issue_new_codes() fills it (the originals can't be
+        # recovered from their hashes)
+        migrations.AlterField(
+            model_name="note",
+            name="modification_code",
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, issue_new_codes),
+        migrations.RemoveField(
+            model_name="note",
+            name="modification_code",
+        ),
+        migrations.RunPython(reinstall_search, migrations.RunPython.noop),
+    ]
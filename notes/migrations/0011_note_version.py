@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-17 22:30
+
+from django.db import migrations, models
+
+from notes.search import install_search
+
+
+def reinstall_search(apps, schema_editor):
+    """SQLite rebuilt notes_note for the new column, dropping the FTS triggers."""
+    install_search(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0010_note_code_hash"),
+    ]
+
+    operations = [
+        # When migrating backwards, restore the triggers after the column goes
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search),
+        migrations.AddField(
+            model_name="note",
+            name="version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.RunPython(reinstall_search, migrations.RunPython.noop),
+    ]
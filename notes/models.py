@@ -1,6 +1,64 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.html import escape
+from django.utils.text import Truncator
+import random # Used for the random sampling key
 import uuid # Used for generating unique codes
 
+# Characters of content shown on list cards
+EXCERPT_LENGTH = 100
+
+
+def generate_random_key():
+    """Draws a fresh sampling key, uniform over [0, 1)."""
+    return random.random()
+
+
+def render_content_html(content):
+    """The note body as it appears inside the detail page's <pre> (escaped)."""
+    return escape(content)
+
+
+def render_excerpt(content):
+    """The escaped, truncated body shown on list cards."""
+    return escape(Truncator(content).chars(EXCERPT_LENGTH))
+
+
+def hash_modification_code(code):
+    """
+    The keyed hash (HMAC-SHA256) stored in place of a modification code.
+
+    Codes are random UUIDs, far too many to brute-force offline, so a fast
+    hash is enough; the key keeps a leaked table from being checked against
+    guesses without the server's secret as well.
+    """
+    return salted_hmac(
+        'notes.modification_code', str(code).lower(),
+        secret=settings.MODIFICATION_CODE_SECRET, algorithm='sha256',
+    ).hexdigest()
+
+
+def edit_values(changes):
+    """
+    Column values for an UPDATE applying ``changes`` (some of username,
+    content, is_public) to a note, with everything save() would derive.
+    Columns not in ``changes`` are left out of the statement.
+    """
+    values = dict(changes, updated_at=timezone.now(), version=F('version') + 1)
+    if 'content' in changes:
+        values['content_html'] = render_content_html(changes['content'])
+        values['excerpt'] = render_excerpt(changes['content'])
+    if changes.get('is_public'):
+        # A note that becomes public gets a fresh sampling key (see NoteForm.save)
+        values['random_key'] = Case(
+            When(is_public=False, then=Value(generate_random_key())), default=F('random_key'),
+        )
+    return values
+
+
 # Create your models here.
 class Note(models.Model):
     """Represents a single GhostNote message."""
@@ -13,11 +71,74 @@ class Note(models.Model):
     username = models.CharField(max_length=100) # Adjust max_length as needed
     # FR002: Creation timestamp (automatically set when created)
     created_at = models.DateTimeField(auto_now_add=True)
-    # FR003: Unique modification code (separate from the primary key/URL id)
-    # We use UUID for strong uniqueness. editable=False means it won't show up in default forms.
-    modification_code = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    # Version marker for HTTP validators (ETag / Last-Modified); bumped on every save
+    updated_at = models.DateTimeField(auto_now=True)
+    # Edit counter for optimistic concurrency: edit and delete forms send the
+    # version they were loaded with, and the write only applies if it still
+    # matches (see notes_with_code())
+    version = models.PositiveIntegerField(default=1, editable=False)
+    # FR003: Modification code (separate from the primary key/URL id). Only its
+    # keyed hash is stored; the UUID itself is shown once, when the note is
+    # created (see issue_modification_code()).
+    code_hash = models.CharField(max_length=64, editable=False)
     # Field to control public visibility
     is_public = models.BooleanField(default=False, help_text="Allow this note to appear in public listings?")
+    # Uniform random key used to pick public notes at random with an index seek
+    # instead of ORDER BY RANDOM(). See notes/sampling.py.
+    random_key = models.FloatField(default=generate_random_key, editable=False)
+    # Pre-rendered, already escaped fragments of content, written by
+    # render_fragments() on save so templates don't re-escape large bodies per
+    # request. Empty only for rows bulk-inserted without it; the detail body
+    # then falls back to content, list cards show no excerpt.
+    content_html = models.TextField(blank=True, default='', editable=False)
+    excerpt = models.TextField(blank=True, default='', editable=False)
+
+    class Meta:
+        indexes = [
+            # Backs random_public_note_id() and the public list ordering. Partial,
+            # so it only holds public notes and the planner can seek straight to a key.
+            models.Index(
+                fields=['random_key', 'id'],
+                condition=models.Q(is_public=True),
+                name='note_public_random_idx',
+            ),
+            # Chronological order of public notes; also answers "are there any
+            # public notes?" and public counts without touching private rows.
+            models.Index(
+                fields=['created_at', 'id'],
+                condition=models.Q(is_public=True),
+                name='note_public_created_idx',
+            ),
+        ]
+
+    def render_fragments(self):
+        """Renders content_html and excerpt from content (bulk_create callers must call it)."""
+        self.content_html = render_content_html(self.content)
+        self.excerpt = render_excerpt(self.content)
+
+    def issue_modification_code(self):
+        """
+        Gives the note a new modification code and returns it. The plaintext
+        stays on the instance (``modification_code``) only until it is
+        discarded; bulk_create callers must call this themselves.
+        """
+        self.modification_code = uuid.uuid4()
+        self.code_hash = hash_modification_code(self.modification_code)
+        return self.modification_code
+
+    def code_matches(self, code):
+        return constant_time_compare(hash_modification_code(code), self.code_hash)
+
+    def save(self, *args, **kwargs):
+        if not self.code_hash:
+            self.issue_modification_code()
+        elif not self._state.adding:
+            self.version += 1
+        # List pages defer content and rely on the excerpt, so every save keeps
+        # the fragments in step with the body
+        if 'content' in self.__dict__:
+            self.render_fragments()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         """String representation for admin and debugging."""
@@ -27,3 +148,16 @@ class Note(models.Model):
         return f"{status} Note ({self.id}) by {self.username} created at {self.created_at.strftime('%Y-%m-%d %H:%M')}"
 
     # The 'id' field defined above is now the primary key used for URLs.
+
+
+def notes_with_code(note_id, code, version=None):
+    """
+    The note ``note_id`` if ``code`` is its modification code (and, when
+    given, ``version`` its current version), as a queryset. update()/delete()
+    on it verify and write in one statement, so a wrong code or a stale
+    version costs a single primary-key lookup and no row is read.
+    """
+    notes = Note.objects.filter(pk=note_id, code_hash=hash_modification_code(code))
+    if version is not None:
+        notes = notes.filter(version=version)
+    return notes
@@ -0,0 +1,209 @@
+"""
+Keyset (cursor) pagination.
+
+Unlike ``django.core.paginator.Paginator`` this never runs a COUNT(*) and never
+uses OFFSET: every page is a ``WHERE (key, id) > (last_key, last_id)`` seek on
+an index, so page 10,000 costs the same as page 1.
+
+A listing is described by one or more *segments* (querysets walked one after
+the other) sharing the same two-field ordering. Cursors are opaque URL-safe
+tokens recording the direction, the segment and the key of the row to continue
+from. Where the database allows LIMIT in ``IN`` subqueries (not MySQL), a page
+that may span several segments is still fetched in one query.
+"""
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q, Value
+
+
+class KeysetPage:
+    """One page of a keyset listing, with the tokens for its neighbours."""
+
+    def __init__(self, object_list, number, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.number = number
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return max(1, self.number - 1)
+
+
+def encode_cursor(direction, segment, values):
+    payload = json.dumps([direction, segment, *[str(value) for value in values]])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Returns (direction, segment, values), or None for a missing or mangled token."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, segment, *values = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        return None
+    if direction not in ('n', 'p') or not isinstance(segment, int):
+        return None
+    return direction, segment, values
+
+
+def _cursor_values(queryset, key_fields, values):
+    """
+    Converts a cursor's values to the Python types of the ordering fields
+    (model fields or annotations of ``queryset``), or returns None when they
+    don't parse: a tampered cursor must not reach the database as is.
+    """
+    if len(values) != len(key_fields):
+        return None
+    converted = []
+    for name, value in zip(key_fields, values):
+        annotation = queryset.query.annotations.get(name)
+        try:
+            field = annotation.output_field if annotation is not None else queryset.model._meta.get_field(name)
+            converted.append(field.to_python(value))
+        except (FieldDoesNotExist, ValidationError, ValueError, TypeError):
+            return None
+    if None in converted:
+        return None
+    return converted
+
+
+def _seek(queryset, ordering, values, forward):
+    """Filters ``queryset`` to rows strictly after (or before) ``values`` in ``ordering``."""
+    (first, first_desc), (second, second_desc) = [
+        (field.lstrip('-'), field.startswith('-')) for field in ordering
+    ]
+    # Going backwards flips every comparison
+    first_op = 'lt' if first_desc == forward else 'gt'
+    second_op = 'lt' if second_desc == forward else 'gt'
+    # The redundant "first <= / >= value" bound lets the database start the
+    # index scan at the cursor; the OR alone makes it walk from the top
+    return queryset.filter(
+        Q(**{f'{first}__{first_op}e': values[0]}),
+        Q(**{f'{first}__{first_op}': values[0]})
+        | Q(**{first: values[0], f'{second}__{second_op}': values[1]}),
+    )
+
+
+def _reverse(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+def combined_runs(runs, order, forward, limit):
+    """
+    One query for the first ``limit`` rows across ``runs`` (``(index, queryset)``
+    in walk order): each run's own first ``limit`` rows are picked by a seek in
+    an ``IN`` subquery, the picks are UNIONed and sorted by segment, then key.
+    Rows carry their segment index as ``keyset_segment``.
+    """
+    parts = [
+        queryset.order_by().filter(pk__in=queryset[:limit].values('pk')).annotate(keyset_segment=Value(index))
+        for index, queryset in runs
+    ]
+    segment_order = 'keyset_segment' if forward else '-keyset_segment'
+    return parts[0].union(*parts[1:], all=True).order_by(segment_order, *order)[:limit]
+
+
+def _keyset_steps(segments, ordering, cursor, per_page, number):
+    """
+    The keyset algorithm without I/O: yields each sliced queryset it needs and
+    expects the fetched rows to be sent back; returns the KeysetPage. This lets
+    keyset_page() and akeyset_page() share it.
+    """
+    key_fields = [field.lstrip('-') for field in ordering]
+    decoded = decode_cursor(cursor)
+    values = None
+    if decoded is not None and 0 <= decoded[1] < len(segments):
+        values = _cursor_values(segments[decoded[1]], key_fields, decoded[2])
+    if values is None:
+        # No usable cursor: this is the first page, whatever the URL claims
+        direction, start, number = 'n', 0, 1
+    else:
+        direction, start = decoded[:2]
+    forward = direction == 'n'
+
+    order = ordering if forward else _reverse(ordering)
+    walk = range(start, len(segments)) if forward else range(start, -1, -1)
+    runs = []
+    for index in walk:
+        queryset = segments[index].order_by(*order)
+        if values is not None and index == start:
+            queryset = _seek(queryset, ordering, values, forward)
+        runs.append((index, queryset))
+
+    rows = []
+    if len(runs) > 1 and connections[runs[0][1].db].features.allow_sliced_subqueries_with_in:
+        fetched = yield combined_runs(runs, order, forward, per_page + 1)
+        rows = [(row.keyset_segment, row) for row in fetched]
+    else:
+        for index, queryset in runs:
+            wanted = per_page + 1 - len(rows)
+            fetched = yield queryset[:wanted]
+            rows.extend((index, row) for row in fetched)
+            if len(rows) > per_page:
+                break
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    def cursor_for(direction, entry):
+        index, row = entry
+        return encode_cursor(direction, index, [getattr(row, field) for field in key_fields])
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or not forward:
+            next_cursor = cursor_for('n', rows[-1])
+        if (has_more and not forward) or (forward and values is not None):
+            previous_cursor = cursor_for('p', rows[0])
+    return KeysetPage([row for _, row in rows], number, next_cursor, previous_cursor)
+
+
+def keyset_page(segments, ordering, cursor, per_page, number=1):
+    """
+    Fetches one page of ``segments`` ordered by the two fields in ``ordering``.
+
+    ``cursor`` is a token from a previous page (or None for the first page).
+    Each page reads ``per_page + 1`` rows to find out whether there is another
+    page. Without the single-query path a second segment is only touched when
+    the first runs out.
+    """
+    steps = _keyset_steps(segments, ordering, cursor, per_page, number)
+    try:
+        queryset = next(steps)
+        while True:
+            queryset = steps.send(list(queryset))
+    except StopIteration as done:
+        return done.value
+
+
+async def akeyset_page(segments, ordering, cursor, per_page, number=1):
+    """Async version of keyset_page(), using the async ORM."""
+    steps = _keyset_steps(segments, ordering, cursor, per_page, number)
+    try:
+        queryset = next(steps)
+        while True:
+            queryset = steps.send([row async for row in queryset])
+    except StopIteration as done:
+        return done.value
@@ -0,0 +1,197 @@
+"""
+Per-request performance instrumentation.
+
+PerfMiddleware times a sample of requests (``settings.PERF_SAMPLE_RATE``) and
+records, for each one, the view that handled it, the number and total time
+of database queries, the time spent rendering templates and the note cache
+hits and misses. Timed responses carry a ``Server-Timing`` header (browser
+dev tools show it next to the request) unless ``PERF_SERVER_TIMING`` is off
+or shared caches may store the response, which would then hand one request's
+timings to everyone; each one is logged on the ``notes.perf`` logger as a line of key=value
+pairs, with the same numbers as a dict in the record's ``perf`` attribute.
+
+The stats for the current request live in a context variable, which
+follows the request into sync_to_async threads, so the async views are
+covered too. Requests that aren't sampled pay for one random() call and a
+context variable lookup per query, render and cache read.
+"""
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+# RequestStats of the request being timed, None when it isn't sampled
+_current = ContextVar('notes_perf_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = ('started', 'queries', 'db_time', 'template_time', 'rendering', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.rendering = False
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def sampled():
+    rate = settings.PERF_SAMPLE_RATE
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def current_stats():
+    """The stats of the request being timed, or None."""
+    return _current.get()
+
+
+# --- Database ---
+
+def record_query(execute, sql, params, many, context):
+    """Connection execute wrapper adding each query's time to the current request."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """connection_created receiver; see NotesConfig.ready()."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# --- Templates ---
+
+class TimedTemplate:
+    """Wraps a backend template so top-level renders count towards template time."""
+
+    def __init__(self, wrapped):
+        self._wrapped = wrapped
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        # Nested renders are already inside the outer one's time
+        if stats is None or stats.rendering:
+            return self._wrapped.render(context, request)
+        stats.rendering = True
+        started = time.perf_counter()
+        try:
+            return self._wrapped.render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started
+            stats.rendering = False
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The stock Django template backend, with render times recorded for PerfMiddleware."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+# --- Cache ---
+
+def count_cache(hits=0, misses=0):
+    """Records note cache lookups (called by notes/cache.py and the other readers of note_cache())."""
+    stats = _current.get()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+# --- Middleware ---
+
+def server_timing(stats, total):
+    return (
+        f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries", '
+        f'tpl;dur={stats.template_time * 1000:.2f};desc="templates", '
+        f'cache;desc="{stats.cache_hits} hits, {stats.cache_misses} misses", '
+        f'total;dur={total * 1000:.2f}'
+    )
+
+
+def shared_cacheable(response):
+    """Whether the response's Cache-Control lets shared caches (CDNs, proxies) store it."""
+    directives = {
+        directive.split('=', 1)[0].strip().lower()
+        for directive in response.headers.get('Cache-Control', '').split(',')
+    }
+    return bool(directives & {'public', 's-maxage'})
+
+
+class PerfMiddleware:
+    """Times a sample of requests; put it first so the total covers the other middleware."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not sampled():
+            return self.get_response(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        if not sampled():
+            return await self.get_response(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        total = time.perf_counter() - stats.started
+        match = request.resolver_match
+        data = {
+            'view': match.view_name if match else None,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'db_queries': stats.queries,
+            'db_ms': round(stats.db_time * 1000, 2),
+            'template_ms': round(stats.template_time * 1000, 2),
+            'cache_hits': stats.cache_hits,
+            'cache_misses': stats.cache_misses,
+        }
+        if settings.PERF_SERVER_TIMING and not shared_cacheable(response):
+            timing = server_timing(stats, total)
+            existing = response.headers.get('Server-Timing')
+            response.headers['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+        logger.info(' '.join(f'{key}={value}' for key, value in data.items()), extra={'perf': data})
+        return response
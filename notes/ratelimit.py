@@ -0,0 +1,144 @@
+"""
+Token-bucket rate limiting for the write endpoints.
+
+Each bucket holds up to N tokens and refills at N per period (see
+``settings.RATELIMITS``). A write takes one token; with none left the request
+gets a bare 429 with Retry-After, before the view reads the database or
+renders anything. Edits and deletes are counted per client and note, so
+guessing modification codes for one note is slow; creates are counted per
+client.
+
+Buckets live in the cache named by ``settings.RATELIMIT_CACHE_ALIAS``, so the
+backend is pluggable. The read-modify-write is not atomic, so concurrent
+requests from one client may occasionally slip one or two past the limit.
+"""
+import functools
+import math
+import time
+from collections import namedtuple
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+# Only writes are limited; GETs stay cheap and cacheable
+LIMITED_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+PERIOD_UNITS = {'s': 1, 'm': 60, 'h': 3600}
+
+
+# ``burst`` requests, refilled evenly over ``period`` seconds
+Rate = namedtuple('Rate', 'burst period')
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate):
+    """Parses "20/60", "20/60s", "20/m" or "100/h" into a Rate."""
+    count, _, period = rate.partition('/')
+    unit = PERIOD_UNITS.get(period[-1:], None)
+    if unit is not None:
+        period = period[:-1] or '1'
+    return Rate(int(count), float(period) * (unit or 1))
+
+
+def ratelimit_cache():
+    return caches[settings.RATELIMIT_CACHE_ALIAS]
+
+
+def client_ip(request):
+    """
+    The client address from ``RATELIMIT_IP_META_KEY``. X-Forwarded-For is a
+    list ("client, proxy1, proxy2") to which each proxy appends the address
+    it got the request from, so with ``RATELIMIT_TRUSTED_PROXIES`` proxies the
+    client is the entry that many places from the right, appended by the
+    outermost one. Entries further left come from the client itself and can
+    say anything.
+    """
+    remote_addr = request.META.get('REMOTE_ADDR', '')
+    value = request.META.get(settings.RATELIMIT_IP_META_KEY)
+    if not value:
+        return remote_addr
+    entries = [entry.strip() for entry in value.split(',')]
+    trusted = max(1, settings.RATELIMIT_TRUSTED_PROXIES)
+    if len(entries) < trusted:
+        # Fewer hops than proxies: not a header our proxies wrote
+        return remote_addr
+    return entries[-trusted]
+
+
+def bucket_key(scope, request, note_id=None):
+    return f'ratelimit:{scope}:{client_ip(request)}:{note_id or "-"}'
+
+
+def _take(bucket, rate, now):
+    """Returns ``(new_bucket, retry_after)``; new_bucket is None when the request is refused."""
+    per_second = rate.burst / rate.period
+    tokens, stamp = bucket if bucket is not None else (rate.burst, now)
+    tokens = min(rate.burst, tokens + (now - stamp) * per_second)
+    if tokens < 1:
+        return None, (1 - tokens) / per_second
+    return (tokens - 1, now), 0
+
+
+def take_token(scope, request, note_id=None):
+    """Takes a token; returns 0 if allowed, otherwise the seconds until the next one."""
+    rate = parse_rate(settings.RATELIMITS[scope])
+    key = bucket_key(scope, request, note_id)
+    cache = ratelimit_cache()
+    bucket, retry_after = _take(cache.get(key), rate, time.time())
+    if bucket is not None:
+        # A bucket untouched for a whole period is full again, so let it expire
+        cache.set(key, bucket, timeout=math.ceil(rate.period))
+    return retry_after
+
+
+async def atake_token(scope, request, note_id=None):
+    """Async version of take_token()."""
+    rate = parse_rate(settings.RATELIMITS[scope])
+    key = bucket_key(scope, request, note_id)
+    cache = ratelimit_cache()
+    bucket, retry_after = _take(await cache.aget(key), rate, time.time())
+    if bucket is not None:
+        await cache.aset(key, bucket, timeout=math.ceil(rate.period))
+    return retry_after
+
+
+def too_many_requests(retry_after):
+    response = HttpResponse("Too many requests. Please slow down.", status=429, content_type='text/plain')
+    response.headers['Retry-After'] = str(math.ceil(retry_after))
+    return response
+
+
+def ratelimit(scope):
+    """
+    Limits writes to the decorated view (sync or async). ``scope`` names an
+    entry of settings.RATELIMITS, or maps HTTP methods to entries. A
+    ``note_id`` view argument makes the bucket per note.
+    """
+    def scope_for(request):
+        if request.method not in LIMITED_METHODS or not settings.RATELIMIT_ENABLED:
+            return None
+        return scope.get(request.method) if isinstance(scope, dict) else scope
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                name = scope_for(request)
+                if name is not None:
+                    retry_after = await atake_token(name, request, kwargs.get('note_id'))
+                    if retry_after:
+                        return too_many_requests(retry_after)
+                return await view(request, *args, **kwargs)
+        else:
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                name = scope_for(request)
+                if name is not None:
+                    retry_after = take_token(name, request, kwargs.get('note_id'))
+                    if retry_after:
+                        return too_many_requests(retry_after)
+                return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,101 @@
+"""
+Random selection of public notes without ORDER BY RANDOM().
+
+Every note carries a ``random_key`` drawn uniformly from [0, 1) when it is
+created (and redrawn whenever it is made public). Picking a random public note
+is then a single seek on the partial (random_key, id) index of public notes:
+read the first few keys at or after a random pivot, wrapping around to the
+smallest keys when the pivot lands near the end, and choose one of them. The
+cost does not depend on the table size.
+
+Taking just the first key after the pivot would pick each note with the
+probability of the gap below its key, and random gaps are far from even (with
+n notes the widest is around ln(n) / n, the narrowest around 1 / n²). Choosing
+among the next ``RANDOM_PICK_WINDOW`` keys averages that many gaps per note,
+which keeps every note's chance within a small factor of 1 / n. It is still not
+exactly uniform; redrawing a note's key whenever it is picked would be, but
+would turn every pick into a write and reshuffle the seeded lists below.
+
+The same keys give a cheap seeded shuffle for the public list: a seed picks a
+pivot, and the list walks the keys from the pivot to the end and then from the
+start back up to the pivot. A seed therefore names one stable ordering that can
+be paged through with keyset cursors (see notes/pagination.py).
+"""
+import random
+
+from .models import Note
+
+# Ordering shared by the random sampler and the seeded shuffle
+SHUFFLE_ORDERING = ('random_key', 'id')
+# How many keys from the pivot on a random pick chooses among
+RANDOM_PICK_WINDOW = 8
+
+
+def public_notes():
+    """Base queryset for everything visitors are allowed to browse."""
+    return Note.objects.filter(is_public=True)
+
+
+# Full bodies that list cards never show; they use the stored excerpt instead
+CARD_DEFERRED_FIELDS = ('content', 'content_html')
+
+
+def public_note_cards():
+    """Public notes for list pages: everything but the (possibly huge) body."""
+    return public_notes().defer(*CARD_DEFERRED_FIELDS)
+
+
+def shuffled_public_notes():
+    """Public notes in random-key order, which is a fixed random permutation."""
+    return public_notes().order_by(*SHUFFLE_ORDERING)
+
+
+def random_public_note_id(pivot=None):
+    """
+    Returns the ID of a random public note, or None when there are none.
+
+    Issues one indexed query, plus a second one only when fewer than
+    RANDOM_PICK_WINDOW keys follow the pivot and the lookup has to wrap around.
+    """
+    if pivot is None:
+        pivot = random.random()
+    ids = shuffled_public_notes().values_list('id', flat=True)
+    window = list(ids.filter(random_key__gte=pivot)[:RANDOM_PICK_WINDOW])
+    if len(window) < RANDOM_PICK_WINDOW:
+        # Wrap around to the start of the key space
+        window += [note_id for note_id in ids[:RANDOM_PICK_WINDOW - len(window)] if note_id not in window]
+    return random.choice(window) if window else None
+
+
+async def arandom_public_note_id(pivot=None):
+    """Async version of random_public_note_id()."""
+    if pivot is None:
+        pivot = random.random()
+    ids = shuffled_public_notes().values_list('id', flat=True)
+    window = [note_id async for note_id in ids.filter(random_key__gte=pivot)[:RANDOM_PICK_WINDOW]]
+    if len(window) < RANDOM_PICK_WINDOW:
+        window += [note_id async for note_id in ids[:RANDOM_PICK_WINDOW - len(window)] if note_id not in window]
+    return random.choice(window) if window else None
+
+
+def new_shuffle_seed():
+    """Returns a fresh seed for the public list, as 8 hex digits."""
+    return f'{random.getrandbits(32):08x}'
+
+
+def shuffle_pivot(seed):
+    """Maps a seed to its pivot in [0, 1), or returns None if the seed is malformed."""
+    if not seed or len(seed) != 8:
+        return None
+    try:
+        return int(seed, 16) / 2 ** 32
+    except ValueError:
+        return None
+
+
+def shuffle_segments(pivot):
+    """The two runs of a seeded shuffle: keys from the pivot up, then keys below it."""
+    return [
+        public_note_cards().filter(random_key__gte=pivot),
+        public_note_cards().filter(random_key__lt=pivot),
+    ]
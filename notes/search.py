@@ -0,0 +1,144 @@
+"""
+Full-text search over public notes.
+
+On PostgreSQL, ``notes_note.search_vector`` is a stored generated ``tsvector``
+column (username weighted above content), kept current by the database on
+every INSERT and UPDATE, bulk ones included, and indexed with GIN. On SQLite
+(local development) an external-content FTS5 table, ``notes_note_fts``, is
+kept in sync by triggers. Neither column is known to the ORM; the migration
+calls install_search() to create them.
+
+Results are ranked (ts_rank_cd / bm25) and paged with keyset cursors on
+(rank, id), so deep pages cost the same as the first.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .pagination import akeyset_page, keyset_page
+from .sampling import public_note_cards
+
+# Highest rank first; id breaks ties so the ordering is total
+SEARCH_ORDERING = ('-rank', 'id')
+
+# Longest query accepted; longer input is cut before it reaches the database
+MAX_QUERY_LENGTH = 200
+
+POSTGRES_SEARCH_SQL = [
+    "ALTER TABLE notes_note ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    " setweight(to_tsvector('english', coalesce(username, '')), 'A') ||"
+    " setweight(to_tsvector('english', coalesce(content, '')), 'B')"
+    ") STORED",
+    "CREATE INDEX IF NOT EXISTS notes_note_search_idx ON notes_note USING GIN (search_vector)",
+]
+POSTGRES_DROP_SQL = [
+    "DROP INDEX IF EXISTS notes_note_search_idx",
+    "ALTER TABLE notes_note DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_SEARCH_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS notes_note_fts USING fts5("
+    "username, content, content='notes_note', content_rowid='rowid')",
+    "DROP TRIGGER IF EXISTS notes_note_fts_ai",
+    "CREATE TRIGGER notes_note_fts_ai AFTER INSERT ON notes_note BEGIN"
+    " INSERT INTO notes_note_fts(rowid, username, content) VALUES (new.rowid, new.username, new.content);"
+    " END",
+    "DROP TRIGGER IF EXISTS notes_note_fts_ad",
+    "CREATE TRIGGER notes_note_fts_ad AFTER DELETE ON notes_note BEGIN"
+    " INSERT INTO notes_note_fts(notes_note_fts, rowid, username, content)"
+    " VALUES ('delete', old.rowid, old.username, old.content);"
+    " END",
+    "DROP TRIGGER IF EXISTS notes_note_fts_au",
+    "CREATE TRIGGER notes_note_fts_au AFTER UPDATE ON notes_note BEGIN"
+    " INSERT INTO notes_note_fts(notes_note_fts, rowid, username, content)"
+    " VALUES ('delete', old.rowid, old.username, old.content);"
+    " INSERT INTO notes_note_fts(rowid, username, content) VALUES (new.rowid, new.username, new.content);"
+    " END",
+    # Index whatever is already in the table (also repairs rowids after a table rebuild)
+    "INSERT INTO notes_note_fts(notes_note_fts) VALUES ('rebuild')",
+]
+SQLITE_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS notes_note_fts_ai",
+    "DROP TRIGGER IF EXISTS notes_note_fts_ad",
+    "DROP TRIGGER IF EXISTS notes_note_fts_au",
+    "DROP TABLE IF EXISTS notes_note_fts",
+]
+
+
+def install_search(schema_editor):
+    """
+    Creates the search column/table for the current backend. Idempotent:
+    Django rebuilds the whole table for many SQLite schema changes, which
+    drops the triggers, so any later migration that alters notes_note must
+    call this again.
+    """
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRES_SEARCH_SQL, 'sqlite': SQLITE_SEARCH_SQL}.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def uninstall_search(schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRES_DROP_SQL, 'sqlite': SQLITE_DROP_SQL}.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def normalize_query(text):
+    """Collapses whitespace and caps the length; returns '' for blank input."""
+    return ' '.join((text or '').split())[:MAX_QUERY_LENGTH]
+
+
+def fts5_query(text):
+    """Quotes every word so user input can never be FTS5 syntax (all words must match)."""
+    return ' '.join(f'"{word}"' for word in re.findall(r'\w+', text))
+
+
+def search_queryset(text):
+    """Public notes matching ``text``, annotated with ``rank`` (higher is better)."""
+    notes = public_note_cards()
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+
+        # The generated column, as an expression: the ORM has no field for it
+        document = RawSQL('notes_note.search_vector', [], output_field=SearchVectorField())
+        query = SearchQuery(text, config='english', search_type='websearch')
+        return notes.alias(document=document).filter(document=query).annotate(
+            rank=SearchRank(document, query, cover_density=True)
+        )
+    if vendor == 'sqlite':
+        match = fts5_query(text)
+        if not match:
+            # Nothing searchable left (e.g. only punctuation)
+            return notes.none().annotate(rank=RawSQL('0', [], output_field=FloatField()))
+        # The MATCH picks the rows through the FTS index; bm25() is then read
+        # for each of them by rowid. It is lower-is-better, so negate it
+        matching = RawSQL(
+            'SELECT id FROM notes_note WHERE rowid IN (SELECT rowid FROM notes_note_fts WHERE notes_note_fts MATCH %s)',
+            [match],
+        )
+        rank = RawSQL(
+            '(SELECT -bm25(notes_note_fts) FROM notes_note_fts'
+            ' WHERE notes_note_fts MATCH %s AND notes_note_fts.rowid = notes_note.rowid)',
+            [match],
+            output_field=FloatField(),
+        )
+        return notes.filter(pk__in=matching).annotate(rank=rank)
+    # Other backends: unranked substring match, fine for tiny tables only
+    return notes.filter(Q(content__icontains=text) | Q(username__icontains=text)).annotate(
+        rank=RawSQL('0', [], output_field=FloatField())
+    )
+
+
+def search_page(text, cursor, per_page, number=1):
+    """One ranked page of search results for ``text`` (already normalized)."""
+    return keyset_page([search_queryset(text)], SEARCH_ORDERING, cursor, per_page, number=number)
+
+
+async def asearch_page(text, cursor, per_page, number=1):
+    """Async version of search_page()."""
+    return await akeyset_page([search_queryset(text)], SEARCH_ORDERING, cursor, per_page, number=number)
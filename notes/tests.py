@@ -1,12 +1,46 @@
-from django.test import TestCase, Client # Import Client
+from django.test import TestCase, TransactionTestCase, Client, AsyncRequestFactory, RequestFactory # Import Client
+from django.test.utils import CaptureQueriesContext
+from django.core.checks import run_checks
+from django.utils.crypto import constant_time_compare
+from django.db import connection
+from django.core.exceptions import ImproperlyConfigured
+from ghostnote_project.database import apply_conn_strategy
 from django.urls import reverse # To look up URLs by name
-from .models import Note # Import the model to test
+from .models import Note, hash_modification_code, notes_with_code # Import the model to test
 from .forms import NoteForm # Import the form to test
+from .pagination import encode_cursor
+from .sampling import RANDOM_PICK_WINDOW, random_public_note_id
+from . import async_views
+from django.contrib.messages import get_messages
+from django.contrib.messages.storage import default_storage
+from .cache import bump_public_notes_version, note_cache, note_cache_key, public_note_count
+from .management.commands.profile_imports import parse_importtime
+from .management.commands.check_query_plans import SEQ_SCAN_PATTERNS, view_queries
 import uuid # To check the type of the modification code
 import re # Import regular expression module
 from django.utils import timezone # Import timezone
 # Import patch from unittest.mock for later
 from unittest.mock import patch
+import threading
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from .management.commands.export_notes import export_fields
+from .management.commands.bench_endpoints import find_regressions
+import io
+import time
+import subprocess
+import sys
+import json
+import os
+import tempfile
+import random
+import logging
+from django.template.loader import render_to_string
+from django.template import Context, Template
+from django.core.cache import caches
+from django.conf import settings
+from .ratelimit import Rate, client_ip, parse_rate
+from .metrics import PROCESS_FILE, registry as metrics_registry
 
 # Create a class for Note model tests, inheriting from TestCase
 class NoteModelTests(TestCase):
@@ -180,7 +214,9 @@ class NoteViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'notes/note_detail.html')
         self.assertContains(response, "Note created!")
-        self.assertContains(response, f"<code>{new_note.modification_code}</code>")
+        # Only the hash is stored; the code shown must be the one it was made from
+        shown_code = re.search(r'<code>([0-9a-f-]{36})</code>', response.content.decode()).group(1)
+        self.assertTrue(new_note.code_matches(shown_code))
         self.assertContains(response, "copy-mod-code-btn")
 
     def test_create_note_view_post_invalid(self):
@@ -247,7 +283,8 @@ class NoteViewTests(TestCase):
             'username': self.test_note.username, # Username shouldn't change via edit form
             'content': updated_content,
             'is_public': False, # Change privacy setting
-            'modification_code': self.correct_mod_code
+            'modification_code': self.correct_mod_code,
+            'version': self.test_note.version,
         }
 
         response = self.client.post(self.edit_url, data=edit_data, follow=True)
@@ -296,7 +333,8 @@ class NoteViewTests(TestCase):
             'username': self.test_note.username,
             'content': "", # Invalid: content is required
             'is_public': False,
-            'modification_code': self.correct_mod_code
+            'modification_code': self.correct_mod_code,
+            'version': self.test_note.version,
         }
 
         response = self.client.post(self.edit_url, data=edit_data)
@@ -355,7 +393,8 @@ class NoteViewTests(TestCase):
         self.assertTrue(Note.objects.filter(pk=note_pk).exists())
 
         delete_data = {
-            'modification_code': self.correct_mod_code
+            'modification_code': self.correct_mod_code,
+            'version': self.test_note.version,
         }
 
         response = self.client.post(self.delete_url, data=delete_data, follow=True)
@@ -590,21 +629,22 @@ class NoteViewTests(TestCase):
         self.assertIsInstance(response.context['form'], NoteForm)
         self.assertEqual(response.context['form'].data['content'], note_data['content'])
 
-    # --- Test for save() exception during edit can be added similarly ---
-    @patch('notes.views.NoteForm.save') # Target the save method where it's used
-    def test_edit_note_view_post_save_exception(self, mock_save):
+    # --- Test for an exception while writing the edit ---
+    # Edits are written with a conditional UPDATE (sync or async views)
+    @patch('notes.async_views.notes_with_code', side_effect=Exception("Simulated DB error during edit"))
+    @patch('notes.views.notes_with_code', side_effect=Exception("Simulated DB error during edit"))
+    def test_edit_note_view_post_save_exception(self, mock_write, mock_async_write):
         """
-        Tests the exception handling during form.save() in edit_note_view.
+        Tests the exception handling around the UPDATE in edit_note_view.
         """
-        # Configure the mock_save to raise an Exception when called
-        mock_save.side_effect = Exception("Simulated DB error during edit")
 
         original_content = self.test_note.content
         edit_data = {
             'username': self.test_note.username,
             'content': "This edit should fail during save.",
             'is_public': False,
-            'modification_code': self.correct_mod_code # Need correct code to pass initial checks
+            'modification_code': self.correct_mod_code, # Need correct code to pass initial checks
+            'version': self.test_note.version,
         }
 
         response = self.client.post(self.edit_url, data=edit_data)
@@ -621,3 +661,1838 @@ class NoteViewTests(TestCase):
         # Check that the form instance in the context is the one submitted (with errors if any)
         self.assertIsInstance(response.context['edit_form'], NoteForm)
         self.assertEqual(response.context['edit_form'].data['content'], edit_data['content'])
+
+
+# --- Tests for random public note sampling ---
+class RandomSamplingTests(TestCase):
+
+    def test_random_key_assigned_per_note(self):
+        """
+        Tests that every note gets its own random_key in [0, 1).
+        """
+        notes = [Note.objects.create(username="U", content="C", is_public=True) for _ in range(5)]
+        keys = {note.random_key for note in notes}
+        self.assertEqual(len(keys), 5, "Each note should draw its own random_key.")
+        self.assertTrue(all(0 <= key < 1 for key in keys))
+
+    def test_random_public_note_id_wraps_around(self):
+        """
+        Tests that a pivot past the largest key wraps around to the smallest one,
+        and that private notes are never picked.
+        """
+        low = Note.objects.create(username="Low", content="C", is_public=True, random_key=0.1)
+        Note.objects.create(username="High", content="C", is_public=True, random_key=0.5)
+        Note.objects.create(username="Private", content="C", is_public=False, random_key=0.9)
+
+        high = Note.objects.get(username="High")
+
+        picked = {random_public_note_id(pivot=pivot) for pivot in (0.05, 0.3, 0.7, 0.95) for _ in range(10)}
+        self.assertEqual(picked, {low.id, high.id})
+        # Past the largest key the window starts over at the smallest one
+        with patch('notes.sampling.random.choice', side_effect=lambda window: window[0]):
+            self.assertEqual(random_public_note_id(pivot=0.3), high.id)
+            self.assertEqual(random_public_note_id(pivot=0.7), low.id)
+
+    def test_random_public_note_id_close_to_uniform(self):
+        """
+        Tests that random keys' uneven gaps don't skew the picks much: with 20 notes every
+        note's share of 2000 picks stays within a loose band around 1/20.
+        """
+        keys = random.Random(7)
+        for i in range(20):
+            Note.objects.create(username=f"U{i}", content="C", is_public=True, random_key=keys.random())
+        picks = {}
+        with patch('notes.sampling.random', random.Random(11)):
+            for _ in range(2000):
+                note_id = random_public_note_id()
+                picks[note_id] = picks.get(note_id, 0) + 1
+        self.assertEqual(len(picks), 20)
+        # 100 each if exactly uniform; the first key after the pivot alone gives some notes
+        # a handful of picks and others several hundred
+        self.assertTrue(all(30 <= count <= 200 for count in picks.values()), picks)
+
+    def test_random_public_note_id_none_without_public_notes(self):
+        """
+        Tests that the sampler returns None when there are no public notes.
+        """
+        Note.objects.create(username="Private", content="C", is_public=False)
+        self.assertIsNone(random_public_note_id())
+
+    def test_random_note_view_single_query(self):
+        """
+        Tests that picking a random note does not load every public ID.
+        """
+        for i in range(RANDOM_PICK_WINDOW):
+            Note.objects.create(username="U", content="C", is_public=True, random_key=0.5 + i / 100)
+        with self.assertNumQueries(1):
+            random_public_note_id(pivot=0.2)
+
+    def test_making_note_public_redraws_random_key(self):
+        """
+        Tests that flipping a note to public through NoteForm gives it a new random_key.
+        """
+        note = Note.objects.create(username="U", content="C", is_public=False, random_key=0.25)
+        form = NoteForm({'username': 'U', 'content': 'C', 'is_public': True}, instance=note)
+        self.assertTrue(form.is_valid())
+        with patch('notes.forms.generate_random_key', return_value=0.75):
+            form.save()
+        note.refresh_from_db()
+        self.assertEqual(note.random_key, 0.75)
+
+
+# --- Tests for seeded, keyset-paginated public list ---
+class SeededPaginationTests(TestCase):
+
+    def setUp(self):
+        self.notes_list_url = reverse('notes:notes_list')
+        self.public_ids = {
+            Note.objects.create(username=f"User{i}", content=f"Note {i}", is_public=True).id
+            for i in range(25)
+        }
+
+    def walk(self, seed):
+        """Follows 'next' cursors from page 1 and returns the pages' note IDs."""
+        pages = []
+        params = {'seed': seed}
+        while True:
+            response = self.client.get(self.notes_list_url, params)
+            notes_page = response.context['notes_page']
+            pages.append([note.id for note in notes_page])
+            if not notes_page.has_next():
+                return pages, notes_page
+            params = {'seed': seed, 'cursor': notes_page.next_cursor, 'page': notes_page.next_page_number()}
+
+    def test_pages_cover_every_public_note_once(self):
+        """
+        Tests that paging through one seed shows each public note exactly once.
+        """
+        pages, _ = self.walk('80000000')
+        seen = [note_id for page in pages for note_id in page]
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(set(seen), self.public_ids)
+
+    def test_same_seed_same_order(self):
+        """
+        Tests that a seed always yields the same ordering.
+        """
+        first, _ = self.walk('1234abcd')
+        second, _ = self.walk('1234abcd')
+        self.assertEqual(first, second)
+
+    def test_previous_cursor_returns_previous_page(self):
+        """
+        Tests that the 'previous' cursor of the last page leads back to page 2.
+        """
+        pages, last_page = self.walk('c0ffee00')
+        response = self.client.get(self.notes_list_url, {
+            'seed': 'c0ffee00', 'cursor': last_page.previous_cursor, 'page': 2,
+        })
+        self.assertEqual([note.id for note in response.context['notes_page']], pages[1])
+
+    def test_first_request_gets_seed(self):
+        """
+        Tests that a request without a seed gets one, and its links carry it.
+        """
+        response = self.client.get(self.notes_list_url)
+        seed = response.context['seed']
+        self.assertRegex(seed, r'^[0-9a-f]{8}$')
+        self.assertContains(response, f"seed={seed}&amp;cursor=")
+
+    def test_mangled_cursor_falls_back_to_first_page(self):
+        """
+        Tests that an unreadable cursor shows page 1 instead of failing.
+        """
+        response = self.client.get(self.notes_list_url, {'seed': '80000000', 'cursor': '!!!', 'page': 7})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['notes_page'].number, 1)
+        self.assertEqual(len(response.context['notes_page']), 10)
+
+    def test_tampered_cursor_values_fall_back_to_first_page(self):
+        """
+        Tests that well-formed cursors carrying values of the wrong type show page 1 on the
+        public, recent and search lists instead of a 500.
+        """
+        Note.objects.create(username="Found", content="Searchable lorem.", is_public=True)
+        lists = [
+            (self.notes_list_url, {'seed': '80000000'}, 'notes_page'),
+            (reverse('notes:recent_notes'), {}, 'notes_page'),
+            (reverse('notes:search_notes'), {'q': 'lorem'}, 'results'),
+        ]
+        cursors = [
+            encode_cursor('n', 0, ['abc', 'def']),
+            encode_cursor('p', 0, ['0.5', 'not-a-uuid']),
+            encode_cursor('n', 0, ['2024-13-45', str(uuid.uuid4())]),
+            encode_cursor('n', 0, ['0.5']),
+            encode_cursor('n', 0, [None, None]),
+        ]
+        for url, params, page_name in lists:
+            for cursor in cursors:
+                with self.subTest(url=url, cursor=cursor):
+                    response = self.client.get(url, {**params, 'cursor': cursor, 'page': 4})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(response.context[page_name].number, 1)
+
+    def test_page_count_follows_writes(self):
+        """
+        Tests that "Page N of ~M" uses a cached public count kept up to date by creates and deletes.
+        """
+        note_cache().clear()
+        self.assertContains(self.client.get(self.notes_list_url, {'seed': '80000000'}), "Page 1 of ~3.")
+        for i in range(6):
+            self.client.post(reverse('notes:create_note'), {'username': 'More', 'content': f'More {i}', 'is_public': True})
+        self.client.post(reverse('notes:create_note'), {'username': 'Hidden', 'content': 'Private.'})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.notes_list_url, {'seed': '80000000'})
+        self.assertContains(response, "Page 1 of ~4.")
+        self.assertFalse(any('COUNT(' in query['sql'].upper() for query in ctx.captured_queries))
+
+        # Deleting a public note through its detail page counts it out again
+        note = Note.objects.filter(is_public=True).first()
+        note.issue_modification_code()
+        note.save()
+        self.client.get(reverse('notes:note_detail', args=[note.pk]))
+        self.client.post(reverse('notes:delete_note', args=[note.pk]), {
+            'modification_code': str(note.modification_code), 'version': note.version,
+        })
+        self.assertEqual(public_note_count(), 30)
+
+    def test_deep_page_has_no_count_query(self):
+        """
+        Tests that a page is fetched without any COUNT(*) or OFFSET query.
+        """
+        pages, last_page = self.walk('00000001')
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.notes_list_url, {'seed': '00000001', 'cursor': last_page.previous_cursor})
+        for query in ctx.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+            self.assertNotIn('OFFSET', query['sql'].upper())
+
+
+# --- Tests for the index coverage of view queries ---
+class QueryPlanTests(TestCase):
+
+    def test_view_queries_use_indexes(self):
+        """
+        Tests that no query issued by the views plans a full scan of notes_note.
+        """
+        note = Note.objects.create(username="U", content="C", is_public=True)
+        pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            self.skipTest(f"No plan pattern for {connection.vendor}")
+        for name, queryset in view_queries(note.pk).items():
+            with self.subTest(query=name):
+                self.assertIsNone(pattern.search(queryset.explain()), queryset.explain())
+
+    def test_seq_scan_pattern_matches_full_scans_only(self):
+        """
+        Tests the SQLite plan pattern against full and index scans.
+        """
+        pattern = SEQ_SCAN_PATTERNS['sqlite']
+        self.assertIsNotNone(pattern.search("2 0 0 SCAN notes_note"))
+        self.assertIsNone(pattern.search("4 0 0 SCAN notes_note USING INDEX note_public_created_idx"))
+        self.assertIsNone(pattern.search("3 0 0 SEARCH notes_note USING INDEX note_public_random_idx (random_key>?)"))
+
+
+# --- Tests for the per-note read-through cache ---
+class NoteCacheTests(TestCase):
+
+    def setUp(self):
+        note_cache().clear()
+        self.note = Note.objects.create(username="CachedUser", content="Cached content.", is_public=True)
+        self.code = str(self.note.modification_code)
+        self.detail_url = reverse('notes:note_detail', args=[self.note.pk])
+
+    def test_hot_note_costs_no_queries(self):
+        """
+        Tests that the second read of a note does not touch the database.
+        """
+        with self.assertNumQueries(1):
+            self.client.get(self.detail_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url)
+        self.assertContains(response, "Cached content.")
+
+    def test_edit_invalidates_cached_note(self):
+        """
+        Tests that a successful edit is visible on the next read.
+        """
+        self.client.get(self.detail_url)
+        self.client.post(reverse('notes:edit_note', args=[self.note.pk]), {
+            'username': 'CachedUser', 'content': 'Edited content.', 'is_public': True,
+            'modification_code': self.code, 'version': 1,
+        })
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, "Edited content.")
+        self.assertNotContains(response, "Cached content.")
+
+    def test_failed_edit_keeps_cached_note(self):
+        """
+        Tests that an edit rejected for a wrong code leaves the cache entry alone.
+        """
+        self.client.get(self.detail_url)
+        self.client.post(reverse('notes:edit_note', args=[self.note.pk]), {
+            'username': 'CachedUser', 'content': 'Nope.', 'modification_code': str(uuid.uuid4()),
+        })
+        self.assertIsNotNone(note_cache().get(note_cache_key(self.note.pk)))
+
+    def test_delete_invalidates_cached_note(self):
+        """
+        Tests that a deleted note stops being served from the cache.
+        """
+        self.client.get(self.detail_url)
+        self.client.post(reverse('notes:delete_note', args=[self.note.pk]), {'modification_code': self.code, 'version': 1})
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_per_process_cache_with_several_workers_is_reported(self):
+        """
+        Tests that a local-memory note cache with several workers is a system check warning
+        (an error under --deploy) rather than a settings failure, and that a shared one passes.
+        """
+        with self.settings(NOTE_CACHE_PER_PROCESS=True, WEB_CONCURRENCY=4):
+            self.assertEqual([message.id for message in run_checks(tags=['caches'])], ['notes.W001'])
+            errors = run_checks(tags=['caches'], include_deployment_checks=True)
+            self.assertIn('notes.E001', [message.id for message in errors])
+        with self.settings(NOTE_CACHE_PER_PROCESS=False, WEB_CONCURRENCY=4):
+            self.assertEqual(run_checks(tags=['caches'], include_deployment_checks=True), [])
+
+        # Commands such as migrate still start on hosts that set WEB_CONCURRENCY
+        loaded = subprocess.run(
+            [sys.executable, '-c', 'import django; django.setup()'],
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'ghostnote_project.settings', 'WEB_CONCURRENCY': '4',
+                 'NOTE_CACHE_BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            capture_output=True, text=True,
+        )
+        self.assertEqual(loaded.returncode, 0, loaded.stderr)
+
+
+# --- Tests for conditional GET and Cache-Control on note pages ---
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        note_cache().clear()
+        self.note = Note.objects.create(username="EtagUser", content="Etag content.", is_public=True)
+        self.detail_url = reverse('notes:note_detail', args=[self.note.pk])
+        self.list_url = reverse('notes:notes_list')
+
+    def test_detail_sends_validators(self):
+        """
+        Tests that the detail page carries a strong ETag, Last-Modified and a cache policy.
+        """
+        response = self.client.get(self.detail_url)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+        self.assertIn('max-age', response['Cache-Control'])
+
+    def test_detail_if_none_match_returns_304_without_rendering(self):
+        """
+        Tests that a matching If-None-Match gets a 304 and no template is rendered.
+        """
+        etag = self.client.get(self.detail_url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.templates, [])
+
+    def test_detail_if_modified_since_returns_304(self):
+        """
+        Tests that If-Modified-Since at the note's Last-Modified gets a 304.
+        """
+        last_modified = self.client.get(self.detail_url)['Last-Modified']
+        response = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_edit_changes_detail_etag(self):
+        """
+        Tests that an edit yields a new ETag, so old copies are refetched.
+        """
+        etag = self.client.get(self.detail_url)['ETag']
+        self.client.post(reverse('notes:edit_note', args=[self.note.pk]), {
+            'username': 'EtagUser', 'content': 'New content.', 'is_public': True,
+            'modification_code': str(self.note.modification_code), 'version': 1,
+        }, follow=True)
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "New content.")
+
+    def test_page_with_messages_is_not_stored(self):
+        """
+        Tests that the page carrying the post-create message is neither stored nor validated.
+        """
+        response = self.client.post(reverse('notes:create_note'), {
+            'username': 'NewUser', 'content': 'Brand new.', 'is_public': True,
+        }, follow=True)
+        self.assertIn('no-store', response['Cache-Control'])
+        self.assertNotIn('ETag', response)
+
+    def test_seeded_list_revalidates_until_public_notes_change(self):
+        """
+        Tests that a seeded list page answers 304 until a public note is created.
+        """
+        params = {'seed': '80000000'}
+        response = self.client.get(self.list_url, params)
+        self.assertIn('public', response['Cache-Control'])
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.list_url, params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.post(reverse('notes:create_note'), {
+            'username': 'Another', 'content': 'Another public note.', 'is_public': True,
+        })
+        self.assertEqual(self.client.get(self.list_url, params, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_other_workers_pick_up_writes_after_the_cache_timeout(self):
+        """
+        Tests that with a per-process cache a write this worker didn't see stops
+        being hidden by 304s once the version expires; a shared cache keeps it.
+        """
+        params = {'seed': '80000000'}
+        etag = self.client.get(self.list_url, params)['ETag']
+        # Another worker hid the note; its version bump never reached this one
+        Note.objects.filter(pk=self.note.pk).update(is_public=False)
+        self.assertEqual(self.client.get(self.list_url, params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        later = time.time() + settings.CACHES['notes']['TIMEOUT'] + 1
+        with patch('django.core.cache.backends.locmem.time') as clock:
+            clock.time.return_value = later
+            response = self.client.get(self.list_url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "Etag content.")
+
+        Note.objects.filter(pk=self.note.pk).update(is_public=True)
+        with self.settings(NOTE_CACHE_PER_PROCESS=False):
+            bump_public_notes_version()
+            etag = self.client.get(self.list_url, params)['ETag']
+            with patch('django.core.cache.backends.locmem.time') as clock:
+                clock.time.return_value = later + settings.CACHES['notes']['TIMEOUT'] + 1
+                self.assertEqual(self.client.get(self.list_url, params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_unseeded_list_has_no_etag(self):
+        """
+        Tests that a fresh shuffle is not offered for revalidation.
+        """
+        response = self.client.get(self.list_url)
+        self.assertNotIn('ETag', response)
+
+
+# --- Tests for the cacheable detail shell and the lazily loaded forms ---
+class LazyManageFormTests(TestCase):
+
+    def setUp(self):
+        note_cache().clear()
+        self.note = Note.objects.create(username="ShellUser", content="Shell content.", is_public=True)
+        self.detail_url = reverse('notes:note_detail', args=[self.note.pk])
+        self.manage_url = reverse('notes:note_manage', args=[self.note.pk])
+
+    def test_detail_shell_is_cookie_free_and_public(self):
+        """
+        Tests that the read-only page has no CSRF token, sets no cookies and is publicly cacheable.
+        """
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, "Shell content.")
+        self.assertContains(response, self.manage_url)
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, 'id="edit-form"')
+        self.assertEqual(len(response.cookies), 0)
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_manage_endpoint_returns_forms_with_csrf(self):
+        """
+        Tests that the on-demand endpoint returns both forms, a CSRF token and no-store.
+        """
+        response = self.client.get(self.manage_url)
+        self.assertTemplateUsed(response, 'notes/note_manage.html')
+        self.assertContains(response, 'id="edit-form"')
+        self.assertContains(response, 'id="delete-form"')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertIn('no-store', response['Cache-Control'])
+
+    def test_manage_endpoint_404_for_missing_note(self):
+        """
+        Tests that asking for the forms of a missing note gives a 404.
+        """
+        response = self.client.get(reverse('notes:note_manage', args=[uuid.uuid4()]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_detail_with_pending_message_renders_forms_inline(self):
+        """
+        Tests that a page carrying a flash message is rendered per-user with the forms inline.
+        """
+        response = self.client.post(reverse('notes:create_note'), {
+            'username': 'Inline', 'content': 'Inline forms.', 'is_public': False,
+        }, follow=True)
+        self.assertContains(response, "Keep this modification code safe")
+        self.assertContains(response, 'id="edit-form"')
+        self.assertFalse(response.context['lazy_manage'])
+
+
+# --- Tests for the session-free read path ---
+class SessionFreeReadTests(TestCase):
+
+    def setUp(self):
+        note_cache().clear()
+        self.note = Note.objects.create(username="Reader", content="Read only.", is_public=True)
+        # A stale session cookie must not make reads look the session up
+        self.client.cookies['sessionid'] = 'not-a-real-session'
+
+    def assertNoSessionQueries(self, url, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        for query in ctx.captured_queries:
+            self.assertNotIn('django_session', query['sql'])
+            self.assertNotIn('auth_user', query['sql'])
+        self.assertNotIn('sessionid', response.cookies)
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+        return response
+
+    def test_reads_never_touch_the_session(self):
+        """
+        Tests that landing, detail and list GETs skip session and auth lookups.
+        """
+        self.assertNoSessionQueries(reverse('home'))
+        self.assertNoSessionQueries(reverse('notes:note_detail', args=[self.note.pk]))
+        self.assertNoSessionQueries(reverse('notes:notes_list'), {'seed': '80000000'})
+
+    def test_messages_use_signed_cookie(self):
+        """
+        Tests that flash messages travel in a cookie and not in the session.
+        """
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('notes:create_note'), {
+                'username': 'Writer', 'content': 'Message test.',
+            })
+        self.assertIn('messages', response.cookies)
+        self.assertFalse(any('django_session' in query['sql'] for query in ctx.captured_queries))
+
+    def test_landing_page_is_shared_and_revalidated(self):
+        """
+        Tests that the landing page is publicly cacheable and answers 304 on a matching ETag.
+        """
+        response = self.client.get(reverse('home'))
+        self.assertIn('public', response['Cache-Control'])
+        # Where deletes redirect, so caches must ask before reusing it
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertNotIn('max-age', response['Cache-Control'])
+        response = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_edit_redirects_past_cached_detail_page(self):
+        """
+        Tests that an edit redirects to a URL naming the new version, so a detail page cached
+        before the edit isn't what the editor lands on, and the success message shows.
+        """
+        note = Note.objects.create(username="Cached", content="Before.", is_public=True)
+        detail_url = reverse('notes:note_detail', args=[note.pk])
+        self.assertIn('max-age', self.client.get(detail_url)['Cache-Control'])
+        response = self.client.post(reverse('notes:edit_note', args=[note.pk]), {
+            'username': 'Cached', 'content': 'After.', 'is_public': True,
+            'modification_code': str(note.modification_code), 'version': 1,
+        })
+        self.assertRedirects(response, f'{detail_url}?v=2', fetch_redirect_response=False)
+        response = self.client.get(response['Location'])
+        self.assertContains(response, "After.")
+        self.assertContains(response, "Note updated successfully!")
+
+
+# --- Tests for the cold start import profiler ---
+class ProfileImportsTests(TestCase):
+
+    def test_parse_importtime_output(self):
+        """
+        Tests that `python -X importtime` lines are parsed into (module, self, cumulative).
+        """
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       388 |       2541 |   dj_database_url\n"
+            "some unrelated warning\n"
+            "import time:     17085 |     283419 | ghostnote_project.wsgi\n"
+        )
+        self.assertEqual(list(parse_importtime(stderr)), [
+            ('dj_database_url', 388, 2541),
+            ('ghostnote_project.wsgi', 17085, 283419),
+        ])
+
+
+# --- Tests for the database connection strategies ---
+class ConnectionStrategyTests(TestCase):
+
+    def postgres(self):
+        return {'ENGINE': 'django.db.backends.postgresql', 'NAME': 'ghostnote'}
+
+    def test_persistent_strategy_keeps_connections_with_health_checks(self):
+        """
+        Tests that the default strategy reuses connections and health-checks them.
+        """
+        config = apply_conn_strategy(self.postgres(), 'persistent', conn_max_age=120)
+        self.assertEqual(config['CONN_MAX_AGE'], 120)
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+
+    def test_pooler_strategy_is_transaction_pooling_safe(self):
+        """
+        Tests that pooler mode drops persistent connections, server-side cursors and prepared statements.
+        """
+        with patch('ghostnote_project.database.has_psycopg3', return_value=True):
+            config = apply_conn_strategy(self.postgres(), 'pooler')
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertTrue(config['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertIsNone(config['OPTIONS']['prepare_threshold'])
+
+    def test_pool_strategy_caps_connections_per_worker(self):
+        """
+        Tests that pool mode caps each worker's pool at DB_POOL_MAX_SIZE.
+        """
+        with patch('ghostnote_project.database.has_psycopg_pool', return_value=True):
+            config = apply_conn_strategy(self.postgres(), 'pool', pool_max_size=3)
+        self.assertEqual(config['OPTIONS']['pool']['max_size'], 3)
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+
+    def test_pool_strategy_requires_psycopg3(self):
+        """
+        Tests that pool mode refuses to start without psycopg 3, or with it but without psycopg_pool.
+        """
+        with patch('ghostnote_project.database.has_psycopg3', return_value=False):
+            with self.assertRaises(ImproperlyConfigured):
+                apply_conn_strategy(self.postgres(), 'pool')
+        with patch('ghostnote_project.database.has_psycopg3', return_value=True), \
+                patch('ghostnote_project.database.importlib.util.find_spec', return_value=None):
+            with self.assertRaisesMessage(ImproperlyConfigured, "psycopg[binary,pool]"):
+                apply_conn_strategy(self.postgres(), 'pool')
+
+    def test_unknown_strategy_and_sqlite(self):
+        """
+        Tests that unknown strategies are rejected and SQLite configs are left alone.
+        """
+        with self.assertRaises(ImproperlyConfigured):
+            apply_conn_strategy(self.postgres(), 'bogus')
+        sqlite = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'db.sqlite3'}
+        self.assertEqual(apply_conn_strategy(dict(sqlite), 'pooler'), sqlite)
+
+
+# --- Tests for the async (ASGI) note views ---
+class AsyncViewTests(TestCase):
+
+    def setUp(self):
+        note_cache().clear()
+        self.factory = AsyncRequestFactory()
+        self.note = Note.objects.create(username="AsyncUser", content="Async content.", is_public=True)
+        self.code = str(self.note.modification_code)
+
+    def request(self, method, path, data=None):
+        request = getattr(self.factory, method)(path, data or {})
+        request._messages = default_storage(request) # What MessageMiddleware would attach
+        return request
+
+    async def test_detail_and_list_match_sync_views(self):
+        """
+        Tests that the async detail and list pages render the same content and cache policy.
+        """
+        url = reverse('notes:note_detail', args=[self.note.pk])
+        response = await async_views.note_detail_view(self.request('get', url), note_id=self.note.pk)
+        self.assertContains(response, "Async content.")
+        self.assertEqual(response['Cache-Control'], (await self.async_client.get(url))['Cache-Control'])
+
+        list_url = reverse('notes:notes_list')
+        response = await async_views.random_notes_list_view(self.request('get', list_url, {'seed': '0000abcd'}))
+        self.assertContains(response, "Async content.")
+        self.assertIn('ETag', response)
+
+    async def test_missing_note_is_404(self):
+        """
+        Tests that the async views raise Http404 for unknown notes.
+        """
+        from django.http import Http404
+        missing = uuid.uuid4()
+        with self.assertRaises(Http404):
+            await async_views.note_detail_view(self.request('get', '/'), note_id=missing)
+        with self.assertRaises(Http404):
+            await async_views.delete_note_view(self.request('post', '/', {'modification_code': self.code}), note_id=missing)
+
+    async def test_create_edit_delete_round_trip(self):
+        """
+        Tests that create, edit (wrong then right code) and delete work through the async views.
+        """
+        request = self.request('post', '/', {'username': 'New', 'content': 'Made async.', 'is_public': True})
+        response = await async_views.create_note_view(request)
+        self.assertEqual(response.status_code, 302)
+        created = await Note.objects.aget(content='Made async.')
+        shown_code = re.search(r'<code>([0-9a-f-]{36})</code>', str(list(get_messages(request))[0])).group(1)
+        self.assertTrue(created.code_matches(shown_code))
+
+        edit = {'username': 'AsyncUser', 'content': 'Edited async.', 'is_public': True, 'version': 1}
+        request = self.request('post', '/', dict(edit, modification_code=str(uuid.uuid4())))
+        await async_views.edit_note_view(request, note_id=self.note.pk)
+        self.assertEqual([str(m) for m in get_messages(request)], ["Invalid modification code."])
+        request = self.request('post', '/', dict(edit, modification_code=self.code))
+        response = await async_views.edit_note_view(request, note_id=self.note.pk)
+        self.assertEqual(response.status_code, 302)
+        await self.note.arefresh_from_db()
+        self.assertEqual(self.note.content, 'Edited async.')
+        self.assertIsNone(note_cache().get(note_cache_key(self.note.pk)))
+
+        request = self.request('post', '/', {'modification_code': self.code, 'version': 2})
+        response = await async_views.delete_note_view(request, note_id=self.note.pk)
+        self.assertEqual(response.url, reverse('home'))
+        self.assertFalse(await Note.objects.filter(pk=self.note.pk).aexists())
+
+    async def test_random_note_redirects(self):
+        """
+        Tests that the async random view redirects to a public note.
+        """
+        response = await async_views.random_note_view(self.request('get', '/'))
+        self.assertEqual(response.url, reverse('notes:note_detail', args=[self.note.pk]))
+
+
+# --- Tests for the JSON API ---
+class NoteApiTests(TestCase):
+
+    def setUp(self):
+        note_cache().clear()
+        self.note = Note.objects.create(username="ApiUser", content="Api content.", is_public=True)
+        self.code = str(self.note.modification_code)
+        self.collection_url = reverse('notes_api:notes')
+        self.note_url = reverse('notes_api:note', args=[self.note.pk])
+
+    def post_json(self, data):
+        return self.client.post(self.collection_url, data, content_type='application/json')
+
+    def test_create_single_note(self):
+        """
+        Tests that POSTing an object creates one note and returns its modification code.
+        """
+        response = self.post_json({'username': 'One', 'content': 'Single.', 'is_public': False})
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        note = Note.objects.get(pk=data['id'])
+        self.assertEqual(note.content, 'Single.')
+        self.assertTrue(note.code_matches(data['modification_code']))
+
+    def test_bulk_create_is_one_insert_and_all_or_nothing(self):
+        """
+        Tests that a bulk POST inserts every note with one INSERT, and nothing if any note is invalid.
+        """
+        items = [{'username': f'Bulk{i}', 'content': f'Bulk {i}.', 'is_public': True} for i in range(5)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post_json(items)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()), 5)
+        inserts = [query for query in ctx.captured_queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+
+        response = self.post_json([{'username': 'Fine', 'content': 'Fine.'}, {'username': 'NoContent'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('content', response.json()['errors']['1'])
+        self.assertFalse(Note.objects.filter(username='Fine').exists())
+
+    def test_batch_fetch_with_field_selection(self):
+        """
+        Tests that ?ids= fetches several notes in one query, returning only the requested fields.
+        """
+        other = Note.objects.create(username="Other", content="Other content.")
+        missing = uuid.uuid4()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.collection_url, {
+                'ids': f'{other.pk},{self.note.pk},{missing}', 'fields': 'id,username',
+            })
+        data = response.json()
+        self.assertEqual(data['notes'], [
+            {'id': str(other.pk), 'username': 'Other'},
+            {'id': str(self.note.pk), 'username': 'ApiUser'},
+        ])
+        self.assertEqual(data['missing'], [str(missing)])
+
+    def test_batch_fetch_rejects_bad_input(self):
+        """
+        Tests that unknown fields, bad IDs and oversized batches are rejected.
+        """
+        self.assertEqual(self.client.get(self.collection_url, {'ids': str(self.note.pk), 'fields': 'modification_code'}).status_code, 400)
+        self.assertEqual(self.client.get(self.collection_url, {'ids': 'not-a-uuid'}).status_code, 400)
+        self.assertEqual(self.client.get(self.collection_url).status_code, 400)
+        with self.settings(API_BATCH_MAX=2):
+            ids = ','.join(str(uuid.uuid4()) for _ in range(3))
+            self.assertEqual(self.client.get(self.collection_url, {'ids': ids}).status_code, 400)
+
+    def test_get_single_note_never_exposes_code(self):
+        """
+        Tests that reading a note returns its fields but not the modification code.
+        """
+        data = self.client.get(self.note_url).json()
+        self.assertEqual(data['content'], 'Api content.')
+        self.assertNotIn('modification_code', data)
+        self.assertEqual(self.client.get(reverse('notes_api:note', args=[uuid.uuid4()])).status_code, 404)
+
+    def test_patch_requires_code_and_updates(self):
+        """
+        Tests that PATCH is gated by the modification code and only changes the given fields.
+        """
+        response = self.client.patch(self.note_url, {'content': 'Hacked.'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(self.note_url, {'content': 'Hacked.', 'modification_code': str(uuid.uuid4())},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+        self.client.get(reverse('notes:note_detail', args=[self.note.pk])) # Warm the cache
+        response = self.client.patch(self.note_url, {'content': 'Patched.'}, content_type='application/json',
+                                     HTTP_X_MODIFICATION_CODE=self.code)
+        self.assertEqual(response.status_code, 200)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.content, 'Patched.')
+        self.assertEqual(self.note.username, 'ApiUser')
+        self.assertIsNone(note_cache().get(note_cache_key(self.note.pk)))
+
+    def test_patch_of_note_deleted_meanwhile_is_404(self):
+        """
+        Tests that a PATCH whose note is deleted right after the UPDATE answers 404, not 500.
+        """
+        def deleted_meanwhile(note_id):
+            Note.objects.filter(pk=note_id).delete()
+        with patch('notes.api.invalidate_note', side_effect=deleted_meanwhile):
+            response = self.client.patch(self.note_url, {'content': 'Patched.', 'modification_code': self.code},
+                                         content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['error'], "Note not found.")
+
+    def test_delete_requires_code(self):
+        """
+        Tests that DELETE is gated by the modification code.
+        """
+        body = {'modification_code': str(uuid.uuid4())}
+        self.assertEqual(self.client.delete(self.note_url, body, content_type='application/json').status_code, 403)
+        body = {'modification_code': self.code}
+        self.assertEqual(self.client.delete(self.note_url, body, content_type='application/json').status_code, 204)
+        self.assertFalse(Note.objects.filter(pk=self.note.pk).exists())
+
+
+# --- Tests for NDJSON export/import ---
+class NoteExportImportTests(TestCase):
+
+    def setUp(self):
+        self.notes = [
+            Note.objects.create(username=f"Exported{i}", content=f"Exported content {i}.", is_public=i % 2 == 0)
+            for i in range(5)
+        ]
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, 'notes.ndjson.gz')
+
+    def snapshot(self):
+        return list(Note.objects.order_by('created_at', 'id').values(*export_fields()))
+
+    def test_round_trip_restores_notes_exactly(self):
+        """
+        Tests that exporting, wiping and importing gives back identical rows, timestamps included.
+        """
+        before = self.snapshot()
+        call_command('export_notes', self.path, chunk_size=2, stderr=io.StringIO())
+        Note.objects.all().delete()
+        call_command('import_notes', self.path, batch_size=2, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(self.snapshot(), before)
+
+    def test_failed_import_can_resume(self):
+        """
+        Tests that a failing batch reports how many lines are in, and --skip resumes from there.
+        """
+        call_command('export_notes', self.path, stderr=io.StringIO())
+        Note.objects.exclude(pk=self.notes[3].pk).delete() # Line 4 will collide
+        with self.assertRaisesMessage(CommandError, '--skip 2'):
+            call_command('import_notes', self.path, batch_size=2, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(Note.objects.count(), 3)
+        call_command('import_notes', self.path, batch_size=2, skip=2, ignore_existing=True,
+                     stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(Note.objects.count(), 5)
+
+    def test_reimport_with_ignore_existing_counts_only_new_notes(self):
+        """
+        Tests that importing the same file twice with --ignore-existing reports 0 imported the
+        second time, and that the cached public listing isn't bumped for notes already there.
+        """
+        call_command('export_notes', self.path, stderr=io.StringIO())
+        Note.objects.filter(pk=self.notes[0].pk).delete()
+        first = io.StringIO()
+        call_command('import_notes', self.path, ignore_existing=True, stdout=first, stderr=io.StringIO())
+        self.assertIn("Imported 1 notes", first.getvalue())
+        self.assertIn("skipped 4 existing", first.getvalue())
+
+        again = io.StringIO()
+        with patch('notes.management.commands.import_notes.bump_public_notes_version') as bump:
+            call_command('import_notes', self.path, ignore_existing=True, stdout=again, stderr=io.StringIO())
+        self.assertIn("Imported 0 notes", again.getvalue())
+        self.assertIn("skipped 5 existing", again.getvalue())
+        bump.assert_not_called()
+        self.assertEqual(Note.objects.count(), 5)
+
+    def test_import_warns_about_per_process_cache(self):
+        """
+        Tests that importing public notes says when workers won't see them right away.
+        """
+        call_command('export_notes', self.path, stderr=io.StringIO())
+        Note.objects.all().delete()
+        stderr = io.StringIO()
+        call_command('import_notes', self.path, stdout=io.StringIO(), stderr=stderr)
+        self.assertIn("note cache is per process", stderr.getvalue())
+
+        Note.objects.all().delete()
+        stderr = io.StringIO()
+        with self.settings(NOTE_CACHE_PER_PROCESS=False):
+            call_command('import_notes', self.path, stdout=io.StringIO(), stderr=stderr)
+        self.assertNotIn("note cache is per process", stderr.getvalue())
+
+
+# --- Tests for full-text search ---
+class SearchTests(TestCase):
+
+    def setUp(self):
+        self.url = reverse('notes:search_notes')
+
+    def test_search_finds_public_matches_only(self):
+        """
+        Tests that search matches content and username of public notes, never private ones.
+        """
+        public = Note.objects.create(username="Sailor", content="The harbour lights at dusk.", is_public=True)
+        by_name = Note.objects.create(username="harbour_master", content="Ropes.", is_public=True)
+        Note.objects.create(username="Secret", content="A private harbour.", is_public=False)
+        response = self.client.get(self.url, {'q': 'harbour'})
+        self.assertEqual({note.pk for note in response.context['results']}, {public.pk, by_name.pk})
+        self.assertNotContains(response, "A private harbour.")
+
+    def test_search_sees_bulk_inserts_and_edits(self):
+        """
+        Tests that the index follows bulk_create, updates and deletes (it is maintained by the database).
+        """
+        Note.objects.bulk_create([Note(username=f"Bulk{i}", content="Bulk quokka.", is_public=True) for i in range(3)])
+        self.assertEqual(len(self.client.get(self.url, {'q': 'quokka'}).context['results']), 3)
+        Note.objects.filter(username="Bulk0").update(content="Changed.")
+        Note.objects.filter(username="Bulk1").delete()
+        self.assertEqual(len(self.client.get(self.url, {'q': 'quokka'}).context['results']), 1)
+
+    def test_search_ranks_and_pages_without_repeats(self):
+        """
+        Tests that better matches come first and keyset pages cover every result exactly once.
+        """
+        best = Note.objects.create(username="Walrus", content="walrus walrus walrus", is_public=True)
+        for i in range(25):
+            Note.objects.create(username=f"User{i}", content=f"A walrus among {i} other words here.", is_public=True)
+        response = self.client.get(self.url, {'q': 'walrus'})
+        results = response.context['results']
+        self.assertEqual(results.object_list[0].pk, best.pk)
+
+        seen = []
+        while True:
+            seen.extend(note.pk for note in results)
+            if not results.has_next():
+                break
+            results = self.client.get(self.url, {'q': 'walrus', 'cursor': results.next_cursor}).context['results']
+        self.assertEqual(len(seen), 26)
+        self.assertEqual(len(set(seen)), 26)
+
+    def test_search_input_is_never_query_syntax(self):
+        """
+        Tests that operators and quotes in the query are treated as plain words.
+        """
+        Note.objects.create(username="Quoted", content="Fish and chips.", is_public=True)
+        for query in ['"fish', 'fish AND', 'NEAR(fish', 'fish*)', '***', '']:
+            response = self.client.get(self.url, {'q': query})
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.client.get(self.url, {'q': 'fish*)'}).context['results']), 1)
+
+
+# --- Tests for the recent public notes feed ---
+class RecentFeedTests(TestCase):
+
+    def setUp(self):
+        self.url = reverse('notes:recent_notes')
+        start = timezone.now()
+        self.public = []
+        for i in range(25):
+            note = Note.objects.create(username=f"Recent{i}", content=f"Recent {i}.", is_public=i % 5 != 0)
+            # Several notes share a timestamp, so the id tie-breaker matters
+            Note.objects.filter(pk=note.pk).update(created_at=start - timezone.timedelta(minutes=i // 3))
+            if note.is_public:
+                self.public.append(note.pk)
+
+    def test_feed_walks_newest_first_both_ways(self):
+        """
+        Tests that next and previous cursors cover every public note once, newest first.
+        """
+        expected = list(Note.objects.filter(is_public=True).order_by('-created_at', '-id').values_list('pk', flat=True))
+        pages = [self.client.get(self.url).context['notes_page']]
+        while pages[-1].has_next():
+            pages.append(self.client.get(self.url, {'cursor': pages[-1].next_cursor}).context['notes_page'])
+        self.assertEqual([note.pk for page in pages for note in page], expected)
+        self.assertEqual(len(pages), 2)
+
+        back = self.client.get(self.url, {'cursor': pages[-1].previous_cursor}).context['notes_page']
+        self.assertEqual([note.pk for note in back], [note.pk for note in pages[0]])
+
+    def test_deep_pages_never_count_or_offset(self):
+        """
+        Tests that a page deep in the feed is one query without COUNT or OFFSET.
+        """
+        first = self.client.get(self.url).context['notes_page']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, {'cursor': first.next_cursor, 'page': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        sql = ctx.captured_queries[0]['sql'].upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+
+# --- Tests for the RSS/Atom feeds ---
+class FeedTests(TestCase):
+
+    def setUp(self):
+        note_cache().clear()
+        self.note = Note.objects.create(username="Feeder", content="First in the feed.", is_public=True)
+        Note.objects.create(username="Hidden", content="Never in the feed.", is_public=False)
+        self.rss_url = reverse('notes:feed_rss')
+        self.atom_url = reverse('notes:feed_atom')
+
+    def test_feeds_list_public_notes(self):
+        """
+        Tests that both feeds render and contain only public notes.
+        """
+        rss = self.client.get(self.rss_url)
+        self.assertEqual(rss['Content-Type'], 'application/rss+xml; charset=utf-8')
+        self.assertContains(rss, "First in the feed.")
+        self.assertNotContains(rss, "Never in the feed.")
+        atom = self.client.get(self.atom_url)
+        self.assertEqual(atom['Content-Type'], 'application/atom+xml; charset=utf-8')
+        self.assertContains(atom, "First in the feed.")
+
+    def test_thousand_polls_cost_no_queries(self):
+        """
+        Tests that after the first render, 1000 polls (plain and conditional) to
+        the same worker cause zero queries while the public notes don't change.
+        """
+        first = self.client.get(self.rss_url)
+        with self.assertNumQueries(0):
+            for i in range(1000):
+                if i % 2:
+                    response = self.client.get(self.rss_url, HTTP_IF_NONE_MATCH=first['ETag'])
+                    self.assertEqual(response.status_code, 304)
+                else:
+                    response = self.client.get(self.rss_url)
+                    self.assertEqual(response.content, first.content)
+
+    def test_write_from_another_worker_reaches_feed(self):
+        """
+        Tests that a write whose version bump this worker never saw shows in
+        the feed (and stops the 304s) once the cached version expires.
+        """
+        first = self.client.get(self.rss_url)
+        Note.objects.filter(pk=self.note.pk).update(is_public=False) # Done by another worker
+        self.assertEqual(self.client.get(self.rss_url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        with patch('django.core.cache.backends.locmem.time') as clock:
+            clock.time.return_value = time.time() + settings.CACHES['notes']['TIMEOUT'] + 1
+            response = self.client.get(self.rss_url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "First in the feed.")
+
+    def test_public_writes_regenerate_feed(self):
+        """
+        Tests that creating a public note or making one private refreshes the feed.
+        """
+        first = self.client.get(self.atom_url)
+        self.client.post(reverse('notes:create_note'), {'username': 'Late', 'content': 'Fresh note.', 'is_public': True})
+        response = self.client.get(self.atom_url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Fresh note.")
+
+        self.client.post(reverse('notes:edit_note', args=[self.note.pk]), {
+            'username': 'Feeder', 'content': 'First in the feed.', 'modification_code': str(self.note.modification_code), 'version': 1,
+        })
+        self.assertNotContains(self.client.get(self.atom_url), "First in the feed.")
+
+
+# --- Tests for the stored HTML fragments ---
+class StoredFragmentTests(TestCase):
+
+    def setUp(self):
+        note_cache().clear()
+
+    def test_save_stores_escaped_fragments(self):
+        """
+        Tests that saving (here through NoteForm) stores the escaped body and excerpt, and edits refresh them.
+        """
+        form = NoteForm(data={'username': 'Frag', 'content': '<script>x</script> & ' + 'y' * 200, 'is_public': True})
+        note = form.save()
+        self.assertTrue(note.content_html.startswith('&lt;script&gt;x&lt;/script&gt; &amp; '))
+        self.assertTrue(note.excerpt.endswith('…'))
+        self.assertNotIn('<script>', note.excerpt)
+
+        edit = NoteForm(data={'username': 'Frag', 'content': 'Short now.', 'is_public': True}, instance=note)
+        note = edit.save()
+        self.assertEqual((note.content_html, note.excerpt), ('Short now.', 'Short now.'))
+
+    def test_templates_render_same_html_with_or_without_fragments(self):
+        """
+        Tests that stored fragments give the exact markup the templates would render themselves.
+        """
+        content = 'Tags <i>stay</i> "escaped" & ' + ' '.join(['long'] * 40)
+        stored = NoteForm(data={'username': 'A', 'content': content, 'is_public': True}).save()
+        plain, = Note.objects.bulk_create([Note(username='A', content=content, is_public=True)]) # Skips save()
+        self.assertEqual(plain.content_html, '')
+        self.assertEqual(render_to_string('notes/note_body.html', {'note': stored}),
+                         render_to_string('notes/note_body.html', {'note': plain}))
+        card = Template('{{ note.content|truncatechars:100 }}').render(Context({'note': plain}))
+        self.assertEqual(stored.excerpt, card)
+
+    def test_import_renders_fragments_for_old_exports(self):
+        """
+        Tests that importing rows without fragments renders them.
+        """
+        row = {'id': str(uuid.uuid4()), 'username': 'Old', 'content': 'a < b', 'is_public': True,
+               'modification_code': str(uuid.uuid4()), 'random_key': 0.5,
+               'created_at': '2025-01-01T00:00:00+00:00', 'updated_at': '2025-01-01T00:00:00+00:00'}
+        path = os.path.join(tempfile.mkdtemp(), 'old.ndjson')
+        with open(path, 'w') as f:
+            f.write(json.dumps(row) + '\n')
+        call_command('import_notes', path, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(Note.objects.get(pk=row['id']).content_html, 'a &lt; b')
+
+    def test_import_ignores_rendered_fragments_in_file(self):
+        """
+        Tests that content_html and excerpt from an import file are re-rendered, not stored as-is.
+        """
+        row = {'id': str(uuid.uuid4()), 'username': 'Crafted', 'content': '<script>alert(0)</script>', 'is_public': True,
+               'code_hash': hash_modification_code(uuid.uuid4()), 'random_key': 0.5,
+               'content_html': '<script>alert(1)</script>', 'excerpt': '<script>alert(2)</script>',
+               'created_at': '2025-01-01T00:00:00+00:00', 'updated_at': '2025-01-01T00:00:00+00:00'}
+        path = os.path.join(tempfile.mkdtemp(), 'crafted.ndjson')
+        with open(path, 'w') as f:
+            f.write(json.dumps(row) + '\n')
+        call_command('import_notes', path, stdout=io.StringIO(), stderr=io.StringIO())
+        note = Note.objects.get(pk=row['id'])
+        escaped = '&lt;script&gt;alert(0)&lt;/script&gt;'
+        self.assertEqual((note.content_html, note.excerpt), (escaped, escaped))
+        response = self.client.get(reverse('notes:note_detail', args=[note.pk]))
+        self.assertNotContains(response, '<script>alert')
+
+
+# --- Tests for content limits and lazy loading of bodies ---
+class LargeContentTests(TestCase):
+
+    def setUp(self):
+        note_cache().clear()
+        self.big = Note.objects.create(username="Big", content="word " * 5000, is_public=True)
+
+    def test_form_enforces_max_content_length(self):
+        """
+        Tests that NoteForm rejects bodies over NOTE_MAX_CONTENT_LENGTH.
+        """
+        with self.settings(NOTE_MAX_CONTENT_LENGTH=10):
+            form = NoteForm(data={'username': 'Long', 'content': 'x' * 11})
+            self.assertFalse(form.is_valid())
+            self.assertIn('at most 10 characters', form.errors['content'][0])
+            self.assertTrue(NoteForm(data={'username': 'Short', 'content': 'x' * 10}).is_valid())
+
+    def test_list_pages_never_load_bodies(self):
+        """
+        Tests that the public list, recent feed and search read the excerpt but not content or content_html.
+        """
+        pages = [
+            (reverse('notes:notes_list'), {'seed': '00000000'}),
+            (reverse('notes:recent_notes'), {}),
+            (reverse('notes:search_notes'), {'q': 'word'}),
+        ]
+        for url, params in pages:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url, params)
+            self.assertContains(response, self.big.excerpt)
+            for query in ctx.captured_queries:
+                self.assertNotIn('"notes_note"."content"', query['sql'], url)
+                self.assertNotIn('"notes_note"."content_html"', query['sql'], url)
+
+
+class RateLimitTests(TestCase):
+
+    TIGHT_LIMITS = {'create': '2/60', 'edit': '2/60', 'delete': '2/60'}
+
+    def setUp(self):
+        caches['ratelimit'].clear()
+        self.note = Note.objects.create(username="Limited", content="Rate limited.", is_public=True)
+        self.code = str(self.note.modification_code)
+
+    def tearDown(self):
+        caches['ratelimit'].clear()
+
+    def test_client_ip_ignores_client_supplied_forwarded_entries(self):
+        """
+        Tests that the client address is taken from the right of X-Forwarded-For, where the
+        trusted proxies appended it, so rotating the header's first entry doesn't dodge the limits.
+        """
+        factory = RequestFactory()
+        with self.settings(RATELIMIT_IP_META_KEY='HTTP_X_FORWARDED_FOR', RATELIMIT_TRUSTED_PROXIES=1):
+            for spoofed in ('1.1.1.1', '2.2.2.2'):
+                request = factory.post('/', HTTP_X_FORWARDED_FOR=f'{spoofed}, 203.0.113.7', REMOTE_ADDR='10.0.0.1')
+                self.assertEqual(client_ip(request), '203.0.113.7')
+            self.assertEqual(client_ip(factory.post('/', REMOTE_ADDR='10.0.0.1')), '10.0.0.1')
+        with self.settings(RATELIMIT_IP_META_KEY='HTTP_X_FORWARDED_FOR', RATELIMIT_TRUSTED_PROXIES=2):
+            request = factory.post('/', HTTP_X_FORWARDED_FOR='1.1.1.1, 203.0.113.7, 198.51.100.2')
+            self.assertEqual(client_ip(request), '203.0.113.7')
+            # Fewer entries than proxies: the header wasn't written by them
+            request = factory.post('/', HTTP_X_FORWARDED_FOR='1.1.1.1', REMOTE_ADDR='10.0.0.1')
+            self.assertEqual(client_ip(request), '10.0.0.1')
+        with self.settings(RATELIMIT_IP_META_KEY='HTTP_X_REAL_IP'):
+            self.assertEqual(client_ip(factory.post('/', HTTP_X_REAL_IP='203.0.113.7')), '203.0.113.7')
+
+    def test_parse_rate(self):
+        """
+        Tests that rates can be given in seconds or with an s/m/h unit.
+        """
+        self.assertEqual(parse_rate('20/60'), Rate(20, 60))
+        self.assertEqual(parse_rate('20/m'), Rate(20, 60))
+        self.assertEqual(parse_rate('5/10s'), Rate(5, 10))
+        self.assertEqual(parse_rate('100/h'), Rate(100, 3600))
+
+    def test_create_over_limit_gets_cheap_429(self):
+        """
+        Tests that creates past the burst get a 429 with Retry-After, without any query.
+        """
+        url = reverse('notes:create_note')
+        data = {'username': 'Spammer', 'content': 'Spam.', 'is_public': True}
+        with self.settings(RATELIMITS=self.TIGHT_LIMITS):
+            for _ in range(2):
+                self.assertEqual(self.client.post(url, data).status_code, 302)
+            with self.assertNumQueries(0):
+                response = self.client.post(url, data)
+            self.assertEqual(response.status_code, 429)
+            self.assertTrue(0 < int(response['Retry-After']) <= 30)
+            # Reads are never limited
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(Note.objects.filter(username='Spammer').count(), 2)
+
+    def test_edit_buckets_are_per_note(self):
+        """
+        Tests that wrong-code edits of one note are throttled without affecting other notes.
+        """
+        other = Note.objects.create(username="Other", content="Other note.")
+        data = {'username': 'Guess', 'content': 'Guess.', 'modification_code_attempt': str(uuid.uuid4())}
+        with self.settings(RATELIMITS=self.TIGHT_LIMITS):
+            for _ in range(2):
+                self.client.post(reverse('notes:edit_note', args=[self.note.pk]), data)
+            response = self.client.post(reverse('notes:edit_note', args=[self.note.pk]), data)
+            self.assertEqual(response.status_code, 429)
+            response = self.client.post(reverse('notes:edit_note', args=[other.pk]), data)
+            self.assertEqual(response.status_code, 200)
+
+    def test_disabled_limits_let_everything_through(self):
+        """
+        Tests that RATELIMIT_ENABLED=False turns the limiter off.
+        """
+        data = {'modification_code_attempt': str(uuid.uuid4())}
+        with self.settings(RATELIMITS=self.TIGHT_LIMITS, RATELIMIT_ENABLED=False):
+            for _ in range(4):
+                response = self.client.post(reverse('notes:delete_note', args=[self.note.pk]), data)
+                self.assertEqual(response.status_code, 200)
+
+    def test_api_writes_are_limited(self):
+        """
+        Tests that the JSON API shares the create/delete limits.
+        """
+        url = reverse('notes_api:note', args=[self.note.pk])
+        with self.settings(RATELIMITS=self.TIGHT_LIMITS):
+            for _ in range(2):
+                self.client.delete(url, headers={'X-Modification-Code': str(uuid.uuid4())})
+            self.assertEqual(self.client.delete(url).status_code, 429)
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    async def test_async_views_are_limited(self):
+        """
+        Tests that the decorator also guards the async views.
+        """
+        factory = AsyncRequestFactory()
+        data = {'username': 'Async', 'content': 'Async spam.'}
+        with self.settings(RATELIMITS=self.TIGHT_LIMITS):
+            statuses = []
+            for _ in range(3):
+                request = factory.post(reverse('notes:create_note'), data)
+                request._messages = default_storage(request)
+                statuses.append((await async_views.create_note_view(request)).status_code)
+        self.assertEqual(statuses, [302, 302, 429])
+
+
+# --- Tests for hashed modification codes ---
+class HashedCodeTests(TestCase):
+
+    def setUp(self):
+        note_cache().clear()
+        caches['ratelimit'].clear()
+        self.note = Note.objects.create(username="Hashed", content="Only the hash.", is_public=True)
+        self.code = str(self.note.modification_code)
+        self.edit_url = reverse('notes:edit_note', args=[self.note.pk])
+        self.delete_url = reverse('notes:delete_note', args=[self.note.pk])
+
+    def test_only_the_hash_is_stored(self):
+        """
+        Tests that no column holds the plaintext code, and the stored hash matches it.
+        """
+        row = Note.objects.filter(pk=self.note.pk).values().get()
+        self.assertNotIn(self.code, [str(value) for value in row.values()])
+        self.assertEqual(row['code_hash'], hash_modification_code(self.code))
+        self.assertFalse(Note.objects.get(pk=self.note.pk).code_matches(str(uuid.uuid4())))
+
+    def test_code_is_never_logged(self):
+        """
+        Tests that creating a note through the form or the API logs nothing containing its code.
+        """
+        with self.assertLogs('notes', level='DEBUG') as logs:
+            response = self.client.post(reverse('notes:create_note'), {'username': 'Quiet', 'content': 'Secret code.'})
+            shown = re.search(r'<code>([0-9a-f-]{36})</code>', str(list(get_messages(response.wsgi_request))[0])).group(1)
+            created = self.client.post(reverse('notes_api:notes'), {'username': 'Quiet', 'content': 'Via API.'},
+                                       content_type='application/json').json()
+        for code in (shown, created['modification_code']):
+            self.assertFalse(any(code in line for line in logs.output))
+
+    def test_wrong_code_reads_no_row(self):
+        """
+        Tests that a wrong-code edit or delete of a cached note is refused without any query.
+        """
+        self.client.get(reverse('notes:note_detail', args=[self.note.pk])) # Caches the note
+        wrong = str(uuid.uuid4())
+        for url, data in [
+            (self.edit_url, {'username': 'Hashed', 'content': 'Nope.', 'modification_code': wrong}),
+            (self.delete_url, {'modification_code': wrong}),
+        ]:
+            with self.assertNumQueries(0):
+                response = self.client.post(url, data)
+            self.assertContains(response, "Invalid modification code.")
+        self.assertEqual(Note.objects.get(pk=self.note.pk).content, "Only the hash.")
+
+    def test_edit_applies_derived_columns(self):
+        """
+        Tests that the UPDATE keeps fragments, updated_at and the sampling key in step like save() does.
+        """
+        private = Note.objects.create(username="Private", content="Hidden.", is_public=False, random_key=0.25)
+        before = private.updated_at
+        self.client.post(reverse('notes:edit_note', args=[private.pk]), {
+            'username': 'Private', 'content': 'Now <b>public</b>.', 'is_public': True,
+            'modification_code': str(private.modification_code), 'version': 1,
+        })
+        private.refresh_from_db()
+        self.assertTrue(private.is_public)
+        self.assertEqual(private.content_html, 'Now &lt;b&gt;public&lt;/b&gt;.')
+        self.assertEqual(private.excerpt, 'Now &lt;b&gt;public&lt;/b&gt;.')
+        self.assertGreater(private.updated_at, before)
+        self.assertNotEqual(private.random_key, 0.25)
+
+    def test_import_hashes_plaintext_codes_from_old_exports(self):
+        """
+        Tests that an export from before the hashes still gives working codes on import.
+        """
+        code = str(uuid.uuid4())
+        row = {'id': str(uuid.uuid4()), 'username': 'Old', 'content': 'Old.', 'is_public': False,
+               'modification_code': code, 'random_key': 0.5,
+               'created_at': '2025-01-01T00:00:00+00:00', 'updated_at': '2025-01-01T00:00:00+00:00'}
+        path = os.path.join(tempfile.mkdtemp(), 'old.ndjson')
+        with open(path, 'w') as f:
+            f.write(json.dumps(row) + '\n')
+        call_command('import_notes', path, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertTrue(Note.objects.get(pk=row['id']).code_matches(code))
+
+
+# --- Tests for optimistic concurrency on edits and deletes ---
+class VersionedEditTests(TestCase):
+
+    def setUp(self):
+        note_cache().clear()
+        caches['ratelimit'].clear()
+        self.note = Note.objects.create(username="Versioned", content="Version one.", is_public=True)
+        self.code = str(self.note.modification_code)
+        self.edit_url = reverse('notes:edit_note', args=[self.note.pk])
+
+    def edit(self, content, version, **extra):
+        return self.client.post(self.edit_url, dict({
+            'username': 'Versioned', 'content': content, 'is_public': True,
+            'modification_code': self.code, 'version': version,
+        }, **extra))
+
+    def test_forms_carry_the_version(self):
+        """
+        Tests that the edit and delete forms post back the version they were rendered from.
+        """
+        response = self.client.get(reverse('notes:note_manage', args=[self.note.pk]))
+        self.assertContains(response, '<input type="hidden" name="version" value="1">', count=2)
+
+    def test_stale_cached_page_with_fresh_forms_gets_conflict(self):
+        """
+        Tests that an edit started from a cached, outdated detail page is refused even though
+        the lazily loaded forms are current: the page's script posts the version of the text it shows.
+        """
+        shell = self.client.get(reverse('notes:note_detail', args=[self.note.pk]))
+        self.assertContains(shell, 'data-version="1"')
+        self.assertContains(shell, "querySelector('input[name=\"version\"]').value = originalVersion")
+        self.assertEqual(self.edit("Someone else's edit.", 1).status_code, 302)
+
+        # The cached page is still showing version 1 when the forms are fetched
+        manage = self.client.get(reverse('notes:note_manage', args=[self.note.pk]))
+        self.assertContains(manage, '<input type="hidden" name="version" value="2">', count=2)
+        shown_version = re.search(r'data-version="(\d+)"', shell.content.decode()).group(1)
+        response = self.edit("Version one, tweaked.", shown_version)
+        self.assertEqual(response.status_code, 409)
+        self.note.refresh_from_db()
+        self.assertEqual((self.note.content, self.note.version), ("Someone else's edit.", 2))
+
+    def test_write_without_version_is_refused(self):
+        """
+        Tests that an edit or delete posting no usable version is refused with a 400 instead
+        of overwriting whatever version is current.
+        """
+        delete_url = reverse('notes:delete_note', args=[self.note.pk])
+        for version in (None, '', 'abc', '0'):
+            extra = {} if version is None else {'version': version}
+            response = self.client.post(self.edit_url, {
+                'username': 'Versioned', 'content': 'Blind overwrite.', 'is_public': True,
+                'modification_code': self.code, **extra,
+            })
+            self.assertContains(response, "This form is out of date", status_code=400)
+            response = self.client.post(delete_url, {'modification_code': self.code, **extra})
+            self.assertEqual(response.status_code, 400)
+        self.note.refresh_from_db()
+        self.assertEqual((self.note.content, self.note.version), ("Version one.", 1))
+
+    def test_stale_edit_gets_conflict(self):
+        """
+        Tests that an edit from an outdated form is refused with a 409 that keeps the user's text.
+        """
+        self.assertEqual(self.edit("Version two.", 1).status_code, 302)
+        response = self.edit("Lost update?", 1)
+        self.assertEqual(response.status_code, 409)
+        self.assertContains(response, "was changed after you opened it", status_code=409)
+        self.assertContains(response, "Lost update?", status_code=409)
+        self.assertContains(response, '<input type="hidden" name="version" value="2">', status_code=409)
+        self.note.refresh_from_db()
+        self.assertEqual((self.note.content, self.note.version), ("Version two.", 2))
+
+    def test_stale_delete_gets_conflict(self):
+        """
+        Tests that a delete confirmed on an outdated page doesn't remove the newer version.
+        """
+        self.edit("Version two.", 1)
+        response = self.client.post(reverse('notes:delete_note', args=[self.note.pk]),
+                                    {'modification_code': self.code, 'version': 1})
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(Note.objects.filter(pk=self.note.pk).exists())
+
+    def test_edit_writes_only_changed_columns(self):
+        """
+        Tests that the UPDATE sets just the changed fields (plus the derived ones).
+        """
+        self.client.get(reverse('notes:note_detail', args=[self.note.pk])) # Caches the note
+        with CaptureQueriesContext(connection) as ctx:
+            self.edit("Version one.", 1, is_public=False)
+        update, = [query['sql'] for query in ctx.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertIn('"is_public"', update)
+        self.assertNotIn('"content"', update)
+        self.assertNotIn('"username"', update)
+
+    def test_api_conflict_reports_current_version(self):
+        """
+        Tests that a stale API PATCH gets a 409 with the note's current version.
+        """
+        url = reverse('notes_api:note', args=[self.note.pk])
+        patch_body = {'content': 'From the API.', 'modification_code': self.code, 'version': 1}
+        response = self.client.patch(url, patch_body, content_type='application/json')
+        self.assertEqual(response.json()['version'], 2)
+        response = self.client.patch(url, patch_body, content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['version'], 2)
+
+
+class ConcurrentEditTests(TransactionTestCase):
+
+    EDITORS = 8
+
+    def setUp(self):
+        note_cache().clear()
+        caches['ratelimit'].clear()
+        self.note = Note.objects.create(username="Raced", content="Original.", is_public=False)
+        self.code = str(self.note.modification_code)
+
+    def test_parallel_edits_of_one_version_have_one_winner(self):
+        """
+        Tests that editors racing from the same version get one success and conflicts, never a lost update.
+        """
+        url = reverse('notes:edit_note', args=[self.note.pk])
+        Client().get(reverse('notes:note_detail', args=[self.note.pk])) # Caches the note
+        # Every editor checks its code and version against the cached note at
+        # the same time; then the conditional UPDATEs (and whatever the views
+        # do after them) run one by one. SQLite can't run them truly in
+        # parallel, so this is how every backend gets to the version check.
+        checked = threading.Barrier(self.EDITORS, timeout=10)
+        writing = threading.Lock()
+        statuses = {}
+
+        def serialized_notes_with_code(note_id, code, version=None):
+            checked.wait()
+            writing.acquire() # Released by edit() once the response is out
+            return notes_with_code(note_id, code, version)
+
+        def edit(editor):
+            try:
+                response = Client().post(url, {
+                    'username': 'Raced', 'content': f'Edit {editor}.',
+                    'modification_code': self.code, 'version': 1,
+                })
+                statuses[editor] = response.status_code
+            finally:
+                writing.release()
+                connection.close()
+
+        threads = [threading.Thread(target=edit, args=(editor,)) for editor in range(self.EDITORS)]
+        with patch('notes.views.notes_with_code', serialized_notes_with_code), \
+                patch('notes.async_views.notes_with_code', serialized_notes_with_code):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(sorted(statuses.values()), [302] + [409] * (self.EDITORS - 1), statuses)
+        winner = next(editor for editor, status in statuses.items() if status == 302)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.content, f'Edit {winner}.')
+        self.assertEqual(self.note.version, 2)
+
+
+# --- Tests for request instrumentation ---
+class PerfMiddlewareTests(TestCase):
+
+    def setUp(self):
+        note_cache().clear()
+        self.note = Note.objects.create(username="Timed", content="Timed content.", is_public=True)
+        # The edit forms: never stored by shared caches, so they get Server-Timing
+        self.url = reverse('notes:note_manage', args=[self.note.pk])
+
+    def test_sampled_request_gets_server_timing_and_log_line(self):
+        """
+        Tests that a timed request reports its view, queries, render time and cache lookups.
+        """
+        with self.settings(PERF_SAMPLE_RATE=1):
+            with self.assertLogs('notes.perf', 'INFO') as logs:
+                cold = self.client.get(self.url)
+                warm = self.client.get(self.url)
+        self.assertIn('db;dur=', cold['Server-Timing'])
+        self.assertIn('desc="1 queries"', cold['Server-Timing'])
+        self.assertIn('desc="0 hits, 1 misses"', cold['Server-Timing'])
+        self.assertIn('desc="0 queries"', warm['Server-Timing'])
+        self.assertIn('desc="1 hits, 0 misses"', warm['Server-Timing'])
+
+        cold_stats, warm_stats = [record.perf for record in logs.records]
+        self.assertEqual(cold_stats['view'], 'notes:note_manage')
+        self.assertEqual(cold_stats['status'], 200)
+        self.assertGreater(cold_stats['template_ms'], 0)
+        self.assertEqual(warm_stats['db_queries'], 0)
+        self.assertIn('view=notes:note_manage', logs.output[0])
+
+    def test_shared_cacheable_responses_get_no_server_timing(self):
+        """
+        Tests that publicly cacheable pages are timed and logged without a Server-Timing header,
+        so shared caches don't hand one request's timings to everyone.
+        """
+        with self.settings(PERF_SAMPLE_RATE=1):
+            with self.assertLogs('notes.perf', 'INFO'):
+                response = self.client.get(reverse('notes:note_detail', args=[self.note.pk]))
+        self.assertIn('public', response['Cache-Control'])
+        self.assertNotIn('Server-Timing', response)
+
+    def test_unsampled_requests_are_untouched(self):
+        """
+        Tests that with sampling off nothing is logged or added to the response.
+        """
+        with self.settings(PERF_SAMPLE_RATE=0):
+            with self.assertNoLogs('notes.perf', 'INFO'):
+                response = self.client.get(self.url)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_server_timing_header_can_be_turned_off(self):
+        """
+        Tests that PERF_SERVER_TIMING=False keeps the log line but drops the header.
+        """
+        with self.settings(PERF_SAMPLE_RATE=1, PERF_SERVER_TIMING=False):
+            with self.assertLogs('notes.perf', 'INFO'):
+                response = self.client.get(self.url)
+        self.assertNotIn('Server-Timing', response)
+
+    async def test_async_requests_are_timed(self):
+        """
+        Tests that requests through the ASGI handler are timed, including ORM calls made in threads.
+        """
+        with self.settings(PERF_SAMPLE_RATE=1):
+            with self.assertLogs('notes.perf', 'INFO') as logs:
+                response = await self.async_client.get(self.url)
+        self.assertIn('Server-Timing', response)
+        self.assertEqual(logs.records[0].perf['db_queries'], 1)
+
+    def test_log_lines_have_a_handler_outside_debug(self):
+        """
+        Tests that LOGGING sends the INFO timing lines somewhere with DEBUG off.
+        """
+        self.assertFalse(settings.DEBUG)
+        perf_logger = logging.getLogger('notes.perf')
+        self.assertTrue(perf_logger.isEnabledFor(logging.INFO))
+        self.assertTrue(perf_logger.handlers)
+
+
+# --- Tests for the metrics endpoint ---
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        # /metrics is off outside DEBUG unless METRICS_TOKEN is set
+        self.enterContext(self.settings(DEBUG=True))
+        # No background writes racing the files the tests look at
+        self.start_flusher = self.enterContext(patch.object(metrics_registry, 'start_flusher'))
+        note_cache().clear()
+        caches['ratelimit'].clear()
+        metrics_registry.reset()
+        self.note = Note.objects.create(username="Counted", content="Counted content.", is_public=True)
+
+    def scrape(self, **headers):
+        response = self.client.get(reverse('metrics'), headers=headers)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        return response.content.decode()
+
+    def test_operations_counted_by_outcome(self):
+        """
+        Tests that views are counted by operation and outcome, including wrong codes and 404s.
+        """
+        self.client.get(reverse('notes:note_detail', args=[self.note.pk]))
+        self.client.get(reverse('notes:note_detail', args=[uuid.uuid4()]))
+        self.client.post(reverse('notes:edit_note', args=[self.note.pk]), {
+            'username': 'Counted', 'content': 'Nope.', 'modification_code': str(uuid.uuid4()),
+        })
+        self.client.get(reverse('notes:random_note'))
+        text = self.scrape()
+        self.assertIn('ghostnote_note_operations_total{operation="detail",outcome="ok"} 1', text)
+        self.assertIn('ghostnote_note_operations_total{operation="detail",outcome="not_found"} 1', text)
+        self.assertIn('ghostnote_note_operations_total{operation="edit",outcome="bad_code"} 1', text)
+        self.assertIn('ghostnote_note_operations_total{operation="random",outcome="ok"} 1', text)
+        self.assertIn('# TYPE ghostnote_note_operation_duration_seconds histogram', text)
+        self.assertIn('ghostnote_note_operation_duration_seconds_bucket{operation="detail",le="+Inf"} 2', text)
+        self.assertIn('ghostnote_note_operation_duration_seconds_count{operation="detail"} 2', text)
+
+    def test_multiprocess_mode_adds_up_workers(self):
+        """
+        Tests that with METRICS_MULTIPROC_DIR a scrape sums the values every process wrote.
+        """
+        directory = tempfile.mkdtemp()
+        url = reverse('notes:note_detail', args=[self.note.pk])
+        with self.settings(METRICS_MULTIPROC_DIR=directory), patch('notes.metrics.process_alive', return_value=True):
+            # Another worker: its requests only reach us through its file
+            with patch('notes.metrics.os.getpid', return_value=999999):
+                self.client.get(url)
+                self.client.get(url)
+                metrics_registry.flush()
+            metrics_registry.reset()
+            self.client.get(url)
+            text = self.scrape()
+        self.assertEqual(
+            sorted(name.split('-')[1] for name in os.listdir(directory) if name.endswith('.json')),
+            sorted(['999999', str(os.getpid())]),
+        )
+        self.assertIn('ghostnote_note_operations_total{operation="detail",outcome="ok"} 3', text)
+
+    def test_requests_do_not_write_files(self):
+        """
+        Tests that observed requests leave writing the process file to the flusher thread.
+        """
+        directory = tempfile.mkdtemp()
+        with self.settings(METRICS_MULTIPROC_DIR=directory):
+            self.client.get(reverse('notes:note_detail', args=[self.note.pk]))
+        self.assertEqual(os.listdir(directory), [])
+        self.start_flusher.assert_called()
+
+    def test_files_of_exited_processes_are_folded_in(self):
+        """
+        Tests that files of exited processes, or of an earlier process with a reused PID, are folded
+        into one retired file without losing counts.
+        """
+        directory = tempfile.mkdtemp()
+        url = reverse('notes:note_detail', args=[self.note.pk])
+        with self.settings(METRICS_MULTIPROC_DIR=directory):
+            # Two processes that got PID 999999 one after the other, then one that is gone
+            for pid in (999999, 999999, 999998):
+                with patch('notes.metrics.os.getpid', return_value=pid):
+                    metrics_registry.pid = None # A new process
+                    self.client.get(url)
+                    metrics_registry.flush()
+                metrics_registry.reset()
+            metrics_registry.pid = None
+            self.client.get(url)
+            with patch('notes.metrics.process_alive', side_effect=lambda pid: pid != 999998):
+                text = self.scrape()
+            names = sorted(os.listdir(directory))
+            self.assertIn('ghostnote-retired.json', names)
+            self.assertEqual(
+                sorted(name.split('-')[1] for name in names if PROCESS_FILE.match(name)),
+                sorted(['999999', str(os.getpid())]),
+            )
+            self.assertIn('ghostnote_note_operations_total{operation="detail",outcome="ok"} 4', text)
+            # Folded files are counted once, scrape after scrape
+            with patch('notes.metrics.process_alive', return_value=False):
+                self.assertIn('ghostnote_note_operations_total{operation="detail",outcome="ok"} 4', self.scrape())
+
+    def test_off_without_token_outside_debug(self):
+        """
+        Tests that without METRICS_TOKEN /metrics answers only in DEBUG.
+        """
+        with self.settings(DEBUG=False, METRICS_TOKEN=None):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        with self.settings(DEBUG=True, METRICS_TOKEN=None):
+            self.assertIn('# TYPE', self.scrape())
+
+    def test_token_required_when_configured(self):
+        """
+        Tests that METRICS_TOKEN turns on bearer authentication for scrapes.
+        """
+        with self.settings(METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+            self.assertEqual(self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer s3cre'}).status_code, 401)
+            with patch('notes.metrics.constant_time_compare', wraps=constant_time_compare) as compare:
+                self.assertIn('# TYPE', self.scrape(Authorization='Bearer s3cret'))
+            compare.assert_called_once_with('Bearer s3cret', 'Bearer s3cret')
+
+    def test_importable_without_fcntl(self):
+        """
+        Tests that the module (imported by the URLconf) doesn't need the POSIX-only fcntl.
+        """
+        with open(sys.modules['notes.metrics'].__file__, encoding='utf-8') as f:
+            self.assertNotRegex(f.read(), r'(?m)^import fcntl')
+        with patch.dict(sys.modules, {'fcntl': None}):
+            directory = tempfile.mkdtemp()
+            with self.settings(METRICS_MULTIPROC_DIR=directory), patch('notes.metrics.process_alive', return_value=False):
+                with patch('notes.metrics.os.getpid', return_value=999999):
+                    self.client.get(reverse('notes:note_detail', args=[self.note.pk]))
+                    metrics_registry.flush()
+                metrics_registry.reset()
+                metrics_registry.pid = None
+                # The other process's file was folded in without a lock
+                self.assertIn('outcome="ok"} 1', self.scrape())
+                self.assertIn('ghostnote-retired.json', os.listdir(directory))
+
+
+class EndpointBenchmarkTests(TestCase):
+    def result(self, **changes):
+        row = {'rps': 100.0, 'p50_ms': 5.0, 'p95_ms': 10.0, 'p99_ms': 12.0, 'queries': 2.0, 'errors': 0}
+        row.update(changes)
+        return {'sizes': {'10000': {'note_detail': row}}}
+
+    def test_within_threshold_passes(self):
+        """
+        Tests that noise under the threshold, or under min_delta_ms, isn't reported.
+        """
+        baseline = self.result()
+        self.assertEqual(find_regressions(baseline, self.result(p95_ms=12.0, rps=85.0), 0.25, 0.5), [])
+        self.assertEqual(find_regressions(self.result(p95_ms=0.2), self.result(p95_ms=0.6), 0.25, 0.5), [])
+        # Endpoints or sizes missing from the baseline are new, not regressions
+        self.assertEqual(find_regressions({'sizes': {}}, self.result(), 0.25, 0.5), [])
+
+    def test_regressions_reported(self):
+        """
+        Tests that slower p95, lower throughput, extra queries and new errors are each reported.
+        """
+        problems = find_regressions(self.result(), self.result(p95_ms=20.0, rps=50.0, queries=3.0, errors=1), 0.25, 0.5)
+        self.assertEqual(len(problems), 4)
+        self.assertTrue(all(problem.startswith('note_detail @ 10000 notes: ') for problem in problems))
+
+
+# --- Query budgets for the note views ---
+class QueryBudgetTests(TestCase):
+    """
+    Pins how many SQL queries each view may issue, middleware included: the
+    client carries a real session (unless DJANGO_SLIM drops sessions) and
+    flash messages use their cookie. A
+    failure lists the SQL that was run. Lower a budget when a view gets
+    cheaper; raising one needs a reason.
+    """
+
+    def setUp(self):
+        note_cache().clear()
+        for i in range(25):
+            Note.objects.create(username=f"User{i}", content=f"Note {i}", is_public=True)
+        self.note = Note.objects.create(username="Owner", content="Budgeted.", is_public=True)
+        self.code = str(self.note.modification_code)
+        self.detail_url = reverse('notes:note_detail', args=[self.note.pk])
+        if 'django.contrib.sessions' in settings.INSTALLED_APPS:
+            # A session row that the middleware could look up (it shouldn't);
+            # DJANGO_SLIM drops sessions, and the budgets hold without them
+            session = self.client.session
+            session['visited'] = True
+            session.save()
+
+    def assertQueries(self, budget, method, url, data=None, status=200):
+        with self.assertNumQueries(budget):
+            response = getattr(self.client, method)(url, data)
+        self.assertEqual(response.status_code, status)
+        return response
+
+    def warm(self):
+        """Puts the note in the note cache, as a visit to its page would."""
+        self.client.get(self.detail_url)
+
+    def test_detail(self):
+        """
+        Tests that the detail page reads the note once, then serves it from the cache.
+        """
+        self.assertQueries(1, 'get', self.detail_url)
+        self.assertQueries(0, 'get', self.detail_url)
+
+    def test_list_pages(self):
+        """
+        Tests the query budget of the first and the last page of the public list.
+        """
+        url = reverse('notes:notes_list')
+        # One query per page, whichever shuffle segments it spans; the public
+        # note count behind "Page N of ~M" is counted once, then cached
+        self.assertQueries(2, 'get', url, {'seed': '00000000'})
+        first = self.assertQueries(1, 'get', url, {'seed': '80000000'})
+        notes_page = first.context['notes_page']
+        middle = self.client.get(url, {'seed': '80000000', 'cursor': notes_page.next_cursor, 'page': 2})
+        notes_page = middle.context['notes_page']
+        self.assertQueries(1, 'get', url, {'seed': '80000000', 'cursor': notes_page.next_cursor, 'page': 3})
+
+    def test_random(self):
+        """
+        Tests that picking a random note is one query, two when the pivot wraps around.
+        """
+        with patch('notes.sampling.random.random', return_value=0.0):
+            self.assertQueries(1, 'get', reverse('notes:random_note'), status=302)
+        with patch('notes.sampling.random.random', return_value=0.999999):
+            Note.objects.filter(random_key__gte=0.999999).update(random_key=0.5)
+            self.assertQueries(2, 'get', reverse('notes:random_note'), status=302)
+
+    def test_create(self):
+        """
+        Tests that creating a note is one INSERT and a rejected form runs no query.
+        """
+        url = reverse('notes:create_note')
+        self.assertQueries(1, 'post', url, {'username': 'New', 'content': 'Fresh.'}, status=302)
+        self.assertQueries(0, 'post', url, {'username': 'New', 'content': ''})
+
+    def test_edit(self):
+        """
+        Tests the edit budget: one UPDATE on success, none for a wrong code or
+        an invalid form, and the UPDATE plus a re-read on a version conflict.
+        """
+        url = reverse('notes:edit_note', args=[self.note.pk])
+        data = {'username': 'Owner', 'content': 'Edited.', 'is_public': True, 'modification_code': self.code, 'version': 1}
+        self.warm()
+        self.assertQueries(0, 'post', url, {**data, 'modification_code': str(uuid.uuid4())})
+        self.assertQueries(0, 'post', url, {**data, 'content': ''})
+        self.assertQueries(1, 'post', url, {**data, 'version': 1}, status=302)
+        self.warm()
+        self.assertQueries(2, 'post', url, {**data, 'content': 'Stale.', 'version': 1}, status=409)
+
+    def test_delete(self):
+        """
+        Tests the delete budget: one DELETE on success, none for a wrong code,
+        and the DELETE plus a re-read on a version conflict.
+        """
+        url = reverse('notes:delete_note', args=[self.note.pk])
+        self.warm()
+        self.assertQueries(0, 'post', url, {'modification_code': str(uuid.uuid4())})
+        self.assertQueries(2, 'post', url, {'modification_code': self.code, 'version': 99}, status=409)
+        self.warm()
+        self.assertQueries(1, 'post', url, {'modification_code': self.code, 'version': 1}, status=302)
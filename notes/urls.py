@@ -1,6 +1,11 @@
+from django.conf import settings
 from django.urls import path
 from . import views # Import views from the current directory (notes app)
 
+# Same view names and behaviour; async_views awaits the ORM and cache directly
+if settings.NOTES_ASYNC_VIEWS:
+    from . import async_views as views
+
 # Define a namespace for the app's URLs (optional but good practice)
 app_name = 'notes'
 
@@ -13,12 +18,26 @@ urlpatterns = [
     # The name 'create_note' is used in templates {% url 'notes:create_note' %}
     path('create/', views.create_note_view, name='create_note'),
 
+    # Newest public notes first, paged with cursors
+    path('recent/', views.recent_notes_view, name='recent_notes'),
+
+    # RSS and Atom feeds of the latest public notes
+    path('feed/rss/', views.feed_view, {'kind': 'rss'}, name='feed_rss'),
+    path('feed/atom/', views.feed_view, {'kind': 'atom'}, name='feed_atom'),
+
+    # Full-text search over public notes (?q=...)
+    path('search/', views.search_notes_view, name='search_notes'),
+
     # URL pattern for viewing a specific note
     # Maps URLs like '1/', '23/', etc. to the note_detail_view function
     # <uuid:note_id> captures the UUID from the URL and passes it as 'note_id' argument to the view
     # The name 'note_detail' is used in templates {% url 'notes:note_detail' note.id %}
     path('<uuid:note_id>/', views.note_detail_view, name='note_detail'),
 
+    # Edit/delete forms for a note, fetched by the detail page on demand
+    # so the detail page itself can be served without cookies
+    path('<uuid:note_id>/manage/', views.note_manage_view, name='note_manage'),
+
     # URL pattern for editing a specific note
     # Maps URLs like '1/edit/', '23/edit/', etc. to the edit_note_view function
     # The name 'edit_note' will be used in the form action on the detail page
@@ -1,57 +1,346 @@
-from django.shortcuts import render, redirect, get_object_or_404 # Ensure redirect is imported
+from django.shortcuts import render, redirect # Ensure redirect is imported
 from django.urls import reverse, reverse_lazy
-from django.http import HttpResponseNotAllowed, Http404
-from .models import Note
+from django.http import HttpResponse, HttpResponseNotAllowed, Http404
+from .models import edit_values, notes_with_code
 from .forms import NoteForm # Assuming EditNoteForm might be needed elsewhere, keep it if so
+from .cache import (
+    adjust_public_note_count, bump_public_notes_version, forget_public_note_count, get_cached_note, invalidate_note,
+    note_cache, public_note_count, public_notes_version,
+)
+from .http import (
+    has_pending_messages, make_etag, never_store, not_modified, note_validators,
+    private_revalidate, public_cacheable, public_revalidate, set_validators,
+)
+from .pagination import keyset_page
+from .search import normalize_query, search_page
+from .feeds import feed_cache_key, render_feed
+from .metrics import observe, set_outcome
+from .perf import count_cache
+from .ratelimit import ratelimit
+from .sampling import (
+    SHUFFLE_ORDERING, new_shuffle_seed, public_note_cards, random_public_note_id,
+    shuffle_pivot, shuffle_segments,
+)
 import logging
+import math
 import uuid
-import random
+from django.conf import settings
 from django.contrib import messages # Import messages
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.utils.html import format_html # Import format_html for safe HTML construction
 
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
 
+# Number of notes per page on the public list
+PUBLIC_NOTES_PER_PAGE = 10
+# Number of results per page of search
+SEARCH_RESULTS_PER_PAGE = 10
+# Newest first; served by the partial (created_at, id) index of public notes
+RECENT_ORDERING = ('-created_at', '-id')
+
+# --- Shared response builders ---
+# These do no database or cache I/O, so the async views in async_views.py
+# reuse them as-is.
+
+def note_created_redirect(request, new_note):
+    """Flashes the new modification code and redirects to the note (PRG)."""
+    logger.info(f"Note created with ID: {new_note.id}, Public: {new_note.is_public}")
+
+    # Prepare the message content with HTML and a copy button
+    mod_code = new_note.modification_code
+    message_html = format_html(
+        "Note created! Keep this modification code safe: <code>{}</code> "
+        "<button class='button button-small button-secondary copy-mod-code-btn' data-code='{}'>Copy Code</button>",
+        mod_code,
+        mod_code # Pass the code again for the data-code attribute
+    )
+
+    # Add success message, marked as safe
+    messages.success(
+        request,
+        message_html,
+        extra_tags='safe' # Mark the message as safe to render HTML
+    )
+
+    # Redirect to the new note's detail page (PRG)
+    return redirect('notes:note_detail', note_id=new_note.pk)
+
+
+def list_params(request):
+    """Reads (seed, pivot, seeded, page_number, cursor) for the public list."""
+    # The seed picks one stable shuffle; it travels in the page links so that
+    # every page of a visit comes from the same ordering (no repeats, no gaps).
+    seed = request.GET.get('seed')
+    pivot = shuffle_pivot(seed)
+    seeded = pivot is not None
+    if not seeded:
+        seed = new_shuffle_seed()
+        pivot = shuffle_pivot(seed)
+
+    return seed, pivot, seeded, page_number_param(request), request.GET.get('cursor')
+
+
+def page_number_param(request):
+    """The ?page= shown in "Page N" (display only; the cursor decides the rows)."""
+    try:
+        return max(1, int(request.GET.get('page', 1)))
+    except (TypeError, ValueError):
+        return 1
+
+
+def list_response(request, notes_page, seed, public_count, one_off, etag=None, version=None):
+    """Renders a public list page with the cache policy that fits it."""
+    # A page with notes on it proves there are some; the (cached) count covers
+    # an empty page, so no separate exists() query is needed
+    if not notes_page.object_list and not public_count:
+         messages.info(request, "No public GhostNotes found to display.") # Updated message
+         one_off = True
+
+    # "Page N of ~M": the count is approximate, and the page we're on is real
+    page_count = max(notes_page.number, math.ceil(public_count / PUBLIC_NOTES_PER_PAGE))
+    response = render(request, 'notes/random_notes_list.html', {
+        'notes_page': notes_page, 'seed': seed, 'page_count': page_count,
+    })
+    if one_off:
+        return never_store(response)
+    if etag is None:
+        # A fresh shuffle every time: nothing to revalidate against
+        return private_revalidate(response)
+    set_validators(response, etag, int(version))
+    return public_cacheable(response, settings.NOTE_LIST_MAX_AGE)
+
+
+def recent_etag(cursor, page_number, version):
+    return make_etag('recent', cursor, page_number, version)
+
+
+def recent_response(request, notes_page, one_off, etag, version):
+    """Renders a page of the recent feed; cached like a seeded list page."""
+    response = render(request, 'notes/recent_notes_list.html', {'notes_page': notes_page})
+    if one_off:
+        return never_store(response)
+    set_validators(response, etag, int(version))
+    return public_cacheable(response, settings.NOTE_LIST_MAX_AGE)
+
+
+def feed_etag(request, kind, version):
+    # Feeds carry absolute links, so the host is part of what was rendered
+    return make_etag('feed', kind, request.scheme, request.get_host(), version)
+
+
+def feed_response(document, etag, version):
+    content, content_type = document
+    response = HttpResponse(content, content_type=content_type)
+    set_validators(response, etag, int(version))
+    return public_cacheable(response, settings.FEED_MAX_AGE)
+
+
+def search_etag(query, cursor, page_number, version):
+    # Results only change when the set of public notes does
+    return make_etag('search', query, cursor, page_number, version)
+
+
+def search_response(request, query, results, one_off, etag, version):
+    """Renders a page of search results; shared caches may keep it like a seeded list page."""
+    response = render(request, 'notes/search_results.html', {'query': query, 'results': results})
+    if one_off:
+        return never_store(response)
+    set_validators(response, etag, int(version))
+    return public_cacheable(response, settings.NOTE_LIST_MAX_AGE)
+
+
+def note_detail_response(request, note, note_body):
+    """
+    Shows a note. Normally this is a read-only shell without CSRF token or
+    cookies, so browsers and CDNs can share it; the edit/delete forms are
+    fetched from note_manage_view when someone clicks Edit or Delete. Pages
+    that carry flash messages (like the new modification code) are rendered
+    per-user with the forms inline.
+    """
+    one_off = has_pending_messages(request)
+    lazy_manage = settings.NOTE_DETAIL_LAZY_FORMS and not one_off
+
+    def cache_policy(response):
+        if lazy_manage:
+            return public_cacheable(response, settings.NOTE_DETAIL_MAX_AGE)
+        # The inline forms embed a CSRF token, so only the viewer's own browser may keep it
+        return private_revalidate(response)
+
+    # Answer revalidations with a 304 before building the form or rendering
+    etag, last_modified = note_validators(note, 'shell' if lazy_manage else 'full')
+    if not one_off:
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return cache_policy(response)
+
+    context = {'note': note, 'note_body': note_body, 'lazy_manage': lazy_manage}
+    if not lazy_manage:
+        # Pass the correct form instance for editing (needed for JS)
+        context['edit_form'] = NoteForm(instance=note)
+    response = render(request, 'notes/note_detail.html', context)
+    if one_off:
+        return never_store(response)
+    set_validators(response, etag, last_modified)
+    return cache_policy(response)
+
+
+def note_manage_response(request, note):
+    """Renders the edit/delete forms (with CSRF token and messages) for the detail page."""
+    response = render(request, 'notes/note_manage.html', {
+        'note': note,
+        'edit_form': NoteForm(instance=note),
+        'show_messages': True,
+    })
+    return never_store(response)
+
+
+def edited_note_redirect(note_id, version):
+    """
+    Redirects to the note after an edit. The detail page may sit in a shared
+    cache for NOTE_DETAIL_MAX_AGE seconds, so the URL names the new version:
+    the editor gets the edited note (and the success message), never a copy
+    cached before the edit.
+    """
+    return redirect(f"{reverse('notes:note_detail', args=[note_id])}?v={version}")
+
+
+def detail_page(request, note, edit_form=None):
+    """Re-renders the full detail page (forms inline) after a failed edit or delete."""
+    return render(request, 'notes/note_detail.html', {
+        'note': note, 'edit_form': edit_form or NoteForm(instance=note)
+    })
+
+
+def submitted_modification_code(request, note_id, missing_message, attempt=''):
+    """
+    Returns the posted modification code as a UUID, or None after flashing why
+    it can't be used (``attempt`` names the action in the log). Whether it
+    matches the note is left to the write itself (see notes_with_code()).
+    """
+    submitted_code_str = request.POST.get('modification_code')
+    if not submitted_code_str:
+        set_outcome(request, 'bad_code')
+        messages.error(request, missing_message)
+        return None
+    try:
+        return uuid.UUID(submitted_code_str)
+    except ValueError:
+        logger.warning(f"Invalid UUID format submitted for {attempt}Note ID {note_id}.")
+        set_outcome(request, 'bad_code')
+        messages.error(request, "Invalid modification code format.")
+        return None
+
+
+def wrong_code_page(request, note, attempt=''):
+    """Re-renders the detail page after a write was refused for a wrong modification code."""
+    logger.warning(f"Invalid modification code attempt for {attempt}Note ID {note.id}.")
+    set_outcome(request, 'bad_code')
+    messages.error(request, "Invalid modification code.")
+    return detail_page(request, note)
+
+
+def submitted_version(request):
+    """The note version the edit/delete form was loaded with, or None if missing or malformed."""
+    try:
+        version = int(request.POST['version'])
+    except (KeyError, ValueError):
+        return None
+    return version if version > 0 else None
+
+
+def bad_version_page(request, note):
+    """
+    Re-renders the detail page with a 400 when the form doesn't say which
+    version it was loaded from. Such a write can't be checked for conflicts,
+    and letting it overwrite whatever is there would lose other edits.
+    """
+    logger.warning(f"Missing or malformed version submitted for Note ID {note.id}.")
+    set_outcome(request, 'invalid')
+    messages.error(request, "This form is out of date. Reload the note and try again.")
+    response = detail_page(request, note)
+    response.status_code = 400
+    return response
+
+
+def edit_changes(edit_form, note, version):
+    """
+    The fields an edit writes. When the form was loaded from the same version
+    as the (cached, pre-edit) ``note``, only the fields that differ from it;
+    otherwise all of them, as the cached copy can't be trusted to diff against.
+    """
+    fields = edit_form.changed_data if version == note.version else NoteForm.Meta.fields
+    return {field: edit_form.cleaned_data[field] for field in fields}
+
+
+def public_count_change(note, version, was_public, is_public):
+    """
+    How a successful edit or delete changed the number of public notes, or
+    None when the cached ``note`` isn't the version that was written.
+    """
+    if version != note.version:
+        return None
+    return int(is_public) - int(was_public)
+
+
+def conflict_page(request, note, message, edit_form=None):
+    """
+    Re-renders the detail page with the current ``note`` and a 409 when the
+    note changed after the form was loaded. The forms then carry the new
+    version, so submitting again is a deliberate overwrite.
+    """
+    logger.info(f"Stale version submitted for Note ID {note.id} (now version {note.version}).")
+    messages.error(request, message)
+    response = detail_page(request, note, edit_form)
+    response.status_code = 409
+    return response
+
+
+EDIT_CONFLICT_MESSAGE = (
+    "This note was changed after you opened it, so your edit was not saved. "
+    "Review the current version and submit again."
+)
+DELETE_CONFLICT_MESSAGE = (
+    "This note was changed after you opened it, so it was not deleted. "
+    "Review the current version and confirm again."
+)
+
+
 # --- Landing Page View ---
 def landing_page_view(request):
     """Renders the site's landing/home page."""
-    return render(request, 'landing_page.html')
+    # Static apart from flash messages, so it is shared and answered with a
+    # 304 per release. Never served from a cache without asking, though: it
+    # is where a delete redirects, and the "deleted" message must get through
+    if has_pending_messages(request):
+        return never_store(render(request, 'landing_page.html'))
+    etag = make_etag('landing')
+    response = not_modified(request, etag)
+    if response is None:
+        response = set_validators(render(request, 'landing_page.html'), etag)
+    return public_revalidate(response)
 
 # --- create_note_view (Updated with PRG) ---
+@observe({'POST': 'create'})
+@ratelimit('create')
 def create_note_view(request):
     if request.method == 'POST':
         form = NoteForm(request.POST)
         if form.is_valid():
             try:
                 new_note = form.save()
-                logger.info(f"Note created with ID: {new_note.id}, Mod Code: {new_note.modification_code}, Public: {new_note.is_public}")
-
-                # Prepare the message content with HTML and a copy button
-                mod_code = new_note.modification_code
-                message_html = format_html(
-                    "Note created! Keep this modification code safe: <code>{}</code> "
-                    "<button class='button button-small button-secondary copy-mod-code-btn' data-code='{}'>Copy Code</button>",
-                    mod_code,
-                    mod_code # Pass the code again for the data-code attribute
-                )
-
-                # Add success message, marked as safe
-                messages.success(
-                    request,
-                    message_html,
-                    extra_tags='safe' # Mark the message as safe to render HTML
-                )
-
-                # Redirect to the new note's detail page (PRG)
-                return redirect('notes:note_detail', note_id=new_note.pk)
+                if new_note.is_public:
+                    bump_public_notes_version()
+                    adjust_public_note_count(1)
+                return note_created_redirect(request, new_note)
 
             except Exception as e:
                 logger.error(f"Error saving note after validation: {e}")
+                set_outcome(request, 'error')
                 messages.error(request, 'Could not save note due to a server error.')
                 # Fall through to render form with error if save fails after validation
         else:
              # Form is invalid, fall through to render form with errors
+             set_outcome(request, 'invalid')
              messages.error(request, 'Please correct the errors below.')
     else: # GET request
         form = NoteForm()
@@ -60,130 +349,207 @@ def create_note_view(request):
     return render(request, 'notes/create_note_form.html', {'form': form}) # Changed template name if needed
 
 # --- Random Notes List View ---
+@observe('list')
 def random_notes_list_view(request):
     """Displays a paginated, randomly ordered list of PUBLIC notes."""
-    # Fetch ONLY public notes in a random order.
-    note_list = Note.objects.filter(is_public=True).order_by('?') # Filter added
-    paginator = Paginator(note_list, 10) # Show 10 notes per page
+    seed, pivot, seeded, page_number, cursor = list_params(request)
 
-    page_number = request.GET.get('page')
-    try:
-        notes_page = paginator.page(page_number)
-    except PageNotAnInteger:
-        notes_page = paginator.page(1)
-    except EmptyPage:
-        notes_page = paginator.page(paginator.num_pages)
+    # A seeded page only changes when the set of public notes does, so it can be
+    # revalidated against the public listing version without touching the DB.
+    one_off = has_pending_messages(request)
+    etag = version = None
+    if seeded:
+        version = public_notes_version()
+        etag = make_etag('list', seed, cursor, page_number, version)
+        if not one_off:
+            response = not_modified(request, etag, int(version))
+            if response is not None:
+                return public_cacheable(response, settings.NOTE_LIST_MAX_AGE)
+
+    # Keyset pagination on random_key: no COUNT(*), no OFFSET
+    notes_page = keyset_page(
+        shuffle_segments(pivot), SHUFFLE_ORDERING, cursor,
+        PUBLIC_NOTES_PER_PAGE, number=page_number,
+    )
+    return list_response(request, notes_page, seed, public_note_count(), one_off, etag, version)
+
+
+# --- recent_notes_view ---
+@observe('recent')
+def recent_notes_view(request):
+    """Public notes, newest first, paged by keyset cursors (no COUNT, no OFFSET)."""
+    cursor, page_number = request.GET.get('cursor'), page_number_param(request)
+
+    one_off = has_pending_messages(request)
+    version = public_notes_version()
+    etag = recent_etag(cursor, page_number, version)
+    if not one_off:
+        response = not_modified(request, etag, int(version))
+        if response is not None:
+            return public_cacheable(response, settings.NOTE_LIST_MAX_AGE)
+
+    notes_page = keyset_page([public_note_cards()], RECENT_ORDERING, cursor, PUBLIC_NOTES_PER_PAGE, number=page_number)
+    return recent_response(request, notes_page, one_off, etag, version)
 
-    if not note_list.exists():
-         messages.info(request, "No public GhostNotes found to display.") # Updated message
 
-    return render(request, 'notes/random_notes_list.html', {'notes_page': notes_page})
+# --- feed_view ---
+def feed_view(request, kind):
+    """RSS or Atom feed of the latest public notes, pre-rendered in the note cache."""
+    version = public_notes_version()
+    etag = feed_etag(request, kind, version)
+    response = not_modified(request, etag, int(version))
+    if response is not None:
+        return public_cacheable(response, settings.FEED_MAX_AGE)
 
+    key = feed_cache_key(etag)
+    document = note_cache().get(key)
+    count_cache(hits=document is not None, misses=document is None)
+    if document is None:
+        # First poll since the public notes last changed
+        document = render_feed(kind, request)
+        note_cache().set(key, document)
+    return feed_response(document, etag, version)
 
-# --- note_detail_view (Ensure it handles GET and passes edit_form) ---
+
+# --- search_notes_view ---
+@observe('search')
+def search_notes_view(request):
+    """Full-text search over public notes, best matches first (see notes/search.py)."""
+    query = normalize_query(request.GET.get('q'))
+    cursor, page_number = request.GET.get('cursor'), page_number_param(request)
+
+    one_off = has_pending_messages(request)
+    version = public_notes_version()
+    etag = search_etag(query, cursor, page_number, version)
+    if not one_off:
+        response = not_modified(request, etag, int(version))
+        if response is not None:
+            return public_cacheable(response, settings.NOTE_LIST_MAX_AGE)
+
+    results = search_page(query, cursor, SEARCH_RESULTS_PER_PAGE, page_number) if query else None
+    return search_response(request, query, results, one_off, etag, version)
+
+
+# --- note_detail_view ---
+@observe('detail')
 def note_detail_view(request, note_id):
-    note = get_object_or_404(Note, pk=note_id)
-    # Pass the correct form instance for editing (needed for JS)
-    # Use NoteForm here if it handles both creation and editing fields
-    edit_form = NoteForm(instance=note)
-    return render(request, 'notes/note_detail.html', {
-        'note': note,
-        'edit_form': edit_form, # Pass edit_form for the inline editing JS
-    })
+    """Shows a note; see note_detail_response() for how the page is cached."""
+    # Note row and rendered body come from the note cache (404 if missing)
+    note, note_body = get_cached_note(note_id)
+    return note_detail_response(request, note, note_body)
+
+
+# --- note_manage_view ---
+def note_manage_view(request, note_id):
+    """Returns the edit/delete forms (with CSRF token and messages) for the detail page."""
+    note, _ = get_cached_note(note_id)
+    return note_manage_response(request, note)
+
 
 # --- edit_note_view ---
+@observe({'POST': 'edit'})
+@ratelimit('edit')
 def edit_note_view(request, note_id):
     if request.method != 'POST':
         return redirect(reverse('notes:note_detail', args=[note_id]))
 
-    note = get_object_or_404(Note, pk=note_id) # Get note instance early
+    # The cached note (no query on a hit) is enough to check the code, report
+    # form errors and diff the edit; the UPDATE re-checks code and version
+    note, _ = get_cached_note(note_id) # 404 if the note doesn't exist
 
     # --- Modification code check ---
-    submitted_code_str = request.POST.get('modification_code')
-    if not submitted_code_str:
-        messages.error(request, "Modification code is required.")
-        return render(request, 'notes/note_detail.html', {
-            'note': note, 'edit_form': NoteForm(instance=note)
-        })
-    try:
-        submitted_code_uuid = uuid.UUID(submitted_code_str)
-        if submitted_code_uuid != note.modification_code:
-            logger.warning(f"Invalid modification code attempt for Note ID {note.id}.")
-            messages.error(request, "Invalid modification code.")
-            return render(request, 'notes/note_detail.html', {
-                'note': note, 'edit_form': NoteForm(instance=note)
-            })
-    except ValueError:
-        logger.warning(f"Invalid UUID format submitted for Note ID {note.id}.")
-        messages.error(request, "Invalid modification code format.")
-        return render(request, 'notes/note_detail.html', {
-            'note': note, 'edit_form': NoteForm(instance=note)
-        })
+    code = submitted_modification_code(request, note_id, "Modification code is required.")
+    if code is None:
+        return detail_page(request, note)
+    if not note.code_matches(code):
+        return wrong_code_page(request, note)
     # --- End modification code check ---
 
-    # If mod code valid, process form
+    version = submitted_version(request)
+    if version is None:
+        return bad_version_page(request, note)
+    was_public = note.is_public # Binding the form below updates the instance
     edit_form = NoteForm(request.POST, instance=note) # Form includes is_public
-    if edit_form.is_valid():
+    if not edit_form.is_valid():
+        logger.warning(f"Note ID {note.id} update failed validation: {edit_form.errors.as_json()}")
+        set_outcome(request, 'invalid')
+        messages.error(request, 'Please correct the errors below.')
+        # Re-render the detail page with the bound form containing errors
+        return detail_page(request, note, edit_form)
+
+    changes = edit_changes(edit_form, note, version)
+    if changes:
         try:
-            updated_note = edit_form.save() # Save includes is_public changes
-            logger.info(f"Note ID {updated_note.id} updated successfully. Public: {updated_note.is_public}") # Log public status
-            messages.success(request, 'Note updated successfully!')
-            return redirect(reverse('notes:note_detail', args=[updated_note.id]))
+            # One UPDATE of just the changed columns, applied only if the code
+            # and version still match; the row is never read
+            updated = notes_with_code(note_id, code, version).update(**edit_values(changes))
         except Exception as e:
-            logger.error(f"Error saving updated note {note.id} after validation: {e}")
+            logger.error(f"Error saving updated note {note_id} after validation: {e}")
+            set_outcome(request, 'error')
             messages.error(request, 'Could not save changes due to a server error.')
-    else: # Form invalid
-        logger.warning(f"Note ID {note.id} update failed validation: {edit_form.errors.as_json()}")
-        messages.error(request, 'Please correct the errors below.')
+            return detail_page(request, note, edit_form)
+        invalidate_note(note_id)
+        if not updated:
+            # The code matched, so the note was edited (or deleted) meanwhile
+            current, _ = get_cached_note(note_id)
+            return conflict_page(request, current, EDIT_CONFLICT_MESSAGE, edit_form)
+        # was_public is only known for sure when the form's version was the cached one
+        if was_public or edit_form.cleaned_data['is_public'] or version != note.version:
+            bump_public_notes_version()
+            change = public_count_change(note, version, was_public, edit_form.cleaned_data['is_public'])
+            if change is None:
+                forget_public_note_count()
+            else:
+                adjust_public_note_count(change)
 
-    # Re-render the detail page with the bound form containing errors
-    return render(request, 'notes/note_detail.html', {
-        'note': note,
-        'edit_form': edit_form,
-    })
+    logger.info(f"Note ID {note_id} updated successfully. Public: {edit_form.cleaned_data['is_public']}") # Log public status
+    messages.success(request, 'Note updated successfully!')
+    return edited_note_redirect(note_id, version + 1 if changes else version)
 
 
 # --- delete_note_view ---
+@observe({'POST': 'delete'})
+@ratelimit('delete')
 def delete_note_view(request, note_id):
     if request.method != 'POST':
         return HttpResponseNotAllowed(['POST'])
 
-    note = get_object_or_404(Note, pk=note_id)
-    submitted_code_str = request.POST.get('modification_code')
+    note, _ = get_cached_note(note_id) # 404 if the note doesn't exist
 
-    if not submitted_code_str:
-        messages.error(request, "Modification code is required to delete.")
-        return render(request, 'notes/note_detail.html', {
-            'note': note, 'edit_form': NoteForm(instance=note)
-        })
+    code = submitted_modification_code(request, note_id, "Modification code is required to delete.", attempt='deleting ')
+    if code is None:
+        return detail_page(request, note)
+    if not note.code_matches(code):
+        return wrong_code_page(request, note, attempt='deleting ')
 
-    try:
-        submitted_code_uuid = uuid.UUID(submitted_code_str)
-        if submitted_code_uuid == note.modification_code:
-            note_id_deleted = note.id
-            note.delete()
-            logger.info(f"Note ID {note_id_deleted} deleted successfully.")
-            messages.success(request, 'Note deleted successfully!')
-            return redirect(reverse('home'))
+    version = submitted_version(request)
+    if version is None:
+        return bad_version_page(request, note)
+    # One DELETE, applied only if the code and version still match
+    deleted, _ = notes_with_code(note_id, code, version).delete()
+    invalidate_note(note_id)
+    if not deleted:
+        current, _ = get_cached_note(note_id)
+        return conflict_page(request, current, DELETE_CONFLICT_MESSAGE)
+    if note.is_public or version != note.version:
+        bump_public_notes_version()
+        change = public_count_change(note, version, note.is_public, False)
+        if change is None:
+            forget_public_note_count()
         else:
-            logger.warning(f"Invalid modification code attempt for deleting Note ID {note.id}.")
-            messages.error(request, "Invalid modification code.")
-    except ValueError:
-        logger.warning(f"Invalid UUID format submitted for deleting Note ID {note.id}.")
-        messages.error(request, "Invalid modification code format.")
-
-    return render(request, 'notes/note_detail.html', {
-        'note': note, 'edit_form': NoteForm(instance=note)
-    })
+            adjust_public_note_count(change)
+    logger.info(f"Note ID {note_id} deleted successfully.")
+    messages.success(request, 'Note deleted successfully!')
+    return redirect(reverse('home'))
 
 # --- random_note_view ---
+@observe('random')
 def random_note_view(request):
     """Redirects to a random PUBLIC note."""
-    # Get IDs of only public notes
-    note_ids = Note.objects.filter(is_public=True).values_list('id', flat=True) # Filter added
-    if not note_ids:
+    # Single index seek on random_key instead of loading every public ID
+    random_id = random_public_note_id()
+    if random_id is None:
         messages.info(request, "No public GhostNotes found to display randomly.") # Updated message
         # Redirect to home or notes list if no public notes exist
         return redirect(reverse('notes:notes_list')) # Or reverse('home')
-    random_id = random.choice(note_ids)
     return redirect(reverse('notes:note_detail', args=[random_id]))